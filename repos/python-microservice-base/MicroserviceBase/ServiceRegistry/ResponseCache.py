@@ -0,0 +1,214 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: ResponseCache.py
+#
+# Description:
+#   Provide the cache of the responses of cached service API methods.
+#
+# *******************************************************************************
+import collections
+import threading
+import time
+
+
+class ResponseCache(object):
+   """
+Cache of the responses of service API methods decorated with ``cached``.
+   """
+   def __init__(self, dispatch_table):
+      """
+Constructor for the ResponseCache class.
+
+**Arguments:**
+
+* ``dispatch_table``
+
+  / *Condition*: required / *Type*: dict /
+
+  The dispatch table of the service.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._lock = threading.Lock()
+      self._entries = {}
+      self._generations = {}
+      self._stats = {}
+      self._tags = {}
+      for name, entry in dispatch_table.items():
+         if entry.cache is None:
+            continue
+         self._entries[name] = collections.OrderedDict()
+         self._generations[name] = 0
+         self._stats[name] = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+         for tag in entry.cache['tags']:
+            self._tags.setdefault(tag, []).append(name)
+
+   @staticmethod
+   def make_key(args, kwargs):
+      """
+Make the cache key of a call, None if the arguments are not hashable.
+
+**Arguments:**
+
+* ``args``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The positional arguments of the call.
+
+* ``kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  The keyword arguments of the call.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The cache key.
+      """
+      key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+      try:
+         hash(key)
+      except TypeError:
+         return None
+      return key
+
+   def get(self, entry, args, kwargs):
+      """
+Look up the cached response of a call.
+
+**Arguments:**
+
+* ``entry``
+
+  / *Condition*: required / *Type*: ServiceApi /
+
+  The dispatch table entry of the called method.
+
+* ``args``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The positional arguments of the call.
+
+* ``kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  The keyword arguments of the call.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  True and the cached response on a hit, otherwise False and a token to pass to ``put``.
+      """
+      key = self.make_key(args, kwargs)
+      with self._lock:
+         stats = self._stats[entry.name]
+         if key is not None:
+            cached_entry = self._entries[entry.name].get(key)
+            if cached_entry is not None and (cached_entry[0] is None or cached_entry[0] > time.monotonic()):
+               self._entries[entry.name].move_to_end(key)
+               stats['hits'] += 1
+               return True, cached_entry[1]
+         stats['misses'] += 1
+         return False, (key, self._generations[entry.name])
+
+   def put(self, entry, token, response):
+      """
+Cache the response of a call.
+
+The response is dropped if the cache was invalidated while the call was executed.
+
+**Arguments:**
+
+* ``entry``
+
+  / *Condition*: required / *Type*: ServiceApi /
+
+  The dispatch table entry of the called method.
+
+* ``token``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The token returned by ``get``.
+
+* ``response``
+
+  / *Condition*: required / *Type*: object /
+
+  The response of the call.
+
+**Returns:**
+
+(*no returns*)
+      """
+      key, generation = token
+      if key is None:
+         return
+      ttl = entry.cache['ttl']
+      expiry = time.monotonic() + ttl if ttl is not None else None
+      with self._lock:
+         if generation != self._generations[entry.name]:
+            return
+         entries = self._entries[entry.name]
+         entries[key] = (expiry, response)
+         entries.move_to_end(key)
+         while len(entries) > entry.cache['maxsize']:
+            entries.popitem(last=False)
+            self._stats[entry.name]['evictions'] += 1
+
+   def invalidate(self, tags):
+      """
+Invalidate the cached responses of the methods matching the given names or tags.
+
+**Arguments:**
+
+* ``tags``
+
+  / *Condition*: required / *Type*: tuple /
+
+  Names or tags of the cached methods.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._lock:
+         for tag in tags:
+            for name in self._tags.get(tag, ()):
+               self._entries[name].clear()
+               self._generations[name] += 1
+               self._stats[name]['invalidations'] += 1
+
+   def get_stats(self):
+      """
+Get the counters of the cache.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The hits, misses, evictions, invalidations and current size per cached method.
+      """
+      with self._lock:
+         return {name: dict(stats, size=len(self._entries[name])) for name, stats in self._stats.items()}
@@ -0,0 +1,593 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: RpcClient.py
+#
+# Description:
+#   Provide the client sending the requests of a service to other services over one
+#   long-lived connection.
+#
+# *******************************************************************************
+from ServiceMessage import SENT_HEADER
+import pika
+import uuid
+import threading
+import functools
+import heapq
+import random
+import itertools
+import time
+from concurrent.futures import Future, InvalidStateError
+
+
+class RpcClient(object):
+   """
+Client sending requests to services over one long-lived connection.
+
+The connection is served by a background thread. Responses are received with RabbitMQ direct
+reply-to (no reply queue is declared) and matched to their request by correlation id, so that
+requests of any number of threads are in flight on the same connection. If the connection is
+lost, the requests in flight fail and the next request connects again.
+
+Requests whose deadline passes are resolved with None by the connection thread, which also
+runs the functions scheduled with ``call_later`` (e.g. retries).
+   """
+   REPLY_TO = 'amq.rabbitmq.reply-to'
+
+   def __init__(self, parameters, name='rpc_client'):
+      """
+Constructor for the RpcClient class.
+
+**Arguments:**
+
+* ``parameters``
+
+  / *Condition*: required / *Type*: pika.ConnectionParameters /
+
+  The parameters of the broker connection.
+
+* ``name``
+
+  / *Condition*: optional / *Type*: str / *Default*: 'rpc_client' /
+
+  The name of the thread serving the connection.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._parameters = parameters
+      self._name = name
+      self._lock = threading.Lock()
+      self._pending = {}
+      self._deadlines = []
+      self._timers = []
+      self._timer_seq = itertools.count()
+      self._connection = None
+      self._connecting = None
+      self._channel = None
+      self._thread = None
+      self._closed = False
+
+   def submit(self, exchange, routing_key, properties, body, deadline=None):
+      """
+Publish a request without waiting for its response.
+
+**Arguments:**
+
+* ``exchange``
+
+  / *Condition*: required / *Type*: str /
+
+  The exchange to publish the request to.
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key of the request.
+
+* ``properties``
+
+  / *Condition*: required / *Type*: pika.BasicProperties /
+
+  The properties of the request, ``correlation_id`` is required and ``reply_to`` is set
+  by the client.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The encoded request.
+
+* ``deadline``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  The time (``time.time()``) after which the response is not waited for anymore.
+
+**Returns:**
+
+  / *Type*: concurrent.futures.Future /
+
+  The future resolved with the properties and body of the response, or with None if there
+  is no response before the deadline.
+      """
+      properties.reply_to = self.REPLY_TO
+      future = Future()
+      connection = self._connect()
+      with self._lock:
+         self._check_connection(connection)
+         self._pending[properties.correlation_id] = future
+         if deadline is not None:
+            heapq.heappush(self._deadlines, (deadline, properties.correlation_id))
+      try:
+         connection.add_callback_threadsafe(functools.partial(self._publish, exchange, routing_key, properties, body))
+      except Exception as ex:
+         self._fail(properties.correlation_id, ex)
+      return future
+
+   def call(self, exchange, routing_key, properties, body, deadline=None):
+      """
+Publish a request and wait for its response.
+
+**Arguments:**
+
+* ``exchange``
+
+  / *Condition*: required / *Type*: str /
+
+  The exchange to publish the request to.
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key of the request.
+
+* ``properties``
+
+  / *Condition*: required / *Type*: pika.BasicProperties /
+
+  The properties of the request, ``correlation_id`` is required.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The encoded request.
+
+* ``deadline``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  The time (``time.time()``) after which the response is not waited for anymore.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The properties and body of the response, or None if there is no response before the deadline.
+      """
+      return self.submit(exchange, routing_key, properties, body, deadline).result()
+
+   def call_later(self, delay, callback):
+      """
+Call a function on the connection thread after a delay.
+
+If the connection is lost or the client closed before, the function is called right away,
+so that it notices it.
+
+**Arguments:**
+
+* ``delay``
+
+  / *Condition*: required / *Type*: float /
+
+  The delay in seconds.
+
+* ``callback``
+
+  / *Condition*: required / *Type*: callable /
+
+  The function, called without arguments.
+
+**Returns:**
+
+(*no returns*)
+      """
+      connection = self._connect()
+      with self._lock:
+         self._check_connection(connection)
+         heapq.heappush(self._timers, (time.time() + delay, next(self._timer_seq), callback))
+      # Wake the connection thread up, the timer may be due before its next deadline
+      connection.add_callback_threadsafe(lambda: None)
+
+   def discard(self, correlation_id):
+      """
+Stop waiting for the response of a request, a late response is dropped.
+
+**Arguments:**
+
+* ``correlation_id``
+
+  / *Condition*: required / *Type*: str /
+
+  The correlation id of the request.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._lock:
+         future = self._pending.pop(correlation_id, None)
+      if future is not None:
+         future.cancel()
+
+   @property
+   def in_flight(self):
+      """
+The number of requests waiting for their response.
+      """
+      return len(self._pending)
+
+   def close(self):
+      """
+Fail the requests in flight and close the connection.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._lock:
+         self._closed = True
+         connection, thread = self._connection, self._thread
+      if connection is not None:
+         try:
+            # Wake the connection thread up, it notices the client is closed
+            connection.add_callback_threadsafe(lambda: None)
+         except Exception:
+            pass
+      if thread is not None and thread is not threading.current_thread():
+         thread.join(timeout=5)
+
+   def _connect(self):
+      # The broker is connected without the lock held, concurrent callers wait for the same connection
+      with self._lock:
+         if self._closed:
+            raise Exception("RPC client is closed")
+         if self._connection is not None:
+            return self._connection
+         ready = self._connecting
+         if ready is None:
+            ready = self._connecting = Future()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name=self._name, daemon=True)
+            self._thread.start()
+      return ready.result()
+
+   def _check_connection(self, connection):
+      # Called with the lock held, the connection may be lost since it was returned by _connect
+      if self._closed:
+         raise Exception("RPC client is closed")
+      if self._connection is not connection:
+         raise Exception("Connection to broker lost")
+
+   def _run(self, ready):
+      try:
+         connection = pika.BlockingConnection(self._parameters)
+         self._channel = connection.channel()
+         self._channel.basic_consume(queue=self.REPLY_TO, on_message_callback=self._on_response, auto_ack=True)
+      except Exception as ex:
+         with self._lock:
+            self._connecting = None
+         ready.set_exception(Exception(f"Unable to connect broker. Reason: {ex}"))
+         return
+      with self._lock:
+         self._connection = connection
+         self._connecting = None
+      ready.set_result(connection)
+      reason = "RPC client is closed"
+      try:
+         while not self._closed:
+            connection.process_data_events(time_limit=self._expire())
+      except Exception as ex:
+         print(f" [!] RPC client connection lost. Reason: {ex!r}")
+         reason = f"Connection to broker lost. Reason: {ex!r}"
+      with self._lock:
+         self._connection = None
+         pending, self._pending = self._pending, {}
+         self._deadlines = []
+         timers, self._timers = self._timers, []
+      for future in pending.values():
+         self._set(future, exception=Exception(reason))
+      for _, _, callback in sorted(timers):
+         self._run_timer(callback)
+      try:
+         if connection.is_open:
+            connection.close()
+      except Exception:
+         pass
+
+   def _expire(self):
+      # Resolve the requests whose deadline passed, returns the time until the next deadline
+      expired = []
+      due = []
+      now = time.time()
+      with self._lock:
+         while self._deadlines and self._deadlines[0][0] <= now:
+            future = self._pending.pop(heapq.heappop(self._deadlines)[1], None)
+            if future is not None:
+               expired.append(future)
+         while self._timers and self._timers[0][0] <= now:
+            due.append(heapq.heappop(self._timers)[2])
+         time_limit = min([1] + [heap[0][0] - now for heap in (self._deadlines, self._timers) if heap])
+      for future in expired:
+         self._set(future, result=None)
+      for callback in due:
+         self._run_timer(callback)
+      return max(time_limit, 0)
+
+   @staticmethod
+   def _run_timer(callback):
+      try:
+         callback()
+      except Exception as ex:
+         print(f" [!] RPC client timer failed. Reason: {ex!r}")
+
+   def _publish(self, exchange, routing_key, properties, body):
+      try:
+         self._channel.basic_publish(exchange=exchange, routing_key=routing_key, properties=properties, body=body)
+      except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+         # The connection loop fails every request in flight
+         raise
+      except Exception as ex:
+         self._fail(properties.correlation_id, ex)
+
+   def _on_response(self, ch, method, props, body):
+      with self._lock:
+         future = self._pending.pop(props.correlation_id, None)
+      if future is not None:
+         self._set(future, result=(props, body))
+
+   def _fail(self, correlation_id, ex):
+      with self._lock:
+         future = self._pending.pop(correlation_id, None)
+      if future is not None:
+         self._set(future, exception=ex)
+
+   @staticmethod
+   def _set(future, result=None, exception=None):
+      try:
+         if exception is not None:
+            future.set_exception(exception)
+         else:
+            future.set_result(result)
+      except InvalidStateError:
+         # Cancelled by a caller which stopped waiting
+         pass
+
+
+class ServiceCall(object):
+   """
+Call of a service API over a ``RpcClient``, with retries and hedging.
+
+An attempt failing to reach the service (connection lost, no response within the attempt
+timeout) is retried after an exponential backoff with full jitter, while retries are left
+and the deadline of the call is not passed. A hedged attempt is sent once the first one is
+slower than the given delay (e.g. the 95th percentile of the latency). The first response wins,
+the other attempts are discarded.
+
+The hedged attempt is sent with the same routing key: it is only served by another instance
+when several instances of the service consume the same queue (competing consumers). With a
+single consumer it waits behind the first attempt and hedging is of no use.
+
+Retries and hedging send a request more than once, they must only be used for idempotent
+service APIs.
+   """
+   _RETRY_BASE_DELAY = 0.1
+   _RETRY_MAX_DELAY = 2
+
+   def __init__(self, rpc_client, exchange, routing_key, properties, body, deadline=None,
+                retries=0, attempt_timeout=None, hedge_after=None):
+      """
+Constructor for the ServiceCall class.
+
+**Arguments:**
+
+* ``rpc_client``
+
+  / *Condition*: required / *Type*: RpcClient /
+
+  The client sending the attempts.
+
+* ``exchange``
+
+  / *Condition*: required / *Type*: str /
+
+  The exchange to publish the request to.
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key of the request.
+
+* ``properties``
+
+  / *Condition*: required / *Type*: pika.BasicProperties /
+
+  The properties of the request, each attempt gets its own correlation id.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The encoded request.
+
+* ``deadline``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  The time (``time.time()``) after which the response is not waited for anymore.
+
+* ``retries``
+
+  / *Condition*: optional / *Type*: int / *Default*: 0 /
+
+  The number of attempts sent again after a failed one.
+
+* ``attempt_timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds an attempt waits for its response before it fails (bounded by the deadline).
+
+* ``hedge_after``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds after which a hedged attempt is sent if there is no response yet (no hedging if None).
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.future = Future()
+      self.attempts = 0
+      self.latency = None
+      self._rpc_client = rpc_client
+      self._exchange = exchange
+      self._routing_key = routing_key
+      self._properties = properties
+      self._body = body
+      self._deadline = deadline
+      self._retries_left = retries
+      self._attempt_timeout = attempt_timeout
+      self._hedge_after = hedge_after
+      self._in_flight = {}
+      self._retry_scheduled = False
+      self._finished = False
+      self._lock = threading.Lock()
+
+   def start(self):
+      """
+Send the first attempt of the call.
+
+**Returns:**
+
+  / *Type*: concurrent.futures.Future /
+
+  The future resolved with the properties and body of the response, or with None if there
+  is no response before the deadline.
+      """
+      self._attempt()
+      if self._hedge_after is not None and not self._finished:
+         try:
+            self._rpc_client.call_later(self._hedge_after, self._hedge)
+         except Exception as ex:
+            self._finish(exception=ex)
+      return self.future
+
+   def _attempt(self):
+      correlation_id = str(uuid.uuid4())
+      with self._lock:
+         if self._finished:
+            return
+         self.attempts += 1
+         self._in_flight[correlation_id] = time.monotonic()
+      headers = dict(self._properties.headers or {})
+      headers[SENT_HEADER] = time.time()
+      properties = pika.BasicProperties(correlation_id=correlation_id,
+                                        content_type=self._properties.content_type,
+                                        headers=headers,
+                                        expiration=self._properties.expiration,
+                                        priority=self._properties.priority)
+      deadline = self._deadline
+      if self._attempt_timeout is not None:
+         attempt_deadline = time.time() + self._attempt_timeout
+         deadline = attempt_deadline if deadline is None else min(deadline, attempt_deadline)
+      try:
+         rpc_future = self._rpc_client.submit(self._exchange, self._routing_key, properties, self._body, deadline)
+      except Exception as ex:
+         with self._lock:
+            self._in_flight.pop(correlation_id, None)
+         self._on_failure(ex)
+         return
+      rpc_future.add_done_callback(functools.partial(self._on_attempt_done, correlation_id))
+
+   def _on_attempt_done(self, correlation_id, rpc_future):
+      with self._lock:
+         sent = self._in_flight.pop(correlation_id, None)
+         if self._finished or rpc_future.cancelled():
+            return
+      try:
+         response = rpc_future.result()
+      except Exception as ex:
+         self._on_failure(ex)
+         return
+      if response is None:
+         # No response within the attempt timeout
+         self._on_failure(None)
+         return
+      self.latency = time.monotonic() - sent
+      self._finish(result=response)
+
+   def _on_failure(self, ex):
+      with self._lock:
+         if self._finished or self._in_flight or self._retry_scheduled:
+            # Another attempt may still answer
+            return
+         remaining = None if self._deadline is None else self._deadline - time.time()
+         retry = self._retries_left > 0 and (remaining is None or remaining > 0)
+         if retry:
+            self._retries_left -= 1
+            self._retry_scheduled = True
+      if not retry:
+         if ex is None:
+            self._finish(result=None)
+         else:
+            self._finish(exception=ex)
+         return
+      delay = random.uniform(0, min(self._RETRY_MAX_DELAY, self._RETRY_BASE_DELAY * 2 ** (self.attempts - 1)))
+      if remaining is not None:
+         delay = min(delay, remaining)
+      try:
+         self._rpc_client.call_later(delay, self._retry)
+      except Exception as ex:
+         self._finish(exception=ex)
+
+   def _retry(self):
+      with self._lock:
+         self._retry_scheduled = False
+      self._attempt()
+
+   def _hedge(self):
+      with self._lock:
+         hedge = not self._finished and len(self._in_flight) == 1
+      if hedge:
+         self._attempt()
+
+   def _finish(self, result=None, exception=None):
+      with self._lock:
+         if self._finished:
+            return
+         self._finished = True
+         in_flight, self._in_flight = list(self._in_flight), {}
+      for correlation_id in in_flight:
+         self._rpc_client.discard(correlation_id)
+      if exception is not None:
+         self.future.set_exception(exception)
+      else:
+         self.future.set_result(result)
@@ -0,0 +1,99 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: SamplingProfiler.py
+#
+# Description:
+#   Provide the profiler sampling the stacks of all threads of a service.
+#
+# *******************************************************************************
+import collections
+import os
+import sys
+import threading
+
+
+class SamplingProfiler(object):
+   """
+Low-overhead profiler sampling the stacks of all threads from a background thread.
+
+The samples are aggregated as collapsed stacks (``thread;outer;...;inner count`` per
+line), the input format of flame graph tools.
+   """
+
+   def __init__(self, interval=0.005):
+      """
+Constructor for the SamplingProfiler class.
+
+**Arguments:**
+
+* ``interval``
+
+  / *Condition*: optional / *Type*: float / *Default*: 0.005 /
+
+  Seconds between two samples.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.interval = interval
+      self.samples = 0
+      self._stacks = collections.Counter()
+      self._stop_event = threading.Event()
+      self._thread = None
+
+   def start(self):
+      """
+Start sampling.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._thread = threading.Thread(target=self._run)
+      self._thread.daemon = True
+      self._thread.name = "sampling_profiler"
+      self._thread.start()
+
+   def stop(self):
+      """
+Stop sampling.
+
+**Returns:**
+
+  / *Type*: bytes /
+
+  The collapsed stacks, most frequent first.
+      """
+      self._stop_event.set()
+      self._thread.join()
+      return ''.join(f'{stack} {count}\n' for stack, count in self._stacks.most_common()).encode()
+
+   def _run(self):
+      own_ident = threading.get_ident()
+      while not self._stop_event.wait(self.interval):
+         names = {thread.ident: thread.name for thread in threading.enumerate()}
+         for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+               continue
+            stack = []
+            while frame is not None:
+               code = frame.f_code
+               stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+               frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self._stacks[';'.join(reversed(stack))] += 1
+         self.samples += 1
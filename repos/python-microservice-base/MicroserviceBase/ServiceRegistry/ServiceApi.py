@@ -0,0 +1,312 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: ServiceApi.py
+#
+# Description:
+#   Provide the decorators of service API methods and the precompiled entries of the
+#   dispatch table of a service.
+#
+# *******************************************************************************
+import json
+import inspect
+
+
+def thread_safe(func):
+   """
+Mark a service API method as safe to run concurrently with other requests.
+
+Methods marked with this decorator are executed by the worker pool without taking
+the service lock when the service is started with ``--workers``.
+
+**Arguments:**
+
+* ``func``
+
+  / *Condition*: required / *Type*: callable /
+
+  The service API method to be marked.
+
+**Returns:**
+
+  / *Type*: callable /
+
+  The same method, marked as thread-safe.
+   """
+   func._svc_api_thread_safe = True
+   return func
+
+
+def cached(ttl=None, maxsize=128, tags=()):
+   """
+Cache the responses of an idempotent service API method.
+
+Responses are cached per argument values, for at most ``ttl`` seconds and at most
+``maxsize`` entries (least recently used entries are evicted first). Cached responses
+are invalidated by service API methods decorated with ``invalidates`` naming the method
+or one of its tags, or by ``ServiceBase.invalidate_cache``.
+
+**Arguments:**
+
+* ``ttl``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Time to live of the cached responses in seconds, None to keep them until invalidated.
+
+* ``maxsize``
+
+  / *Condition*: optional / *Type*: int / *Default*: 128 /
+
+  Maximum number of cached responses of the method.
+
+* ``tags``
+
+  / *Condition*: optional / *Type*: tuple / *Default*: () /
+
+  Tags used to invalidate the cached responses, in addition to the method name.
+
+**Returns:**
+
+  / *Type*: callable /
+
+  The decorator marking the method as cached.
+   """
+   def decorator(func):
+      func._svc_api_cache = {'ttl': ttl, 'maxsize': maxsize, 'tags': (func.__name__,) + tuple(tags)}
+      return func
+   return decorator
+
+
+def invalidates(*tags):
+   """
+Invalidate cached responses whenever the decorated service API method is executed.
+
+**Arguments:**
+
+* ``*tags``
+
+  / *Condition*: required / *Type*: str /
+
+  Names or tags of the cached service API methods to be invalidated.
+
+**Returns:**
+
+  / *Type*: callable /
+
+  The decorator marking the method as invalidating.
+   """
+   def decorator(func):
+      func._svc_api_invalidates = tags
+      return func
+   return decorator
+
+
+def serialized(func):
+   """
+Mark a service API method as serialized.
+
+Serialized methods never run at the same time as another serialized method of the
+same service. This is the default for all service API methods.
+
+**Arguments:**
+
+* ``func``
+
+  / *Condition*: required / *Type*: callable /
+
+  The service API method to be marked.
+
+**Returns:**
+
+  / *Type*: callable /
+
+  The same method, marked as serialized.
+   """
+   func._svc_api_thread_safe = False
+   return func
+
+
+class ServiceApi(object):
+   """
+Precompiled entry of the dispatch table of a service.
+
+The entry is built once per service class from the method signature and the argument
+types documented in its docstring. It binds and coerces the arguments of a request
+before the method is executed, so wrong calls are rejected up front.
+   """
+   _BOOL_VALUES = {'true': True, '1': True, 'yes': True, 'on': True,
+                   'false': False, '0': False, 'no': False, 'off': False}
+   _INT_PREFIXES = ('0x', '0o', '0b')
+
+   def __init__(self, name, function, info=None):
+      """
+Constructor for the ServiceApi class.
+
+**Arguments:**
+
+* ``name``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service API method.
+
+* ``function``
+
+  / *Condition*: required / *Type*: callable /
+
+  The (unbound) service API method.
+
+* ``info``
+
+  / *Condition*: optional / *Type*: dict / *Default*: None /
+
+  The information parsed from the docstring of the method.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.name = name
+      self.function = function
+      self.info = info
+      self.thread_safe = getattr(function, '_svc_api_thread_safe', False)
+      self.cache = getattr(function, '_svc_api_cache', None)
+      self.invalidates = getattr(function, '_svc_api_invalidates', ())
+
+      doc_types = {}
+      if info:
+         doc_types = {arg['name']: arg['type'] for arg in info.get('arguments', [])}
+
+      self._signature = inspect.signature(function)
+      params = list(self._signature.parameters.values())[1:]
+      self.param_names = []
+      self.min_args = 0
+      self.max_args = 0
+      self._coercers = []
+      for param in params:
+         if param.kind == param.VAR_POSITIONAL:
+            self.max_args = None
+            continue
+         if param.kind not in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            continue
+         self.param_names.append(param.name)
+         self.max_args += 1
+         if param.default is param.empty:
+            self.min_args += 1
+         arg_type = param.annotation if param.annotation is not param.empty else doc_types.get(param.name)
+         self._coercers.append(self.get_coercer(arg_type))
+
+   @classmethod
+   def get_coercer(cls, arg_type):
+      """
+Get the function converting a received argument value to the given type.
+
+**Arguments:**
+
+* ``arg_type``
+
+  / *Condition*: required / *Type*: str /
+
+  The type name documented in the docstring (or the annotated type).
+
+**Returns:**
+
+  / *Type*: callable /
+
+  The conversion function, None if the value is passed unchanged.
+      """
+      if isinstance(arg_type, type):
+         arg_type = arg_type.__name__
+      if not isinstance(arg_type, str):
+         return None
+      return {
+         'int': cls._to_int,
+         'float': float,
+         'bool': cls._to_bool,
+         'str': cls._to_str,
+         'dict': cls._to_json,
+         'list': cls._to_json
+      }.get(arg_type.strip().lower())
+
+   @classmethod
+   def _to_int(cls, value):
+      if isinstance(value, str):
+         # Only prefixed strings select their base, others are decimal (e.g. '010' is 10)
+         digits = value.strip().lstrip('+-').lower()
+         return int(value, 0) if digits.startswith(cls._INT_PREFIXES) else int(value, 10)
+      return int(value)
+
+   @classmethod
+   def _to_bool(cls, value):
+      if isinstance(value, str):
+         try:
+            return cls._BOOL_VALUES[value.strip().lower()]
+         except KeyError:
+            raise ValueError(f"invalid boolean value: '{value}'")
+      return bool(value)
+
+   @staticmethod
+   def _to_str(value):
+      return value if isinstance(value, (str, dict, list)) else str(value)
+
+   @staticmethod
+   def _to_json(value):
+      return json.loads(value) if isinstance(value, str) else value
+
+   def bind(self, args):
+      """
+Bind and coerce the arguments of a request.
+
+**Arguments:**
+
+* ``args``
+
+  / *Condition*: required / *Type*: list /
+
+  The arguments of the request: a list of positional arguments, a dictionary of
+  keyword arguments, a single string argument or an empty value.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The positional arguments and the keyword arguments of the call.
+      """
+      if not args:
+         args = ()
+      elif isinstance(args, str):
+         args = (args,)
+      elif isinstance(args, dict):
+         try:
+            bound = self._signature.bind(None, **args)
+         except TypeError as ex:
+            raise Exception(f"Invalid arguments for API '{self.name}': {ex}")
+         args = bound.args[1:]
+         if bound.kwargs:
+            return self._coerce(args), bound.kwargs
+
+      count = len(args)
+      if count < self.min_args or (self.max_args is not None and count > self.max_args):
+         expected = self.min_args if self.min_args == self.max_args else f"{self.min_args} to {self.max_args if self.max_args is not None else 'any'}"
+         raise Exception(f"API '{self.name}' takes {expected} arguments but {count} were given")
+      return self._coerce(args), {}
+
+   def _coerce(self, args):
+      try:
+         return tuple([coercer(value) if coercer is not None else value
+                       for coercer, value in zip(self._coercers, args)]) + tuple(args[len(self._coercers):])
+      except (TypeError, ValueError) as ex:
+         raise Exception(f"Invalid arguments for API '{self.name}': {ex}")
@@ -0,0 +1,89 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: ServiceHttpServer.py
+#
+# Description:
+#   Provide the local HTTP server of the metrics and health endpoints of a service.
+#
+# *******************************************************************************
+from ServiceCodec import JSON_CODEC
+import json
+import os
+import socketserver
+import http.server
+
+
+class ServiceHttpHandler(http.server.BaseHTTPRequestHandler):
+   """
+Serve the metrics (Prometheus text format) and the health endpoints of the service owning the server.
+   """
+   PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+   def do_GET(self):
+      """
+Answer ``/metrics``, ``/healthz`` and ``/readyz``, the health endpoints answer 503 if a check fails.
+      """
+      service = self.server.service
+      path = self.path.split('?', 1)[0]
+      try:
+         if path == '/metrics':
+            status, content_type, body = 200, self.PROMETHEUS_CONTENT_TYPE, service.get_prometheus_metrics().encode()
+         elif path in ('/healthz', '/readyz'):
+            checks = service.get_health() if path == '/healthz' else service.get_readiness()
+            status = 200 if all(checks.values()) else 503
+            content_type, body = JSON_CODEC.content_type, json.dumps(checks).encode()
+         else:
+            status, content_type, body = 404, 'text/plain', b'Not found'
+      except Exception as ex:
+         status, content_type, body = 500, 'text/plain', str(ex).encode()
+      self.send_response(status)
+      self.send_header('Content-Type', content_type)
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+   def log_message(self, format, *args):
+      # Probes are frequent, keep the output of the service for its requests
+      pass
+
+
+class ServiceHttpServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+   """
+HTTP server of the metrics and health endpoints listening on a TCP port.
+   """
+   daemon_threads = True
+
+   def __init__(self, service, address):
+      self.service = service
+      super(ServiceHttpServer, self).__init__(address, ServiceHttpHandler)
+
+
+class ServiceUnixHttpServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+   """
+HTTP server of the metrics and health endpoints listening on a Unix socket.
+   """
+   daemon_threads = True
+
+   def __init__(self, service, path):
+      self.service = service
+      if os.path.exists(path):
+         os.unlink(path)
+      super(ServiceUnixHttpServer, self).__init__(path, ServiceHttpHandler)
+
+   def server_close(self):
+      super(ServiceUnixHttpServer, self).server_close()
+      if os.path.exists(self.server_address):
+         os.unlink(self.server_address)
@@ -27,11 +27,13 @@
 # - Initialize
 #
 # *******************************************************************************
-from ServiceBase import ServiceBase, ResultType, ResponseMessage
+from ServiceBase import ServiceBase, ResultType, ResponseMessage, thread_safe, cached, invalidates
+from ServiceCodec import JSON_CODEC
 import threading
 import pika
 import json
 import uuid
+import time
 import sys
 from signal import *
 
@@ -51,7 +53,7 @@ that all services interacting with the broker are properly managed and monitored
       'group': '',
       'tag': '',
       'version': '1.0.0',
-      'routing_key': 'abcxyz',
+      'routing_key': ServiceBase._SERVICE_REGISTRY_ROUTING_KEY,
       'gui_support': False,
       # Other details
       'methods': []
@@ -89,51 +91,55 @@ Constructor for the ServiceRegistry class.
       thread_worker.name = "recv_services_infor"
       thread_worker.start()
 
-   def __del__(self):
+   def release_resources(self):
       """
-Destructor for the ServiceRegistry class.
+Delete the realtime update exchange of the ServiceRegistry when it shuts down.
 
-This method is called when an instance of the ServiceRegistry class is about to be destroyed.
-It ensures that any necessary cleanup is performed.
-      
 **Returns:**
 
 (*no returns*)
       """
-      connection = pika.BlockingConnection(pika.ConnectionParameters(**self._kw_args))
-      channel = connection.channel()
-
-      channel.exchange_delete(exchange=self.realtime_update_exchange)
-      connection.close()
-      super(ServiceRegistry, self).__del__()
+      self.get_channel('control').exchange_delete(exchange=self.realtime_update_exchange)
 
    def receive_services_information(self):
       """
 Run in a thread to listen for any changes from the services.
 
+If the connection to the broker is lost, it is reconnected with exponential backoff and
+jitter; the services send their registration again once they are reconnected.
+
 **Returns:**
 
 (*no returns*)
       """
-      connection = pika.BlockingConnection(pika.ConnectionParameters(**self._kw_args))
-      channel = connection.channel()
+      attempt = 0
+      while not self.stop_requested:
+         try:
+            connection = pika.BlockingConnection(pika.ConnectionParameters(**self._kw_args))
+            channel = connection.channel()
 
-      exchange_name = 'service_information'
+            exchange_name = 'service_information'
 
-      channel.exchange_declare(exchange=exchange_name, exchange_type='topic')
+            channel.exchange_declare(exchange=exchange_name, exchange_type='topic')
 
-      # Ensure the queue is durable and named to be reused
-      queue_name = 'service_infor_queue'
-      channel.queue_declare(queue=queue_name, durable=True)
+            # Ensure the queue is durable and named to be reused
+            queue_name = 'service_infor_queue'
+            channel.queue_declare(queue=queue_name, durable=True)
 
-      # Bind the queue to specific routing keys
-      channel.queue_bind(exchange=exchange_name, queue=queue_name, routing_key='service.information')
+            # Bind the queue to specific routing keys
+            channel.queue_bind(exchange=exchange_name, queue=queue_name, routing_key='service.information')
 
-      print(" [*] Waiting for updates. To exit press CTRL+C")
+            print(" [*] Waiting for updates. To exit press CTRL+C")
+            attempt = 0
 
-      channel.basic_consume(queue=queue_name, on_message_callback=self.handle_update, auto_ack=True)
+            channel.basic_consume(queue=queue_name, on_message_callback=self.handle_update, auto_ack=True)
 
-      channel.start_consuming()
+            channel.start_consuming()
+         except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError) as ex:
+            delay = self.get_reconnect_delay(attempt)
+            attempt += 1
+            print(f" [!] Unable to receive updates, retry in {delay:.1f}s. Reason: {ex!r}")
+            self.sleep_unless_stopped(delay)
 
    def handle_update(self, ch, method, properties, body):
       """
@@ -169,14 +175,14 @@ Handle the event when service information is updated.
 
 (*no returns*)
       """
-      if isinstance(body, bytes):
-         service_information = json.loads(body.decode('utf-8'))
+      service_information = ServiceBase.decode_request(body, JSON_CODEC)
 
       if service_information['info']['name'] not in self.services_information and service_information['state'] == "on":
          self.services_information[service_information['info']['name']] = service_information['info']
       elif service_information['info']['name'] in self.services_information and service_information['state'] == "off":
          del self.services_information[service_information['info']['name']]
 
+      self.invalidate_cache('svc_api_get_services_info')
       self.notify_updates()
       print(" [x] Received update:", service_information)
 
@@ -188,18 +194,15 @@ Notify updates to the realtime update channel.
 
 (*no returns*)
       """
-      connection = pika.BlockingConnection(pika.ConnectionParameters(**self._kw_args))
-      channel = connection.channel()
-
-      channel.exchange_declare(exchange=self.realtime_update_exchange, exchange_type='fanout')
-
       # Publish updates to the 'updates' topic
       update_info = json.dumps(self.services_information)
-      channel.basic_publish(exchange=self.realtime_update_exchange, routing_key='', body=update_info)
+      self.publish_control(self.realtime_update_exchange, '', update_info,
+                           declarations=[('exchange_declare', {'exchange': self.realtime_update_exchange, 'exchange_type': 'fanout'})])
 
       print("Update info sent to RabbitMQ")
-      connection.close()
 
+   @thread_safe
+   @cached(maxsize=1)
    def svc_api_get_services_info(self):
       """
 Retrieve information of all services connected to the broker that the Service Registry is connected to.
@@ -213,6 +216,7 @@ Retrieve information of all services connected to the broker that the Service Re
       services_json = json.dumps(self.services_information)
       return services_json
 
+   @thread_safe
    def svc_api_get_realtime_update_exchange(self):
       """
 Retrieve the exchange name of the realtime update exchange.
@@ -225,6 +229,7 @@ Retrieve the exchange name of the realtime update exchange.
       """
       return self.realtime_update_exchange
 
+   @invalidates('svc_api_get_alias_conf')
    def svc_api_update_alias_conf(self, alias_string):
       """
 Update the alias configuration information.
@@ -241,12 +246,15 @@ Update the alias configuration information.
 
 (*no returns*)
       """
+      # Parsed from the request itself instead of reading back the written file, an invalid
+      # configuration is rejected before the file is overwritten
+      alias_dict = json.loads(alias_string)
       with open(ServiceRegistry.ALIAS_CONF_PATH, 'w') as file:
          file.write(alias_string)
-         
-      with open(ServiceRegistry.ALIAS_CONF_PATH, 'r') as file:
-         self._alias_dict = json.load(file)
+      self._alias_dict = alias_dict
 
+   @thread_safe
+   @cached(maxsize=1)
    def svc_api_get_alias_conf(self):
       """
 Retrieve the alias configuration string in JSON format.
@@ -260,6 +268,78 @@ Retrieve the alias configuration string in JSON format.
       alias_json = json.dumps(self._alias_dict)
       return alias_json
 
+   @thread_safe
+   def svc_api_scatter_gather(self, method, args=None, group=None, tag=None, timeout=None):
+      """
+Call a service API of all registered services (or of those of a group or tag) at once and gather their responses.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The service API method called on each service, e.g. 'svc_api_get_version'.
+
+* ``args``
+
+  / *Condition*: optional / *Type*: list / *Default*: None /
+
+  The arguments of the method.
+
+* ``group``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  Only call the services registered with this group.
+
+* ``tag``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  Only call the services registered with this tag.
+
+* ``timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds until the deadline of all calls, ``--request_timeout`` if not given.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The response of each service providing the method, by service name. Services without
+  response before the deadline have the result 'expired'.
+      """
+      request_data = self.create_request_data(method, args if args is not None else [])
+
+      def request_of(name, info):
+         # Skip the services not providing the method
+         return request_data if method in (info.get('methods') or []) else None
+
+      return self.scatter_gather(request_of, group=group, tag=tag, timeout=timeout)
+
+   def get_services_info(self, timeout=None):
+      """
+Get the information of all services registered to the ServiceRegistry, which it holds itself.
+
+**Arguments:**
+
+* ``timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Unused, nothing is requested.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The registered information of each service, by service name.
+      """
+      return dict(self.services_information)
+
    def is_specific_request(self, request):
       """
 Check if the request is a specific request.
@@ -280,6 +360,7 @@ Check if the request is a specific request.
       """
       return request in self._alias_dict
 
+   @thread_safe
    def on_specific_request(self, ch, method, props, body):
       """
 Handle the event when a specific request is received.
@@ -345,21 +426,35 @@ Handle the event when a specific request is received.
             'args': args_list
          }
 
+         # Propagate the remaining time of the caller to the target service. Without deadline the
+         # forward is still bounded (even with --request_timeout 0), a target which never answers
+         # would otherwise hold the connection thread of the registry forever
+         deadline = self.get_deadline(props)
+         if deadline is not None:
+            timeout = max(deadline - time.time(), 0)
+         else:
+            timeout = self._serve_args['request_timeout'] or self._DEFAULT_REQUEST_TIMEOUT
+
+         # Only the idempotent APIs of the target service are retried and hedged
+         methods_info = self.services_information[service].get('methods_info') or {}
+         idempotent = (methods_info.get(request_api) or {}).get('idempotent', False)
+
          print(f" [x] Call method {request_api} of '{service}' with params {args_list}")
-         resp = self.request_service(request_data, ServiceBase._SERVICE_REQUEST_EXCHANGE, routing_key)
+         resp = self.request_service(request_data, ServiceBase._SERVICE_REQUEST_EXCHANGE, routing_key,
+                                     timeout=timeout, priority=props.priority, idempotent=idempotent)
          # resp = ResponseMessage(request_api, result_type, ret)
          # print(props.reply_to)
       except Exception as ex:
          result_type = ResultType.EXCEPT
          response = str(ex)
-         resp = ResponseMessage(request_api, result_type, response).get_json()
+         resp = ResponseMessage(request_api, result_type, response).get_dict()
       
       # print(" [x] resp:%s" % resp)
       # print(" [x] resp type: %s" % type(resp))
-      ch.basic_publish( exchange='',
-                        routing_key=props.reply_to,
-                        properties=pika.BasicProperties(correlation_id=props.correlation_id),
-                        body=json.dumps(resp))
+      # A redelivered alias call is answered from the dedupe window instead of being forwarded again
+      self.remember_response(props, body, resp['request'], resp['result'], resp['result_data'])
+      # Reply in the codec used by the caller
+      self.publish_response(ch, props, resp['request'], resp['result'], resp['result_data'])
       ch.basic_ack(delivery_tag=method.delivery_tag)
       
 
@@ -391,13 +486,12 @@ Handle signals from the operating system.
 
 (*no returns*)
    """
-   # This function will be called when a SIGINT signal (Ctrl+C) is received
-   print("Ctrl+C pressed - Cleaning up...")
-   # Perform any necessary cleanup here
-   # For example, call the cleanup method of the object
-   del obj
-   # Exit the program
-   exit(0)
+   # A first signal (e.g. Ctrl+C) stops the service gracefully, a second one exits right away
+   if obj.stop_requested:
+      print("Signal received again - Exiting...")
+      exit(1)
+   print("Signal received - Shutting down...")
+   obj.stop()
 
 
 if __name__ == '__main__':
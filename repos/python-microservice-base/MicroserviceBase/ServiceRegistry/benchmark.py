@@ -0,0 +1,285 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: benchmark.py
+#
+# Description:
+#   Measure the peak memory and the time taken to decode one request with each codec,
+#   then the request throughput of a service through the broker, for each way of
+#   publishing responses and acknowledging requests (see --confirm and --ack_batch
+#   of ServiceBase).
+#
+#   Usage: python benchmark.py [--requests N] [--window N] [--size N] [--batch N]
+#          [--decode_sizes N,N] [--decode_only]
+#          [broker and serving arguments of ServiceBase, e.g. --host, --workers]
+#
+# *******************************************************************************
+from ServiceBase import ServiceBase
+from ServiceCodec import CODECS
+import argparse
+import tracemalloc
+import threading
+import pika
+import json
+import uuid
+import time
+import sys
+
+
+class BenchmarkService(ServiceBase):
+   """
+Service answering the requests of the benchmark.
+   """
+   _SERVICE_INFO = {
+      'name': 'Benchmark',
+      'description': 'Service answering the requests of the benchmark.',
+      'shortdesc': 'Benchmark service',
+      'group': '',
+      'tag': '',
+      'version': '1.0.0',
+      'routing_key': 'benchmark',
+      'gui_support': False,
+      # Other details
+      'methods': []
+   }
+
+   def svc_api_echo(self, data):
+      """
+Return the given data.
+
+**Arguments:**
+
+* ``data``
+
+  / *Condition*: required / *Type*: str /
+
+  The data to return.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The given data.
+      """
+      return data
+
+
+# Compared modes, with confirms each request is acknowledged on its own or in batches (the batch size
+# is given by --batch)
+MODES = [
+   ('fire-and-forget', []),
+   ('confirm', ['--confirm']),
+   ('ack_batch', ['--ack_batch', '{batch}']),
+   ('confirm+ack_batch', ['--confirm', '--ack_batch', '{batch}']),
+]
+
+
+def measure_decode(codec, size, repeat=20):
+   """
+Measure the decoding of a request whose data has the given size.
+
+**Arguments:**
+
+* ``codec``
+
+  / *Condition*: required / *Type*: Codec /
+
+  The codec of the request.
+
+* ``size``
+
+  / *Condition*: required / *Type*: int /
+
+  The size of the request data.
+
+* ``repeat``
+
+  / *Condition*: optional / *Type*: int / *Default*: 20 /
+
+  The number of decodings timed.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The peak memory allocated while decoding one request in bytes, and the mean decode
+  time in seconds.
+   """
+   body = codec.encode({'method': 'svc_api_echo', 'args': ['x' * size]})
+   tracemalloc.start()
+   try:
+      before = tracemalloc.get_traced_memory()[0]
+      request = ServiceBase.decode_request(body, codec)
+      peak = tracemalloc.get_traced_memory()[1] - before
+   finally:
+      tracemalloc.stop()
+   del request
+   started = time.perf_counter()
+   for _ in range(repeat):
+      ServiceBase.decode_request(body, codec)
+   return peak, (time.perf_counter() - started) / repeat
+
+
+def send_requests(kw_args, count, window, size):
+   """
+Send requests to the benchmark service, with up to ``window`` requests in flight.
+
+**Arguments:**
+
+* ``kw_args``
+
+  / *Condition*: required / *Type*: dict /
+
+  The broker connection parameters.
+
+* ``count``
+
+  / *Condition*: required / *Type*: int /
+
+  The number of requests.
+
+* ``window``
+
+  / *Condition*: required / *Type*: int /
+
+  The number of requests in flight.
+
+* ``size``
+
+  / *Condition*: required / *Type*: int /
+
+  The size of the request data.
+
+**Returns:**
+
+  / *Type*: list /
+
+  The latency of each request in seconds.
+   """
+   connection = pika.BlockingConnection(pika.ConnectionParameters(**kw_args))
+   channel = connection.channel()
+   reply_queue = channel.queue_declare(queue='', exclusive=True).method.queue
+   body = json.dumps({'method': 'svc_api_echo', 'args': ['x' * size]})
+   sent = {}
+   latencies = []
+
+   def on_response(ch, method, props, body):
+      latencies.append(time.perf_counter() - sent.pop(props.correlation_id))
+
+   channel.basic_consume(queue=reply_queue, on_message_callback=on_response, auto_ack=True)
+   published = 0
+   while len(latencies) < count:
+      while published < count and len(sent) < window:
+         correlation_id = str(uuid.uuid4())
+         sent[correlation_id] = time.perf_counter()
+         channel.basic_publish(exchange=ServiceBase._SERVICE_REQUEST_EXCHANGE,
+                               routing_key=BenchmarkService._SERVICE_INFO['routing_key'],
+                               properties=pika.BasicProperties(reply_to=reply_queue, correlation_id=correlation_id),
+                               body=body)
+         published += 1
+      connection.process_data_events(time_limit=1)
+   connection.close()
+   return latencies
+
+
+def run_mode(cmd_args, count, window, size):
+   """
+Serve the benchmark service with the given arguments and measure the requests sent to it.
+
+**Arguments:**
+
+* ``cmd_args``
+
+  / *Condition*: required / *Type*: list /
+
+  The arguments of the service.
+
+* ``count``
+
+  / *Condition*: required / *Type*: int /
+
+  The number of requests.
+
+* ``window``
+
+  / *Condition*: required / *Type*: int /
+
+  The number of requests in flight.
+
+* ``size``
+
+  / *Condition*: required / *Type*: int /
+
+  The size of the request data.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The elapsed seconds, the throughput and the latencies of the run.
+   """
+   svc = BenchmarkService(cmd_args)
+   server = threading.Thread(target=svc.serve, name='benchmark_service')
+   server.start()
+   try:
+      # Warm up until the service consumes its queue
+      send_requests(svc._kw_args, 1, 1, size)
+      started = time.perf_counter()
+      latencies = sorted(send_requests(svc._kw_args, count, window, size))
+      elapsed = time.perf_counter() - started
+   finally:
+      svc.stop()
+      server.join()
+   return {
+      'elapsed': elapsed,
+      'throughput': count / elapsed,
+      'mean': sum(latencies) / len(latencies),
+      'p95': latencies[int(len(latencies) * 0.95) - 1]
+   }
+
+
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description='Measure the request throughput of a service.')
+   parser.add_argument('--requests', type=int, default=10000, help='The number of requests of each run')
+   parser.add_argument('--window', type=int, default=100, help='The number of requests in flight')
+   parser.add_argument('--size', type=int, default=64, help='The size of the request data')
+   parser.add_argument('--batch', type=int, default=50, help='The acknowledgement batch size')
+   parser.add_argument('--decode_sizes', type=str, default='1024,102400,1048576', help='The request data sizes of the decode measurement')
+   parser.add_argument('--decode_only', action='store_true', help='Only measure the decoding, without broker')
+   args, service_args = parser.parse_known_args(sys.argv[1:])
+
+   # The aliases of a content type share their codec
+   codecs = {codec.content_type: codec for codec in CODECS.values()}
+   print(f"{'codec':<22}{'size':>10}{'peak KB':>10}{'peak/size':>10}{'decode ms':>11}")
+   for size in (int(value) for value in args.decode_sizes.split(',')):
+      for content_type, codec in codecs.items():
+         peak, seconds = measure_decode(codec, size)
+         print(f"{content_type:<22}{size:>10}{peak / 1024:>10.1f}{peak / size:>10.2f}{seconds * 1000:>11.3f}")
+   if args.decode_only:
+      sys.exit(0)
+
+   if '--prefetch' not in service_args:
+      # Let the broker push enough requests to fill the acknowledgement batches
+      service_args += ['--prefetch', str(max(args.window, args.batch * 2))]
+
+   results = []
+   for mode, mode_args in MODES:
+      mode_args = [arg.format(batch=args.batch) for arg in mode_args]
+      results.append((mode, run_mode(service_args + mode_args, args.requests, args.window, args.size)))
+
+   print(f"\n{args.requests} requests, {args.window} in flight, {args.size} bytes")
+   print(f"{'mode':<20}{'req/s':>10}{'mean ms':>10}{'p95 ms':>10}")
+   for mode, result in results:
+      print(f"{mode:<20}{result['throughput']:>10.0f}{result['mean'] * 1000:>10.2f}{result['p95'] * 1000:>10.2f}")
@@ -0,0 +1,110 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: generate_client.py
+#
+# Description:
+#   Generate the Python client class of a registered service from the methods_info it
+#   registered to the ServiceRegistry (see ServiceClient.py), e.g. ClewareClient with set_switch(device_no, switch_id, state).
+#
+#   Usage: python generate_client.py SERVICE_NAME [--class_name NAME] [--output FILE]
+#          [--timeout SECONDS] [--host HOST] [--port PORT] [--virtual_host HOST]
+#          [--username NAME] [--password PASSWORD]
+#
+# *******************************************************************************
+from ServiceBase import ServiceBase
+from ServiceCodec import JSON_CODEC
+from RpcClient import RpcClient
+from ServiceClient import generate_client_source, is_identifier
+import argparse
+import pika
+import uuid
+import time
+import sys
+import os
+
+
+def request_services_info(rpc_client, timeout):
+   """
+Request the information of all services registered to the ServiceRegistry.
+
+**Arguments:**
+
+* ``rpc_client``
+
+  / *Condition*: required / *Type*: RpcClient /
+
+  The client sending the request.
+
+* ``timeout``
+
+  / *Condition*: required / *Type*: float /
+
+  Seconds to wait for the response.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The registered information of each service, by service name.
+   """
+   properties = pika.BasicProperties(correlation_id=str(uuid.uuid4()), content_type=JSON_CODEC.content_type)
+   response = rpc_client.call(ServiceBase._SERVICE_REQUEST_EXCHANGE, ServiceBase._SERVICE_REGISTRY_ROUTING_KEY, properties,
+                              JSON_CODEC.encode(ServiceBase.create_request_data('svc_api_get_services_info', [])),
+                              time.time() + timeout)
+   if response is None:
+      raise Exception("No response of the ServiceRegistry")
+   return ServiceBase.parse_services_info(ServiceBase.decode_response(*response))
+
+
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description='Generate the client class of a registered service.')
+   parser.add_argument('service', type=str, help='The name of the service')
+   parser.add_argument('--class_name', type=str, help='The name of the client class')
+   parser.add_argument('--output', type=str, help='The file the client module is written to (standard output if not given)')
+   parser.add_argument('--timeout', type=float, default=10, help='The seconds to wait for the ServiceRegistry')
+   parser.add_argument('--host', type=str, default=os.getenv('RABBITMQ_HOST') or 'localhost', help='The rabbitMQ host')
+   parser.add_argument('--port', type=int, default=int(os.getenv('RABBITMQ_PORT', 5672)), help='The rabbitMQ port')
+   parser.add_argument('--virtual_host', type=str, default=os.getenv('RABBITMQ_VIRTUAL_HOST') or '/', help='The virtual host')
+   parser.add_argument('--username', type=str, default=os.getenv('RABBITMQ_USERNAME') or 'guest', help='The username for the RabbitMQ service')
+   parser.add_argument('--password', type=str, default=os.getenv('RABBITMQ_PASSWORD') or 'guest', help='The password for the RabbitMQ service')
+   args = parser.parse_args(sys.argv[1:])
+   if args.class_name is not None and not is_identifier(args.class_name):
+      print(f" [!] Invalid client class name '{args.class_name}', it must be a Python identifier")
+      sys.exit(1)
+
+   rpc_client = RpcClient(pika.ConnectionParameters(host=args.host, port=args.port, virtual_host=args.virtual_host,
+                                                    credentials=pika.PlainCredentials(args.username, args.password)),
+                          'generate_client')
+   try:
+      services_info = request_services_info(rpc_client, args.timeout)
+   finally:
+      rpc_client.close()
+   if args.service not in services_info:
+      print(f" [!] Service {args.service} is not registered, registered services: {', '.join(services_info)}")
+      sys.exit(1)
+
+   service_info = services_info[args.service]
+   # The registered name is written into a comment, keep it on one line
+   source = (f"# Client of the {' '.join(args.service.split())} service, generated by generate_client.py from its methods_info.\n"
+             f"# Generate it again when the service APIs change instead of editing it.\n"
+             f"from ServiceClient import ServiceClient\n\n\n"
+             + generate_client_source(service_info, args.class_name))
+   if args.output:
+      with open(args.output, 'w') as file:
+         file.write(source)
+      print(f" [x] Client of the {args.service} service written to {args.output}")
+   else:
+      print(source)
@@ -0,0 +1,513 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# conftest.py
+#
+# Fixtures of the service tests: an in-process fake of the RabbitMQ broker replacing
+# pika.BlockingConnection, so that services and RPC clients run without a broker.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import os, sys, time, json, uuid, threading, itertools, collections, pytest
+
+# -- import own Python modules (containing the code to be tested)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+                                'MicroserviceBase', 'ServiceRegistry'))
+
+import pika
+
+from ServiceBase import ServiceBase, thread_safe
+
+# --------------------------------------------------------------------------------------------------------------
+
+class FakeFrame:
+    """Frame returned by the fake channel methods"""
+
+    def __init__(self, **kwargs):
+        self.method = type('Method', (), dict(queue='amq.gen-fake', message_count=0, consumer_count=0, **kwargs))()
+
+class FakeDelivery:
+    """Delivery method of a message (pika.spec.Basic.Deliver)"""
+
+    def __init__(self, delivery_tag, routing_key='', redelivered=False):
+        self.delivery_tag = delivery_tag
+        self.routing_key = routing_key
+        self.redelivered = redelivered
+        self.consumer_tag = 'ctag'
+        self.exchange = ''
+
+class FakeChannel:
+    """Channel of a fake connection, recording what is published, acknowledged and declared"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_open = True
+        self.published = []
+        self.acks = []
+        self.nacks = []
+        self.calls = []
+        self.confirming = False
+        self.auto_confirm = True
+        self.nack_publishes = 0
+        self._delivery_tags = itertools.count(1)
+        self._publish_tags = itertools.count(1)
+        self._on_confirm = None
+        self._impl = FakeChannelImpl(self)
+        self.fail_declare = {}
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        nack = False
+        if self.confirming and self.nack_publishes > 0:
+            self.nack_publishes -= 1
+            nack = True
+        else:
+            self.published.append({'exchange': exchange, 'routing_key': routing_key, 'body': body, 'properties': properties})
+            self.connection.broker.route(self, exchange, routing_key, properties, body)
+        if self.confirming:
+            publish_tag = next(self._publish_tags)
+            if self.auto_confirm:
+                self.connection.add_callback_threadsafe(lambda: self.confirm(publish_tag, nack=nack))
+
+    def confirm(self, delivery_tag, multiple=False, nack=False):
+        """Confirm published messages to the channel, as the broker does in confirm mode"""
+        method = pika.spec.Basic.Nack if nack else pika.spec.Basic.Ack
+        self._on_confirm(pika.frame.Method(1, method(delivery_tag=delivery_tag, multiple=multiple)))
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        self.nacks.append((delivery_tag, requeue))
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, **kwargs):
+        self.calls.append(('basic_consume', {'queue': queue}))
+        self.connection.consumers[queue] = (self, on_message_callback)
+        return f'ctag-{queue}'
+
+    def basic_cancel(self, consumer_tag=None):
+        self.calls.append(('basic_cancel', {'consumer_tag': consumer_tag}))
+        for queue, (channel, _) in list(self.connection.consumers.items()):
+            if channel is self:
+                del self.connection.consumers[queue]
+
+    def start_consuming(self):
+        while self.connection.is_open:
+            self.connection.process_data_events(time_limit=0.05)
+        raise pika.exceptions.ConnectionClosed(320, "Connection closed")
+
+    def next_delivery_tag(self):
+        return next(self._delivery_tags)
+
+    def close(self):
+        self.is_open = False
+
+    def __getattr__(self, name):
+        # Declares, bindings, purges and qos are recorded
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            self.calls.append((name, kwargs))
+            error = self.fail_declare.pop(name, None)
+            if error is not None:
+                raise error
+            return FakeFrame()
+        return call
+
+    def called(self, name):
+        return [kwargs for method, kwargs in self.calls if method == name]
+
+class FakeChannelImpl:
+    """Underlying channel of a fake channel (BlockingChannel._impl)"""
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def confirm_delivery(self, ack_nack_callback, callback=None):
+        self.channel.confirming = True
+        self.channel._on_confirm = ack_nack_callback
+
+class FakeConnection:
+    """Blocking connection to the fake broker"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self.channels = []
+        self.consumers = {}
+        self.lost = None
+        self._callbacks = collections.deque()
+        self._deliveries = collections.deque()
+        self._wakeup = threading.Event()
+
+    def channel(self, channel_number=None):
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    def add_callback_threadsafe(self, callback):
+        if not self.is_open:
+            raise pika.exceptions.ConnectionWrongStateError("Connection is closed")
+        self._callbacks.append(callback)
+        self._wakeup.set()
+
+    def deliver(self, queue, properties, body):
+        self._deliveries.append((queue, properties, body))
+        self._wakeup.set()
+
+    def process_data_events(self, time_limit=0):
+        deadline = time.monotonic() + (time_limit or 0)
+        while True:
+            if self.lost is not None:
+                self.is_open = False
+                raise self.lost
+            if not self.is_open:
+                raise pika.exceptions.ConnectionWrongStateError("Connection is closed")
+            self._wakeup.clear()
+            processed = False
+            while self._callbacks:
+                self._callbacks.popleft()()
+                processed = True
+            while self._deliveries:
+                queue, properties, body = self._deliveries.popleft()
+                consumer = self.consumers.get(queue)
+                if consumer is not None:
+                    channel, callback = consumer
+                    callback(channel, FakeDelivery(channel.next_delivery_tag(), queue), properties, body)
+                processed = True
+            remaining = deadline - time.monotonic()
+            if processed or remaining <= 0:
+                return
+            self._wakeup.wait(min(remaining, 0.01))
+
+    def sleep(self, duration):
+        self.process_data_events(time_limit=duration)
+
+    def close(self):
+        self.is_open = False
+
+class FakeAsyncioChannel:
+    """Channel of a fake asyncio connection, channel methods call back on the event loop"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_open = True
+        self.published = []
+        self.acks = []
+        self.calls = []
+        self._delivery_tags = itertools.count(1)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.published.append({'exchange': exchange, 'routing_key': routing_key, 'body': body, 'properties': properties})
+        self.connection.broker.route(self, exchange, routing_key, properties, body)
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, **kwargs):
+        self.connection.consumers[queue] = (self, on_message_callback)
+        return f'ctag-{queue}'
+
+    def next_delivery_tag(self):
+        return next(self._delivery_tags)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(callback=None, **kwargs):
+            self.calls.append((name, kwargs))
+            if name == 'basic_cancel':
+                self.connection.consumers = {queue: consumer for queue, consumer in self.connection.consumers.items()
+                                             if consumer[0] is not self}
+            if callback is not None:
+                self.connection.loop.call_soon(callback, FakeFrame())
+        return call
+
+class FakeAsyncioConnection:
+    """Connection to the fake broker replacing pika's AsyncioConnection"""
+
+    broker = None
+
+    def __init__(self, parameters=None, on_open_callback=None, on_open_error_callback=None, on_close_callback=None,
+                 custom_ioloop=None):
+        self.loop = custom_ioloop
+        self.is_open = True
+        self.channels = []
+        self.consumers = {}
+        self._on_close_callback = on_close_callback
+        self.broker.connections.append(self)
+        self.loop.call_soon(on_open_callback, self)
+
+    def channel(self, on_open_callback=None):
+        channel = FakeAsyncioChannel(self)
+        self.channels.append(channel)
+        self.loop.call_soon(on_open_callback, channel)
+        return channel
+
+    def deliver(self, queue, properties, body):
+        def dispatch():
+            consumer = self.consumers.get(queue)
+            if consumer is not None:
+                channel, callback = consumer
+                callback(channel, FakeDelivery(channel.next_delivery_tag(), queue), properties, body)
+        self.loop.call_soon_threadsafe(dispatch)
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            if not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self._on_close_callback, self, 'closed')
+
+class FakeBroker:
+    """In-process stand-in of the broker, connections are opened by pika.BlockingConnection"""
+
+    def __init__(self):
+        self.connections = []
+        self.published = []
+        self.responders = {}
+        self.fail_connects = 0
+        self.connect_delay = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def connect(self, parameters=None):
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        with self._lock:
+            if self.closed:
+                raise pika.exceptions.AMQPConnectionError("Broker is closed")
+            if self.fail_connects > 0:
+                self.fail_connects -= 1
+                raise pika.exceptions.AMQPConnectionError("Broker is down")
+            connection = FakeConnection(self)
+            self.connections.append(connection)
+        return connection
+
+    def route(self, channel, exchange, routing_key, properties, body):
+        """Record a published message, requests with a responder get its response on their reply queue"""
+        with self._lock:
+            self.published.append((exchange, routing_key, properties, body))
+        responder = self.responders.get(routing_key)
+        if responder is None or properties is None or not properties.reply_to:
+            return
+        response = responder(properties, body)
+        if response is None:
+            return
+        if not isinstance(response, tuple):
+            response = (pika.BasicProperties(content_type=properties.content_type), response)
+        reply_properties, reply_body = response
+        reply_properties.correlation_id = properties.correlation_id
+        channel.connection.deliver(properties.reply_to, reply_properties, reply_body)
+
+    def close(self):
+        """Close every connection, no connection can be opened anymore"""
+        with self._lock:
+            self.closed = True
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
+
+    def requests(self, routing_key):
+        """The decoded JSON requests published with a routing key"""
+        return [json.loads(body) for _, key, _, body in list(self.published) if key == routing_key]
+
+# --------------------------------------------------------------------------------------------------------------
+
+class EchoService(ServiceBase):
+    """Service with a few service APIs, served on the fake broker"""
+
+    _SERVICE_INFO = dict(ServiceBase._SERVICE_INFO, name='EchoService', routing_key='EchoServiceKey')
+
+    def __init__(self, cmd_args=None):
+        self.calls = []
+        super(EchoService, self).__init__(cmd_args)
+
+    def svc_api_echo(self, value):
+        """
+Return the value.
+
+**Arguments:**
+
+* ``value``
+
+  / *Condition*: required / *Type*: str /
+
+  The value.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The value.
+        """
+        self.calls.append(('echo', value))
+        return value
+
+    def svc_api_add(self, a, b=0):
+        """
+Add two numbers.
+
+**Arguments:**
+
+* ``a``
+
+  / *Condition*: required / *Type*: int /
+
+  The first number.
+
+* ``b``
+
+  / *Condition*: optional / *Type*: int / *Default*: 0 /
+
+  The second number.
+
+**Returns:**
+
+  / *Type*: int /
+
+  The sum.
+        """
+        self.calls.append(('add', a, b))
+        return a + b
+
+    @thread_safe
+    def svc_api_sleep(self, seconds):
+        """
+Sleep and return the seconds slept.
+
+**Arguments:**
+
+* ``seconds``
+
+  / *Condition*: required / *Type*: float /
+
+  The seconds to sleep.
+
+**Returns:**
+
+  / *Type*: float /
+
+  The seconds.
+        """
+        self.calls.append(('sleep', seconds))
+        time.sleep(seconds)
+        return seconds
+
+    def svc_api_fail(self):
+        """
+Raise an exception.
+
+**Returns:**
+
+(*no returns*)
+        """
+        raise Exception("Failed on purpose")
+
+def make_properties(correlation_id=None, reply_to='reply', content_type='application/json', **kwargs):
+    """Properties of a request sent to a service"""
+    return pika.BasicProperties(correlation_id=correlation_id or str(uuid.uuid4()), reply_to=reply_to,
+                                content_type=content_type, **kwargs)
+
+def send_request(service, method, args=None, delivery_tag=None, body=None, **kwargs):
+    """Deliver a request to the requests channel of a service, returns its properties"""
+    channel = service.get_channel('requests')
+    properties = make_properties(**kwargs)
+    if body is None:
+        body = json.dumps({'method': method, 'args': [] if args is None else args}).encode()
+    tag = delivery_tag if delivery_tag is not None else channel.channel.next_delivery_tag()
+    service.on_request(channel, FakeDelivery(tag, service._SERVICE_INFO['routing_key']), properties, body)
+    return properties
+
+def get_responses(service, correlation_id=None):
+    """The decoded responses published by a service, optionally to one request"""
+    responses = []
+    for channel in list(service.connection.channels):
+        for message in list(channel.published):
+            properties = message['properties']
+            if message['routing_key'] != 'reply':
+                continue
+            if correlation_id is None or properties.correlation_id == correlation_id:
+                responses.append(ServiceBase.decode_response(properties, message['body']))
+    return responses
+
+def deliver_request(service, method, args=None, body=None, **kwargs):
+    """Publish a request to the queue of a service served by ``serve``, returns its properties"""
+    properties = make_properties(**kwargs)
+    if body is None:
+        body = json.dumps({'method': method, 'args': [] if args is None else args}).encode()
+    service.connection.deliver(service.name, properties, body)
+    return properties
+
+def wait_for(condition, timeout=5, connection=None):
+    """Wait until a condition is true, serving the connection meanwhile"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        if connection is not None:
+            connection.process_data_events(time_limit=0.01)
+        else:
+            time.sleep(0.01)
+    return True
+
+# --------------------------------------------------------------------------------------------------------------
+
+@pytest.fixture
+def broker(monkeypatch):
+    """The fake broker, connected by pika.BlockingConnection"""
+    broker = FakeBroker()
+    monkeypatch.setattr(pika, 'BlockingConnection', broker.connect)
+    import AsyncServiceBase
+    monkeypatch.setattr(FakeAsyncioConnection, 'broker', broker)
+    monkeypatch.setattr(AsyncServiceBase, 'AsyncioConnection', FakeAsyncioConnection)
+    for name in [name for name in os.environ if name.startswith('SERVICE_')]:
+        monkeypatch.delenv(name)
+    return broker
+
+@pytest.fixture
+def make_service(broker):
+    """Create services connected to the fake broker, closed at the end of the test"""
+    services = []
+
+    def make(cls=EchoService, *cmd_args):
+        service = cls(list(cmd_args))
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        if not service._closed:
+            service.stop()
+            service.close()
+
+@pytest.fixture
+def serve(make_service):
+    """Serve services in background threads, stopped at the end of the test"""
+    served = []
+
+    def start(service):
+        thread = threading.Thread(target=service.serve, name=f'serve_{service.name}', daemon=True)
+        thread.start()
+        served.append((service, thread))
+        assert wait_for(lambda: service._consumer_tag is not None and service.connection is not None and
+                                service.name in service.connection.consumers)
+        return thread
+
+    yield start
+    for service, thread in served:
+        service.stop()
+        thread.join(timeout=15)
@@ -0,0 +1,192 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_AsyncServiceBase.py
+#
+# Services running on an asyncio event loop, and their requests to other services.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, time, asyncio, pytest
+
+from conftest import deliver_request, get_responses, wait_for
+
+from AsyncServiceBase import AsyncServiceBase
+from ServiceBase import ServiceBase
+from RpcClient import RpcClient
+
+# --------------------------------------------------------------------------------------------------------------
+
+class AsyncEchoService(AsyncServiceBase):
+    """Asynchronous service with coroutine and blocking service APIs"""
+
+    _SERVICE_INFO = dict(AsyncServiceBase._SERVICE_INFO, name='AsyncEchoService', routing_key='AsyncEchoServiceKey')
+
+    async def svc_api_echo(self, value):
+        """
+Return the value.
+
+**Arguments:**
+
+* ``value``
+
+  / *Condition*: required / *Type*: str /
+
+  The value.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The value.
+        """
+        await asyncio.sleep(0.01)
+        return value
+
+    def svc_api_add(self, a, b):
+        """
+Add two numbers in the thread pool.
+
+**Arguments:**
+
+* ``a``
+
+  / *Condition*: required / *Type*: int /
+
+  The first number.
+
+* ``b``
+
+  / *Condition*: required / *Type*: int /
+
+  The second number.
+
+**Returns:**
+
+  / *Type*: int /
+
+  The sum.
+        """
+        return a + b
+
+    async def svc_api_forward(self, routing_key, value):
+        """
+Forward the value to the echo API of another service.
+
+**Arguments:**
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key of the other service.
+
+* ``value``
+
+  / *Condition*: required / *Type*: str /
+
+  The value.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The response of the other service.
+        """
+        return await self.request_service_aio(self.create_request_data('svc_api_echo', [value]),
+                                              ServiceBase._SERVICE_REQUEST_EXCHANGE, routing_key)
+
+def echo_responder(properties, body):
+    request = json.loads(body)
+    return json.dumps({'request': request['method'], 'result': 'pass', 'result_data': request['args'][0]}).encode()
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_AsyncServiceBase:
+    """Asynchronous services served on the fake broker"""
+
+    def test_coroutine_and_blocking_apis(self, make_service, serve):
+        """Coroutine APIs run on the event loop, blocking ones in the thread pool"""
+        service = make_service(AsyncEchoService)
+        serve(service)
+        echo = deliver_request(service, 'svc_api_echo', ['hi'])
+        add = deliver_request(service, 'svc_api_add', ['1', '2'])
+        assert wait_for(lambda: len(get_responses(service)) == 2)
+        assert get_responses(service, echo.correlation_id)[0]['result_data'] == 'hi'
+        assert get_responses(service, add.correlation_id)[0]['result_data'] == 3
+
+    def test_request_service_aio(self, broker, make_service, serve):
+        """Requests awaited on the event loop share the reply queue of the service"""
+        broker.responders['OtherKey'] = echo_responder
+        service = make_service(AsyncEchoService)
+        serve(service)
+        props = deliver_request(service, 'svc_api_forward', ['OtherKey', 'ping'])
+        assert wait_for(lambda: get_responses(service, props.correlation_id))
+        forwarded = get_responses(service, props.correlation_id)[0]['result_data']
+        assert forwarded['result'] == 'pass'
+        assert forwarded['result_data'] == 'ping'
+        assert forwarded['attempts'] == 1
+
+    def test_request_timeout_default(self, make_service, serve):
+        """Requests awaited on the event loop honor --request_timeout"""
+        service = make_service(AsyncEchoService, '--request_timeout', '0.2')
+        serve(service)
+        started = time.monotonic()
+        props = deliver_request(service, 'svc_api_forward', ['NobodyKey', 'ping'])
+        assert wait_for(lambda: get_responses(service, props.correlation_id))
+        assert get_responses(service, props.correlation_id)[0]['result_data']['result'] == 'expired'
+        assert time.monotonic() - started < 2
+
+    def test_inherited_blocking_requests(self, broker, make_service, serve):
+        """The blocking request API of ServiceBase works on asynchronous services"""
+        services_info = {'OtherService': dict(ServiceBase._SERVICE_INFO, name='OtherService', routing_key='OtherKey')}
+        broker.responders[ServiceBase._SERVICE_REGISTRY_ROUTING_KEY] = lambda properties, body: json.dumps(
+            {'request': 'svc_api_get_services_info', 'result': 'pass', 'result_data': json.dumps(services_info)}).encode()
+        broker.responders['OtherKey'] = echo_responder
+        service = make_service(AsyncEchoService)
+        serve(service)
+        assert service.get_services_info(timeout=5) == services_info
+        resp = service.request_service(service.create_request_data('svc_api_echo', ['x']),
+                                       ServiceBase._SERVICE_REQUEST_EXCHANGE, 'OtherKey', timeout=5)
+        assert resp['result_data'] == 'x'
+        gathered = service.scatter_gather(service.create_request_data('svc_api_echo', ['y']), timeout=5)
+        assert gathered['OtherService']['result_data'] == 'y'
+
+    def test_shutdown_not_blocking(self, make_service, serve, monkeypatch):
+        """Closing the request client on shutdown does not block the event loop"""
+        monkeypatch.setattr(RpcClient, 'close', lambda client: time.sleep(0.5))
+        service = make_service(AsyncEchoService)
+        thread = serve(service)
+        service.get_rpc_client()
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.02)
+
+        asyncio.run_coroutine_threadsafe(tick(), service._loop)
+        assert wait_for(lambda: ticks)
+        started = time.monotonic()
+        service.stop()
+        thread.join(timeout=5)
+        assert time.monotonic() - started >= 0.5
+        gaps = [later - earlier for earlier, later in zip(ticks, ticks[1:]) if later >= started]
+        assert gaps and max(gaps) < 0.3
+
+# eof class Test_AsyncServiceBase:
+
+# --------------------------------------------------------------------------------------------------------------
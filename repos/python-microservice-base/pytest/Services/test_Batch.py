@@ -0,0 +1,118 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Batch.py
+#
+# Batch requests carrying many service API calls.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, time, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+# --------------------------------------------------------------------------------------------------------------
+
+class NotifyingService(EchoService):
+    """Service whose API notifies its updates as a side effect"""
+
+    def __init__(self, cmd_args=None):
+        self.notifications = 0
+        super(NotifyingService, self).__init__(cmd_args)
+
+    def notify(self):
+        self.notifications += 1
+
+    def svc_api_set(self, value):
+        """
+Set a value and notify the update.
+
+**Arguments:**
+
+* ``value``
+
+  / *Condition*: required / *Type*: int /
+
+  The value.
+
+**Returns:**
+
+  / *Type*: int /
+
+  The value.
+        """
+        self.emit_side_effect(self.notify)
+        return value
+
+def send_batch(service, calls, **options):
+    body = json.dumps(dict({'method': 'batch', 'calls': calls}, **options)).encode()
+    props = send_request(service, 'batch', body=body)
+    return get_responses(service, props.correlation_id)[0]
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Batch:
+    """Batch requests"""
+
+    def test_calls_in_order(self, make_service):
+        """Each call is answered in call order, failures do not stop the batch"""
+        service = make_service(EchoService)
+        response = send_batch(service, [{'method': 'svc_api_echo', 'args': ['a']},
+                                        {'method': 'svc_api_fail', 'args': []},
+                                        {'method': 'svc_api_add', 'args': ['1', '2']}])
+        assert response['result'] == 'pass'
+        assert [call['result'] for call in response['result_data']] == ['pass', 'exception', 'pass']
+        assert response['result_data'][2]['result_data'] == 3
+
+    def test_stop_on_error(self, make_service):
+        """The calls following a failed call are skipped"""
+        service = make_service(EchoService)
+        response = send_batch(service, [{'method': 'svc_api_fail', 'args': []},
+                                        {'method': 'svc_api_echo', 'args': ['a']}], stop_on_error=True)
+        assert [call['result'] for call in response['result_data']] == ['exception', 'fail']
+        assert service.calls == []
+
+    def test_independent_calls_in_parallel(self, make_service):
+        """Independent thread-safe calls run in parallel"""
+        service = make_service(EchoService)
+        started = time.monotonic()
+        response = send_batch(service, [{'method': 'svc_api_sleep', 'args': ['0.2']}] * 4, independent=True)
+        assert [call['result'] for call in response['result_data']] == ['pass'] * 4
+        assert time.monotonic() - started < 0.6
+
+    @pytest.mark.parametrize(
+        "call, result",
+        [({'method': 'batch', 'calls': []}, 'fail'),
+         ('svc_api_echo', 'exception')]
+    )
+    def test_invalid_calls(self, make_service, call, result):
+        """Nested batches and calls which are not dictionaries are rejected"""
+        service = make_service(EchoService)
+        response = send_batch(service, [call])
+        assert response['result_data'][0]['result'] == result
+
+    def test_side_effects_once(self, make_service):
+        """Side effects emitted by many calls run once after the batch"""
+        service = make_service(NotifyingService)
+        send_batch(service, [{'method': 'svc_api_set', 'args': [str(value)]} for value in range(3)])
+        assert service.notifications == 1
+        props = send_request(service, 'svc_api_set', ['4'])
+        assert get_responses(service, props.correlation_id)[0]['result_data'] == 4
+        assert service.notifications == 2
+
+# eof class Test_Batch:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,81 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_BinaryResponse.py
+#
+# Bytes results sent as the raw message body.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import base64, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceCodec import BINARY_CONTENT_TYPE
+
+# --------------------------------------------------------------------------------------------------------------
+
+class BlobService(EchoService):
+    """Service returning bytes"""
+
+    def svc_api_blob(self, size):
+        """
+Return a blob.
+
+**Arguments:**
+
+* ``size``
+
+  / *Condition*: required / *Type*: int /
+
+  The size of the blob.
+
+**Returns:**
+
+  / *Type*: bytes /
+
+  The blob.
+        """
+        return bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_BinaryResponse:
+    """Responses carrying bytes"""
+
+    def test_raw_body(self, make_service):
+        """Callers accepting binary responses get the bytes as the message body"""
+        service = make_service(BlobService)
+        props = send_request(service, 'svc_api_blob', ['1000'], headers={'accept': BINARY_CONTENT_TYPE})
+        message = service.get_channel('requests').channel.published[-1]
+        assert message['properties'].content_type == BINARY_CONTENT_TYPE
+        assert message['properties'].headers == {'request': 'svc_api_blob', 'result': 'pass'}
+        assert message['body'] == service.svc_api_blob(1000)
+        response = get_responses(service, props.correlation_id)[0]
+        assert isinstance(response['result_data'], memoryview)
+        assert response['result_data'] == service.svc_api_blob(1000)
+
+    @pytest.mark.parametrize("headers", [None, {'accept': 'application/json'}])
+    def test_base64_fallback(self, make_service, headers):
+        """Other callers get the bytes base64 encoded by the JSON codec"""
+        service = make_service(BlobService)
+        props = send_request(service, 'svc_api_blob', ['10'], headers=headers)
+        response = get_responses(service, props.correlation_id)[0]
+        assert base64.b64decode(response['result_data']) == bytes(range(10))
+
+# eof class Test_BinaryResponse:
+
+# --------------------------------------------------------------------------------------------------------------
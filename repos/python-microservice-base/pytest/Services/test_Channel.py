@@ -0,0 +1,164 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Channel.py
+#
+# Publisher confirms and batched acknowledgements of the service channels.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import pytest
+
+from conftest import FakeConnection, FakeBroker, EchoService, send_request, get_responses
+
+from AsyncServiceBase import AsyncServiceBase
+from ServiceChannel import BatchedChannel
+
+# --------------------------------------------------------------------------------------------------------------
+
+def make_channel(confirm=False, ack_batch=0):
+    connection = FakeConnection(FakeBroker())
+    return BatchedChannel(connection, connection.channel(), confirm, ack_batch)
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Channel:
+    """Batched channels"""
+
+    def test_confirm_mode(self):
+        """Confirm mode reports the confirms of the broker to a callback, without waiting for them"""
+        channel = make_channel(confirm=True)
+        assert channel.channel.confirming
+        assert not make_channel().channel.confirming
+        channel.basic_publish(exchange='', routing_key='reply', body=b'response')
+        assert channel.get_stats()['unconfirmed'] == 1
+        channel.connection.process_data_events()
+        assert (channel.get_stats()['unconfirmed'], channel.get_stats()['confirmed']) == (0, 1)
+
+    @pytest.mark.parametrize(
+        "nacks, published, dropped",
+        [(0, 1, 0),
+         (2, 1, 0),
+         (BatchedChannel._MAX_PUBLISH_ATTEMPTS, 0, 1)]
+    )
+    def test_republish(self, nacks, published, dropped):
+        """Messages rejected by the broker are published again, then dropped"""
+        channel = make_channel(confirm=True)
+        channel.channel.nack_publishes = nacks
+        channel.basic_publish(exchange='', routing_key='reply', body=b'response')
+        channel.connection.process_data_events()
+        assert len(channel.channel.published) == published
+        stats = channel.get_stats()
+        assert (stats['confirmed'], stats['republished'], stats['dropped']) == \
+               (published, min(nacks, BatchedChannel._MAX_PUBLISH_ATTEMPTS - 1), dropped)
+
+    def test_ack_after_confirm(self):
+        """A delivery is acknowledged once the messages published before it are confirmed"""
+        channel = make_channel(confirm=True)
+        channel.channel.auto_confirm = False
+        for tag in (1, 2, 3):
+            channel.basic_publish(exchange='', routing_key='reply', body=b'response')
+            channel.basic_ack(delivery_tag=tag)
+        assert channel.channel.acks == []
+        assert channel.pending == 3
+        channel.channel.confirm(2, multiple=True)
+        channel.connection.process_data_events()
+        assert channel.channel.acks == [(1, False), (2, False)]
+        channel.channel.confirm(3)
+        channel.connection.process_data_events()
+        assert channel.channel.acks == [(1, False), (2, False), (3, False)]
+        assert channel.pending == 0
+        assert channel.get_stats()['confirmed'] == 3
+
+    def test_ack_after_republish(self):
+        """A delivery whose response is rejected waits for the confirm of the republished response"""
+        channel = make_channel(confirm=True, ack_batch=2)
+        channel.channel.auto_confirm = False
+        for tag in (1, 2):
+            channel.basic_publish(exchange='', routing_key='reply', body=b'response')
+            channel.basic_ack(delivery_tag=tag)
+        channel.channel.confirm(1, nack=True)
+        channel.channel.confirm(2)
+        channel.connection.process_data_events()
+        assert channel.channel.acks == []
+        assert channel.get_stats()['republished'] == 1
+        channel.channel.confirm(3)
+        channel.connection.process_data_events()
+        assert channel.channel.acks == [(2, True)]
+        assert (channel.get_stats()['confirmed'], channel.pending) == (2, 0)
+
+    def test_ack_each(self):
+        """Without an acknowledgement batch, each delivery is acknowledged right away"""
+        channel = make_channel()
+        for tag in (2, 1):
+            channel.basic_ack(delivery_tag=tag)
+        assert channel.channel.acks == [(2, False), (1, False)]
+        assert channel.pending == 0
+
+    def test_ack_contiguous(self):
+        """Only the contiguous range of done deliveries is acknowledged"""
+        channel = make_channel(ack_batch=2)
+        for tag in (1, 3, 4):
+            channel.basic_ack(delivery_tag=tag)
+        assert channel.channel.acks == [(1, True)]
+        assert channel.pending == 2
+        channel.flush()
+        assert channel.channel.acks == [(1, True)]
+        channel.basic_ack(delivery_tag=2)
+        assert channel.channel.acks == [(1, True), (4, True)]
+        assert channel.pending == 0
+        assert (channel.stats['acks'], channel.stats['acked']) == (2, 4)
+
+    def test_nack_in_range(self):
+        """A rejected delivery closes the gap without being acknowledged"""
+        channel = make_channel(ack_batch=10)
+        channel.basic_ack(delivery_tag=1)
+        channel.basic_nack(delivery_tag=2)
+        channel.basic_ack(delivery_tag=3)
+        channel.flush()
+        assert channel.channel.nacks == [(2, True)]
+        assert channel.channel.acks == [(3, True)]
+        assert channel.stats['acked'] == 2
+
+    def test_multiple_refused(self):
+        """Acknowledging multiple deliveries is left to the batching"""
+        with pytest.raises(Exception):
+            make_channel().basic_ack(delivery_tag=1, multiple=True)
+
+    def test_service_confirm(self, make_service):
+        """A service with --confirm and --ack_batch answers and acknowledges its requests"""
+        service = make_service(EchoService, '--confirm', '--ack_batch', '2')
+        for tag in (1, 2, 3):
+            props = send_request(service, 'svc_api_echo', [str(tag)], delivery_tag=tag)
+            assert get_responses(service, props.correlation_id)[0]['result_data'] == str(tag)
+        channel = service.get_channel('requests')
+        assert channel.channel.confirming
+        assert channel.channel.acks == []
+        service.connection.process_data_events()
+        assert channel.channel.acks == [(2, True)]
+        assert service.flush_channels() == 0
+        assert channel.channel.acks == [(2, True), (3, True)]
+        assert channel.get_stats()['confirmed'] == 3
+
+    @pytest.mark.parametrize("cmd_args", [('--confirm',), ('--ack_batch', '8')])
+    def test_async_refused(self, broker, cmd_args):
+        """Asynchronous services refuse --confirm and --ack_batch"""
+        with pytest.raises(Exception, match="not supported"):
+            AsyncServiceBase(list(cmd_args))
+
+# eof class Test_Channel:
+
+# --------------------------------------------------------------------------------------------------------------
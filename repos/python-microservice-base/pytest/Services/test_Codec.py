@@ -0,0 +1,82 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Codec.py
+#
+# Wire codecs negotiated from the AMQP content_type.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceCodec import Codec, CODECS, JSON_CODEC, get_codec
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Codec:
+    """Encoding of requests and responses"""
+
+    @pytest.mark.parametrize("content_type", sorted(CODECS))
+    def test_round_trip(self, content_type):
+        """Each registered codec decodes what it encodes"""
+        codec = get_codec(content_type)
+        data = {'method': 'svc_api_add', 'args': [1, 'two', {'three': [3.0, None, True]}]}
+        assert codec.decode(codec.encode(data)) == data
+        assert codec.decode(codec.request_encoder('svc_api_add')(data['args'])) == data
+
+    @pytest.mark.parametrize("content_type", [None, '', 'text/plain'])
+    def test_default_codec(self, content_type):
+        """Requests without a known content type are JSON"""
+        assert get_codec(content_type) is JSON_CODEC
+
+    def test_json_decodes_buffers(self):
+        """The JSON codec decodes memoryviews without copying them to bytes"""
+        assert JSON_CODEC.decode(memoryview(b'{"a": 1}')) == {'a': 1}
+
+    @pytest.mark.parametrize("content_type", sorted(CODECS))
+    def test_response_codec(self, make_service, content_type):
+        """The response is encoded with the codec of the request"""
+        service = make_service(EchoService)
+        codec = get_codec(content_type)
+        props = send_request(service, 'svc_api_add', body=codec.encode({'method': 'svc_api_add', 'args': [2, 3]}),
+                             content_type=content_type)
+        message = service.get_channel('requests').channel.published[-1]
+        assert message['properties'].content_type == codec.content_type
+        assert codec.decode(message['body'])['result_data'] == 5
+        assert get_responses(service, props.correlation_id)[0]['result_data'] == 5
+
+    def test_incomplete_codec(self):
+        """A codec without decode cannot be created"""
+        class EncodeOnlyCodec(Codec):
+            content_type = 'application/x-encode-only'
+
+            def encode(self, data):
+                return b''
+
+        with pytest.raises(TypeError):
+            EncodeOnlyCodec()
+
+    def test_undecodable_request(self, make_service):
+        """A request which cannot be decoded is answered with an exception"""
+        service = make_service(EchoService)
+        props = send_request(service, 'svc_api_add', body=b'{not json')
+        assert get_responses(service, props.correlation_id)[0]['result'] == 'exception'
+
+# eof class Test_Codec:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,63 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Decode.py
+#
+# Decoding of the requests from the received buffers.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceBase import ServiceBase
+from ServiceCodec import JSON_CODEC
+import benchmark
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Decode:
+    """Request decoding"""
+
+    @pytest.mark.parametrize("buffer_type", [bytes, bytearray, memoryview])
+    def test_buffers(self, make_service, buffer_type):
+        """Requests are decoded from the received buffer type"""
+        service = make_service(EchoService)
+        body = buffer_type(json.dumps({'method': 'svc_api_echo', 'args': ['äö€']}).encode())
+        props = send_request(service, 'svc_api_echo', body=body)
+        assert get_responses(service, props.correlation_id)[0]['result_data'] == 'äö€'
+
+    def test_utf16(self):
+        """JSON bytes in another UTF encoding are detected"""
+        body = json.dumps({'method': 'svc_api_echo', 'args': ['x']}).encode('utf-16')
+        assert ServiceBase.decode_request(body, JSON_CODEC) == {'method': 'svc_api_echo', 'args': ['x']}
+
+    def test_decoded_request(self):
+        """Requests which are decoded already are kept"""
+        request = {'method': 'svc_api_echo', 'args': ['x']}
+        assert ServiceBase.decode_request(request, JSON_CODEC) is request
+
+    def test_peak_memory(self):
+        """Decoding a large request does not copy the payload several times"""
+        size = 1 << 20
+        peak, seconds = benchmark.measure_decode(JSON_CODEC, size, repeat=1)
+        assert peak < 2.5 * size
+        assert seconds > 0
+
+# eof class Test_Decode:
+
+# --------------------------------------------------------------------------------------------------------------
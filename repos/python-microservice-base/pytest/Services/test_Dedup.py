@@ -0,0 +1,142 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Dedup.py
+#
+# Deduplication of redelivered and repeated requests.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, pytest
+
+from conftest import EchoService, send_request, deliver_request, get_responses, wait_for
+
+from ServiceRegistry import ServiceRegistry
+from RequestDedupWindow import RequestDedupWindow
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Dedup:
+    """Dedupe window of the executed requests"""
+
+    def test_redelivery(self, make_service):
+        """A redelivered request is answered with the kept response without executing it again"""
+        service = make_service(EchoService)
+        for delivery_tag in (1, 2):
+            send_request(service, 'svc_api_add', ['1', '2'], delivery_tag=delivery_tag, correlation_id='c1')
+        assert service.calls == [('add', 1, 2)]
+        assert [response['result_data'] for response in get_responses(service, 'c1')] == [3, 3]
+        assert service.get_channel('requests').channel.acks == [(1, False), (2, False)]
+        assert service.svc_api_get_request_stats()['duplicates'] == 1
+
+    def test_reused_correlation_id(self, make_service):
+        """A reused correlation id does not answer another request with a wrong response"""
+        service = make_service(EchoService)
+        send_request(service, 'svc_api_add', ['1', '2'], correlation_id='c1')
+        send_request(service, 'svc_api_add', ['5', '5'], correlation_id='c1')
+        send_request(service, 'svc_api_echo', ['1'], correlation_id='c1')
+        assert [response['result_data'] for response in get_responses(service, 'c1')] == [3, 10, '1']
+        assert len(service.calls) == 3
+
+    @pytest.mark.parametrize(
+        "properties",
+        [{'headers': {RequestDedupWindow.IDEMPOTENCY_KEY_HEADER: 'toggle-1'}},
+         {'message_id': 'message-1'}]
+    )
+    def test_repeated_request(self, make_service, properties):
+        """Requests repeated with the same idempotency key or message id run once"""
+        service = make_service(EchoService)
+        send_request(service, 'svc_api_add', ['1', '2'], **properties)
+        props = send_request(service, 'svc_api_add', ['1', '2'], **properties)
+        assert service.calls == [('add', 1, 2)]
+        assert get_responses(service, props.correlation_id)[0]['result_data'] == 3
+
+    def test_disabled(self, make_service):
+        """A dedupe window of size 0 executes every request"""
+        service = make_service(EchoService, '--dedup_size', '0')
+        for delivery_tag in (1, 2):
+            send_request(service, 'svc_api_add', ['1', '2'], delivery_tag=delivery_tag, correlation_id='c1')
+        assert len(service.calls) == 2
+
+    def test_persisted(self, make_service, tmp_path):
+        """The dedupe window survives a restart of the service"""
+        dedup_file = str(tmp_path / 'dedup.jsonl')
+        service = make_service(EchoService, '--dedup_file', dedup_file)
+        send_request(service, 'svc_api_echo', ['once'], correlation_id='c1')
+        service.close()
+        restarted = make_service(EchoService, '--dedup_file', dedup_file)
+        send_request(restarted, 'svc_api_echo', ['once'], correlation_id='c1')
+        assert restarted.calls == []
+        assert get_responses(restarted, 'c1')[0]['result_data'] == 'once'
+
+    def test_duplicate_in_progress(self, make_service, serve):
+        """A redelivery arriving while the first delivery runs in another worker is parked until it is answered"""
+        service = make_service(EchoService, '--workers', '2')
+        serve(service)
+        for _ in range(2):
+            deliver_request(service, 'svc_api_sleep', [0.3], correlation_id='c1')
+        assert wait_for(lambda: len(get_responses(service, 'c1')) == 2)
+        assert service.calls == [('sleep', 0.3)]
+        assert [response['result_data'] for response in get_responses(service, 'c1')] == [0.3, 0.3]
+        assert wait_for(lambda: len(service.get_channel('requests').channel.acks) == 2)
+        assert service.svc_api_get_request_stats()['duplicates'] == 1
+
+    def test_parked_duplicate_discarded(self):
+        """A parked duplicate is handed back when the response of the first request is not kept"""
+        window = RequestDedupWindow(10)
+        answers = []
+        assert window.begin('k', answers.append) == (False, None)
+        assert window.begin('k', answers.append) == (True, None)
+        window.discard('k')
+        assert answers == [None]
+        assert window.begin('k', answers.append) == (False, None)
+        window.put('k', ('svc_api_echo', 'pass', 'x'))
+        assert window.begin('k', answers.append) == (True, ('svc_api_echo', 'pass', 'x'))
+
+    def test_persisted_bytes(self, tmp_path):
+        """Bytes results are loaded back as bytes, strings stay strings"""
+        dedup_file = str(tmp_path / 'dedup.jsonl')
+        window = RequestDedupWindow(10, dedup_file)
+        window.put('bytes', ('svc_api_read', 'pass', b'\x00\x01data'))
+        window.put('text', ('svc_api_echo', 'pass', 'AAFkYXRh'))
+        window.close()
+        restarted = RequestDedupWindow(10, dedup_file)
+        assert restarted.get('bytes') == (True, ('svc_api_read', 'pass', b'\x00\x01data'))
+        assert restarted.get('text') == (True, ('svc_api_echo', 'pass', 'AAFkYXRh'))
+        restarted.close()
+
+    def test_registry_alias_forward(self, broker, make_service, tmp_path, monkeypatch):
+        """A redelivered alias call of the ServiceRegistry is not forwarded again"""
+        forwarded = []
+
+        def responder(properties, body):
+            forwarded.append(json.loads(body))
+            return json.dumps({'request': 'svc_api_echo', 'result': 'pass', 'result_data': 'switched'}).encode()
+
+        broker.responders['EchoServiceKey'] = responder
+        monkeypatch.chdir(tmp_path)
+        registry = make_service(ServiceRegistry)
+        registry._alias_dict = {'power_on': {'Service name': 'EchoService', 'Method name': 'svc_api_echo',
+                                             'Arguments': '${input}'}}
+        registry.services_information = {'EchoService': dict(EchoService._SERVICE_INFO)}
+        for delivery_tag in (1, 2):
+            send_request(registry, 'power_on', ['3'], delivery_tag=delivery_tag, correlation_id='c1')
+        assert forwarded == [{'method': 'svc_api_echo', 'args': ['3']}]
+        assert [response['result_data'] for response in get_responses(registry, 'c1')] == ['switched', 'switched']
+
+# eof class Test_Dedup:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,106 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Dispatch.py
+#
+# Dispatch table of the service APIs, binding and coercion of the request arguments.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceApi import ServiceApi
+from ServiceBase import ServiceBase
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Dispatch:
+    """Dispatch and coercion of service API requests"""
+
+    @pytest.mark.parametrize(
+        "arg_type, value, expected",
+        [('int', '0x10', 16),
+         ('int', '010', 10),
+         ('int', ' 42 ', 42),
+         ('int', '-0x10', -16),
+         ('int', '0b101', 5),
+         ('int', '0o17', 15),
+         ('int', 7.0, 7),
+         ('float', '1.5', 1.5),
+         ('bool', 'yes', True),
+         ('bool', 'Off', False),
+         ('str', 12, '12'),
+         ('list', '[1, 2]', [1, 2]),
+         ('dict', {'a': 1}, {'a': 1})]
+    )
+    def test_coercers(self, arg_type, value, expected):
+        """Documented argument types convert the values received as strings"""
+        assert ServiceApi.get_coercer(arg_type)(value) == expected
+
+    @pytest.mark.parametrize("arg_type, value", [('int', 'ten'), ('int', '0x'), ('bool', 'maybe')])
+    def test_invalid_values(self, arg_type, value):
+        """Values which do not match the documented type are rejected"""
+        with pytest.raises(ValueError):
+            ServiceApi.get_coercer(arg_type)(value)
+
+    def test_dispatch_table_per_class(self):
+        """Each service class has its own dispatch table, including the inherited APIs"""
+        assert 'svc_api_echo' in EchoService._DISPATCH_TABLE
+        assert 'svc_api_get_version' in EchoService._DISPATCH_TABLE
+        assert 'svc_api_echo' not in ServiceBase._DISPATCH_TABLE
+
+    @pytest.mark.parametrize(
+        "args, expected",
+        [(['1', '2'], 3),
+         (['010', '0x10'], 26),
+         (['5'], 5),
+         ({'a': '1', 'b': '0x2'}, 3),
+         ({'b': 4, 'a': 1}, 5)]
+    )
+    def test_coerced_request(self, make_service, args, expected):
+        """Positional and keyword arguments of a request are coerced to the documented types"""
+        service = make_service(EchoService)
+        props = send_request(service, 'svc_api_add', args)
+        assert get_responses(service, props.correlation_id)[0] == {'request': 'svc_api_add', 'result': 'pass',
+                                                                   'result_data': expected}
+
+    @pytest.mark.parametrize(
+        "args, reason",
+        [(['1', '2', '3'], "takes 1 to 2 arguments but 3 were given"),
+         ([], "takes 1 to 2 arguments but 0 were given"),
+         (['one'], "Invalid arguments"),
+         ({'c': 1}, "Invalid arguments")]
+    )
+    def test_rejected_request(self, make_service, args, reason):
+        """Wrong calls are answered with an exception and the service API is not executed"""
+        service = make_service(EchoService)
+        props = send_request(service, 'svc_api_add', args)
+        response = get_responses(service, props.correlation_id)[0]
+        assert response['result'] == 'exception'
+        assert reason in response['result_data']
+        assert service.calls == []
+
+    def test_unknown_method(self, make_service):
+        """Requests of unknown service APIs fail"""
+        service = make_service(EchoService)
+        props = send_request(service, 'svc_api_unknown', [])
+        assert get_responses(service, props.correlation_id)[0]['result'] == 'fail'
+
+# eof class Test_Dispatch:
+
+# --------------------------------------------------------------------------------------------------------------
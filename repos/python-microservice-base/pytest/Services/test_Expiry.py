@@ -0,0 +1,86 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Expiry.py
+#
+# Requests dropped once their deadline passed.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, time, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceBase import ServiceBase
+from ServiceMessage import ResultType
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Expiry:
+    """Deadlines of the requests"""
+
+    @pytest.mark.parametrize(
+        "properties",
+        [{'headers': {ServiceBase._DEADLINE_HEADER: time.time() - 1}},
+         {'expiration': '500', 'timestamp': int(time.time()) - 2}]
+    )
+    def test_expired(self, make_service, properties):
+        """A request whose deadline passed is answered as expired without executing it"""
+        service = make_service(EchoService)
+        props = send_request(service, 'svc_api_echo', ['late'], delivery_tag=1, **properties)
+        response = get_responses(service, props.correlation_id)[0]
+        assert (response['request'], response['result']) == ('svc_api_echo', ResultType.EXPIRED)
+        assert service.calls == []
+        assert service.get_channel('requests').channel.acks == [(1, False)]
+        assert service.svc_api_get_request_stats()['expired'] == 1
+        assert 'service_expired_requests_total{service="EchoService"} 1' in service.get_prometheus_metrics()
+
+    @pytest.mark.parametrize(
+        "properties",
+        [{'headers': {ServiceBase._DEADLINE_HEADER: time.time() + 60}},
+         {'headers': {ServiceBase._DEADLINE_HEADER: 'soon'}},
+         {}]
+    )
+    def test_not_expired(self, make_service, properties):
+        """Requests before their deadline, with an invalid one or without one are executed"""
+        service = make_service(EchoService)
+        props = send_request(service, 'svc_api_echo', ['on time'], **properties)
+        assert get_responses(service, props.correlation_id)[0]['result_data'] == 'on time'
+        assert service.svc_api_get_request_stats()['expired'] == 0
+
+    def test_request_deadline(self, broker, make_service):
+        """request_service sends its timeout as the deadline header and the expiration of the message"""
+        broker.responders['OtherKey'] = lambda properties, body: json.dumps(
+            {'request': 'svc_api_echo', 'result': 'pass', 'result_data': 'x'}).encode()
+        service = make_service(EchoService)
+        started = time.time()
+        resp = service.request_service(service.create_request_data('svc_api_echo', ['x']),
+                                       ServiceBase._SERVICE_REQUEST_EXCHANGE, 'OtherKey', timeout=5)
+        assert resp['result_data'] == 'x'
+        properties = [props for _, key, props, _ in broker.published if key == 'OtherKey'][0]
+        assert started + 5 <= properties.headers[ServiceBase._DEADLINE_HEADER] <= time.time() + 5
+        assert properties.expiration == '5000'
+
+    def test_no_response_before_deadline(self, make_service):
+        """A request without response before its deadline is answered as expired"""
+        service = make_service(EchoService)
+        resp = service.request_service(service.create_request_data('svc_api_echo', ['x']),
+                                       ServiceBase._SERVICE_REQUEST_EXCHANGE, 'NobodyKey', timeout=0.2)
+        assert resp['result'] == ResultType.EXPIRED
+
+# eof class Test_Expiry:
+
+# --------------------------------------------------------------------------------------------------------------
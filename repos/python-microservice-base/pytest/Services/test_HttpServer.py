@@ -0,0 +1,120 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_HttpServer.py
+#
+# HTTP listener serving the metrics and the health endpoints.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, socket, http.client, pytest
+
+from conftest import EchoService, deliver_request, get_responses, wait_for
+
+# --------------------------------------------------------------------------------------------------------------
+
+class HardwareService(EchoService):
+    """Service with a hardware check"""
+
+    def __init__(self, cmd_args=None):
+        self.hardware = True
+        super(HardwareService, self).__init__(cmd_args)
+
+    def check_health(self):
+        return {'hardware': self.hardware}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def http_get(service, path):
+    connection = http.client.HTTPConnection('127.0.0.1', service._http_server.server_address[1], timeout=5)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.getheader('Content-Type'), response.read()
+    finally:
+        connection.close()
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_HttpServer:
+    """Metrics and health endpoints"""
+
+    def test_not_started(self, make_service):
+        """The listener is only started with --http_port or --http_socket"""
+        service = make_service(EchoService)
+        service.start_http_server()
+        assert service._http_server is None
+
+    def test_metrics(self, make_service, serve):
+        """/metrics serves the request metrics in the Prometheus text format"""
+        service = make_service(EchoService, '--http_port', str(free_port()))
+        serve(service)
+        props = deliver_request(service, 'svc_api_echo', ['a'])
+        assert wait_for(lambda: get_responses(service, props.correlation_id))
+        status, content_type, body = http_get(service, '/metrics')
+        assert status == 200 and content_type.startswith('text/plain')
+        assert 'service_request_duration_seconds_count{service="EchoService",method="svc_api_echo",phase="handler"} 1' \
+               in body.decode()
+
+    def test_health(self, make_service, serve):
+        """/healthz and /readyz report the broker, the consumer and the service checks, 503 if one fails"""
+        service = make_service(HardwareService, '--http_port', str(free_port()))
+        serve(service)
+        status, _, body = http_get(service, '/healthz')
+        assert (status, json.loads(body)) == (200, {'broker': True, 'consumer': True, 'hardware': True})
+        service.hardware = False
+        status, _, body = http_get(service, '/healthz')
+        assert status == 503 and json.loads(body)['hardware'] is False
+        assert http_get(service, '/readyz')[0] == 503
+        service.hardware = True
+        status, _, body = http_get(service, '/readyz')
+        assert status == 200 and json.loads(body)['accepting'] is True
+        assert http_get(service, '/unknown')[0] == 404
+
+    def test_not_serialized(self, make_service, serve):
+        """The endpoints answer while a serialized service API is running"""
+        service = make_service(EchoService, '--http_port', str(free_port()))
+        serve(service)
+        with service.get_api_lock(service.svc_api_echo):
+            assert http_get(service, '/healthz')[0] == 200
+            assert http_get(service, '/metrics')[0] == 200
+
+    def test_unix_socket(self, make_service, tmp_path):
+        """The listener can serve on a Unix socket"""
+        path = str(tmp_path / 'service.sock')
+        service = make_service(EchoService, '--http_socket', path)
+        service.start_http_server()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(path)
+            sock.sendall(b'GET /metrics HTTP/1.0\r\n\r\n')
+            response = b''
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                response += data
+        assert response.startswith(b'HTTP/1.0 200')
+        assert b'service_expired_requests_total' in response
+        service.close()
+        assert not (tmp_path / 'service.sock').exists()
+
+# eof class Test_HttpServer:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,78 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Metrics.py
+#
+# Per-method request counters and latency histograms.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import time, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceBase import ServiceBase
+from ServiceMetrics import LatencyHistogram, ServiceMetrics
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Metrics:
+    """Request metrics of the services"""
+
+    @pytest.mark.parametrize(
+        "seconds, bucket",
+        [(0.0001, 0),
+         (0.0005, 0),
+         (0.3, LatencyHistogram.BUCKETS.index(0.5)),
+         (60, len(LatencyHistogram.BUCKETS))]
+    )
+    def test_histogram_buckets(self, seconds, bucket):
+        """Samples are counted in the first bucket whose bound is not exceeded"""
+        hist = LatencyHistogram()
+        hist.observe(seconds)
+        assert hist.counts[bucket] == 1 and sum(hist.counts) == 1
+        assert hist.get_dict()['sum'] == pytest.approx(seconds)
+
+    def test_counts_and_errors(self, make_service):
+        """Requests and errors are counted per method"""
+        service = make_service(EchoService)
+        for method, args in (('svc_api_echo', ['a']), ('svc_api_echo', ['b']), ('svc_api_fail', [])):
+            send_request(service, method, args)
+        methods = service.svc_api_get_metrics()['methods']
+        assert (methods['svc_api_echo']['count'], methods['svc_api_echo']['errors']) == (2, 0)
+        assert (methods['svc_api_fail']['count'], methods['svc_api_fail']['errors']) == (1, 1)
+
+    def test_phases(self, make_service):
+        """The latency is split into queue wait, decode, handler and publish"""
+        service = make_service(EchoService)
+        send_request(service, 'svc_api_sleep', ['0.05'], headers={ServiceBase._SENT_HEADER: time.time() - 0.1})
+        latency = service.svc_api_get_metrics()['methods']['svc_api_sleep']['latency']
+        assert set(latency) == set(ServiceMetrics.PHASES)
+        assert all(sum(latency[phase]['counts']) == 1 for phase in ServiceMetrics.PHASES)
+        assert latency['queue']['sum'] >= 0.1
+        assert latency['handler']['sum'] >= 0.05
+
+    def test_inherited_api(self, make_service):
+        """Every service serves svc_api_get_metrics"""
+        service = make_service(EchoService)
+        props = send_request(service, 'svc_api_get_metrics')
+        metrics = get_responses(service, props.correlation_id)[0]['result_data']
+        assert metrics['buckets'] == list(LatencyHistogram.BUCKETS)
+        assert {'methods', 'cache', 'requests', 'connection', 'channels', 'startup'} <= set(metrics)
+
+# eof class Test_Metrics:
+
+# --------------------------------------------------------------------------------------------------------------
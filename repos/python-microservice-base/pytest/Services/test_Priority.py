@@ -0,0 +1,68 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Priority.py
+#
+# Opt-in request priorities of the service request queue.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import pika, pytest
+
+from conftest import EchoService, deliver_request, get_responses, wait_for
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Priority:
+    """Priorities of the requests"""
+
+    @pytest.mark.parametrize(
+        "cmd_args, arguments",
+        [((), None),
+         (('--max_priority', '5'), {'x-max-priority': 5})]
+    )
+    def test_queue_arguments(self, make_service, serve, cmd_args, arguments):
+        """The request queue is declared with x-max-priority only if --max_priority is set"""
+        service = make_service(EchoService, *cmd_args)
+        assert service._serve_args['max_priority'] == (5 if cmd_args else 0)
+        serve(service)
+        declared = [kwargs for kwargs in service.get_channel('control').channel.called('queue_declare')
+                    if kwargs['queue'] == service.name]
+        assert declared[0]['arguments'] == arguments
+
+    def test_argument_mismatch(self, make_service):
+        """A request queue declared with other arguments is not deleted, the service fails to start"""
+        service = make_service(EchoService, '--max_priority', '5')
+        channel = service.get_channel('control').channel
+        channel.fail_declare['queue_declare'] = pika.exceptions.ChannelClosedByBroker(406, 'PRECONDITION_FAILED')
+        with pytest.raises(Exception, match="--max_priority"):
+            service.serve()
+        assert channel.called('queue_delete') == []
+
+    def test_buffered_by_priority(self, make_service, serve):
+        """Deliveries buffered for the worker pool are executed by priority"""
+        service = make_service(EchoService, '--workers', '1', '--max_priority', '5')
+        serve(service)
+        deliver_request(service, 'svc_api_sleep', ['0.3'])
+        assert wait_for(lambda: service.calls)
+        for value, priority in (('low', 0), ('normal', None), ('high', 5)):
+            deliver_request(service, 'svc_api_echo', [value], priority=priority)
+        assert wait_for(lambda: len(get_responses(service)) == 4)
+        assert service.calls == [('sleep', 0.3), ('echo', 'high'), ('echo', 'low'), ('echo', 'normal')]
+
+# eof class Test_Priority:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,108 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Profiling.py
+#
+# Profiling and introspection APIs served with --enable_profiling.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import base64, marshal, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceBase import ServiceBase
+from ServiceCodec import BINARY_CONTENT_TYPE
+from ServiceMessage import ResultType
+
+# --------------------------------------------------------------------------------------------------------------
+
+def call(service, method, *args, **kwargs):
+    props = send_request(service, method, list(args), **kwargs)
+    return get_responses(service, props.correlation_id)[0]
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Profiling:
+    """Profiling APIs of the services"""
+
+    @pytest.mark.parametrize("method", ServiceBase._PROFILING_APIS)
+    def test_disabled_by_default(self, make_service, method):
+        """The profiling APIs are neither served nor advertised without --enable_profiling"""
+        service = make_service(EchoService)
+        response = call(service, method)
+        assert (response['result'], response['result_data']) == (ResultType.FAIL, "Non-supported request")
+        assert method not in service._SERVICE_INFO['methods']
+        assert method not in service._SERVICE_INFO['methods_info']
+
+    @pytest.mark.parametrize("method", ServiceBase._PROFILING_APIS)
+    def test_enabled(self, make_service, method):
+        """The profiling APIs are served and advertised with --enable_profiling"""
+        service = make_service(EchoService, '--enable_profiling')
+        assert method in service._SERVICE_INFO['methods']
+        assert call(service, 'svc_api_get_spans')['result'] == ResultType.PASS
+        assert call(service, 'svc_api_get_request_stats')['result_data'] == {'expired': 0, 'duplicates': 0}
+
+    def test_sampling(self, make_service):
+        """The sampling profiler returns collapsed stacks as the raw message body"""
+        service = make_service(EchoService, '--enable_profiling')
+        assert call(service, 'svc_api_profile_start', 'sampling', '0.001')['result_data'] == 'sampling'
+        call(service, 'svc_api_sleep', '0.05')
+        response = call(service, 'svc_api_profile_stop', headers={'accept': BINARY_CONTENT_TYPE})
+        profile = bytes(response['result_data']).decode()
+        assert 'svc_api_sleep' in profile
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in profile.splitlines())
+
+    @pytest.mark.parametrize("output", ['pstats', 'text'])
+    def test_cprofile(self, make_service, output):
+        """The cProfile profiler returns pstats data or text"""
+        service = make_service(EchoService, '--enable_profiling')
+        call(service, 'svc_api_profile_start', 'cprofile')
+        call(service, 'svc_api_echo', 'a')
+        profile = base64.b64decode(call(service, 'svc_api_profile_stop', output)['result_data'])
+        if output == 'pstats':
+            assert any(function[2] == 'svc_api_echo' for function in marshal.loads(profile))
+        else:
+            assert b'svc_api_echo' in profile
+
+    @pytest.mark.parametrize(
+        "calls",
+        [[('svc_api_profile_stop',)],
+         [('svc_api_profile_start',), ('svc_api_profile_start',)],
+         [('svc_api_profile_start', 'unknown')],
+         [('svc_api_profile_start', 'sampling'), ('svc_api_profile_stop', 'pstats')]]
+    )
+    def test_invalid_calls(self, make_service, calls):
+        """Invalid profiler calls are answered with an exception"""
+        service = make_service(EchoService, '--enable_profiling')
+        responses = [call(service, *api_call) for api_call in calls]
+        assert responses[-1]['result'] == ResultType.EXCEPT
+        if service._profiler is not None:
+            service.svc_api_profile_stop()
+
+    def test_cprofile_with_workers(self, make_service):
+        """The cProfile mode is refused when requests are executed by workers"""
+        service = make_service(EchoService, '--enable_profiling', '--workers', '2')
+        service._executor = object()
+        try:
+            with pytest.raises(Exception, match="sampling"):
+                service.svc_api_profile_start('cprofile')
+        finally:
+            service._executor = None
+
+# eof class Test_Profiling:
+
+# --------------------------------------------------------------------------------------------------------------
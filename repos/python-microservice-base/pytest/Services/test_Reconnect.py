@@ -0,0 +1,91 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Reconnect.py
+#
+# Reconnect of the broker with backoff and replay of the declared topology.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, pika, pytest
+
+from conftest import EchoService, deliver_request, get_responses, wait_for
+
+from ServiceBase import ServiceBase
+
+# --------------------------------------------------------------------------------------------------------------
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    """Reconnect without waiting"""
+    monkeypatch.setattr(ServiceBase, '_RECONNECT_BASE_DELAY', 0.001)
+
+def registrations(broker):
+    return [json.loads(body)['state'] for _, key, _, body in list(broker.published)
+            if key == ServiceBase._SERVICE_INFORMATION_ROUTING_KEY]
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Reconnect:
+    """Broker connection lost and restored"""
+
+    @pytest.mark.parametrize("attempt", [0, 3, 100])
+    def test_backoff(self, attempt):
+        """Reconnect delays grow exponentially with full jitter, up to the maximum delay"""
+        bound = min(ServiceBase._RECONNECT_MAX_DELAY, ServiceBase._RECONNECT_BASE_DELAY * 2 ** attempt)
+        delays = [ServiceBase.get_reconnect_delay(attempt) for _ in range(50)]
+        assert all(0 <= delay <= bound for delay in delays)
+        assert len(set(delays)) > 1
+
+    def test_broker_down_at_startup(self, broker, make_service, fast_backoff):
+        """A service started while the broker is down connects once it is up"""
+        broker.fail_connects = 3
+        service = make_service(EchoService)
+        assert service.connection is not None and service.connection.is_open
+        assert broker.fail_connects == 0
+
+    def test_connection_lost(self, broker, make_service, serve, fast_backoff):
+        """A lost connection is restored, with the topology, the consumer and the registration"""
+        service = make_service(EchoService)
+        serve(service)
+        lost = service.connection
+        broker.fail_connects = 2
+        lost.lost = pika.exceptions.ConnectionClosed(320, 'CONNECTION_FORCED')
+        assert wait_for(lambda: service.connection is not lost and service._consumer_tag is not None)
+        declared = [method for method, _ in service.get_channel('control').channel.calls
+                    if method in ('exchange_declare', 'queue_declare', 'queue_bind')]
+        assert declared[:3] == ['exchange_declare', 'queue_declare', 'queue_bind']
+        assert registrations(broker).count('on') == 2
+        props = deliver_request(service, 'svc_api_echo', ['again'])
+        assert wait_for(lambda: get_responses(service, props.correlation_id))
+        stats = service.svc_api_get_metrics()['connection']
+        assert stats['reconnects'] == 1
+        assert stats['last_reconnect_seconds'] is not None and stats['reconnect_seconds'] > 0
+
+    def test_stop_while_down(self, broker, make_service, serve, fast_backoff):
+        """A service requested to stop while the broker is down does not wait for it"""
+        service = make_service(EchoService)
+        thread = serve(service)
+        broker.fail_connects = 10 ** 6
+        service.connection.lost = pika.exceptions.ConnectionClosed(320, 'CONNECTION_FORCED')
+        assert wait_for(lambda: not service.connection.is_open)
+        service.stop()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+# eof class Test_Reconnect:
+
+# --------------------------------------------------------------------------------------------------------------
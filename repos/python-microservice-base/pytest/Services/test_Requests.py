@@ -0,0 +1,92 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Requests.py
+#
+# Requests to other services in flight at once, collected as futures or awaited.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, asyncio, pika
+from concurrent.futures import as_completed
+
+from conftest import EchoService, wait_for
+
+from ServiceBase import ServiceBase
+from RpcClient import RpcClient
+
+# --------------------------------------------------------------------------------------------------------------
+
+def echo_responder(properties, body):
+    request = json.loads(body)
+    return json.dumps({'request': request['method'], 'result': 'pass', 'result_data': request['args'][0]}).encode()
+
+def request_echo(service, routing_key, value, **kwargs):
+    return service.request_service_async(service.create_request_data('svc_api_echo', [value]),
+                                         ServiceBase._SERVICE_REQUEST_EXCHANGE, routing_key, **kwargs)
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Requests:
+    """Requests in flight at once"""
+
+    def test_many_in_flight(self, broker, make_service):
+        """Hundreds of requests to several services are collected as they finish"""
+        keys = ['KeyA', 'KeyB', 'KeyC']
+        for key in keys:
+            broker.responders[key] = echo_responder
+        service = make_service(EchoService)
+        futures = {request_echo(service, keys[index % 3], str(index), timeout=5): str(index) for index in range(300)}
+        for future in as_completed(futures, timeout=10):
+            resp = future.result()
+            assert resp['result_data'] == futures[future]
+            assert resp['attempts'] == 1
+        assert service.get_rpc_client().in_flight == 0
+
+    def test_out_of_order(self, broker, make_service):
+        """Responses arriving in any order resolve the future of their own request"""
+        received = []
+        broker.responders['SlowKey'] = lambda properties, body: received.append((properties, body))
+        service = make_service(EchoService)
+        futures = [request_echo(service, 'SlowKey', value, timeout=5) for value in ('a', 'b', 'c')]
+        assert wait_for(lambda: len(received) == 3)
+        connection = [connection for connection in broker.connections if RpcClient.REPLY_TO in connection.consumers][0]
+        for properties, body in reversed(received):
+            connection.deliver(RpcClient.REPLY_TO, pika.BasicProperties(correlation_id=properties.correlation_id,
+                                                                        content_type=properties.content_type),
+                               echo_responder(properties, body))
+        assert [future.result(timeout=5)['result_data'] for future in futures] == ['a', 'b', 'c']
+
+    def test_expired(self, broker, make_service):
+        """A request without response before its timeout resolves as expired"""
+        service = make_service(EchoService)
+        assert request_echo(service, 'NobodyKey', 'x', timeout=0.1).result(timeout=5)['result'] == 'expired'
+
+    def test_aio(self, broker, make_service):
+        """Requests awaited on an asyncio event loop are gathered at once"""
+        broker.responders['KeyA'] = echo_responder
+        service = make_service(EchoService)
+
+        async def gather():
+            return await asyncio.gather(*[service.request_service_aio(service.create_request_data('svc_api_echo', [str(index)]),
+                                                                      ServiceBase._SERVICE_REQUEST_EXCHANGE, 'KeyA', timeout=5)
+                                          for index in range(50)])
+
+        assert [resp['result_data'] for resp in asyncio.run(gather())] == [str(index) for index in range(50)]
+
+# eof class Test_Requests:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,157 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_ResponseCache.py
+#
+# Cached responses of idempotent service APIs.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import io, time, base64, zipfile, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceBase import cached, invalidates
+
+# --------------------------------------------------------------------------------------------------------------
+
+class StateService(EchoService):
+    """Service with a cached state read and an invalidating write"""
+
+    def __init__(self, cmd_args=None):
+        self.state = {}
+        self.reads = 0
+        super(StateService, self).__init__(cmd_args)
+
+    @cached(ttl=0.2, maxsize=2)
+    def svc_api_get_state(self, key):
+        """
+Get the state of a key.
+
+**Arguments:**
+
+* ``key``
+
+  / *Condition*: required / *Type*: str /
+
+  The key.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The state.
+        """
+        self.reads += 1
+        return self.state.get(key)
+
+    @invalidates('svc_api_get_state')
+    def svc_api_set_state(self, key, value):
+        """
+Set the state of a key.
+
+**Arguments:**
+
+* ``key``
+
+  / *Condition*: required / *Type*: str /
+
+  The key.
+
+* ``value``
+
+  / *Condition*: required / *Type*: str /
+
+  The state.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The state.
+        """
+        self.state[key] = value
+        return value
+
+class GuiService(StateService):
+    """Service with GUI support"""
+
+    _SERVICE_INFO = dict(StateService._SERVICE_INFO, name='GuiService', gui_support=True)
+
+def call(service, method, *args):
+    props = send_request(service, method, list(args))
+    return get_responses(service, props.correlation_id)[0]['result_data']
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_ResponseCache:
+    """Response cache of the cached service APIs"""
+
+    def test_hits(self, make_service):
+        """Repeated calls with the same arguments are answered from the cache"""
+        service = make_service(StateService)
+        service.state['a'] = 'on'
+        assert [call(service, 'svc_api_get_state', 'a') for _ in range(3)] == ['on'] * 3
+        assert service.reads == 1
+        stats = call(service, 'svc_api_get_cache_stats')['svc_api_get_state']
+        assert (stats['hits'], stats['misses']) == (2, 1)
+
+    def test_ttl(self, make_service):
+        """Cached responses expire after their time to live"""
+        service = make_service(StateService)
+        call(service, 'svc_api_get_state', 'a')
+        time.sleep(0.25)
+        call(service, 'svc_api_get_state', 'a')
+        assert service.reads == 2
+
+    def test_eviction(self, make_service):
+        """The least recently used response is evicted beyond maxsize"""
+        service = make_service(StateService)
+        for key in ('a', 'b', 'c', 'a'):
+            call(service, 'svc_api_get_state', key)
+        assert service.reads == 4
+        assert call(service, 'svc_api_get_cache_stats')['svc_api_get_state']['evictions'] == 2
+
+    def test_invalidation(self, make_service):
+        """Invalidating service APIs drop the cached responses"""
+        service = make_service(StateService)
+        assert call(service, 'svc_api_get_state', 'a') is None
+        call(service, 'svc_api_set_state', 'a', 'off')
+        assert call(service, 'svc_api_get_state', 'a') == 'off'
+        assert service.reads == 2
+
+    def test_idempotent_methods_info(self, make_service):
+        """Cached service APIs are registered as idempotent"""
+        service = make_service(StateService)
+        methods_info = service._SERVICE_INFO['methods_info']
+        assert methods_info['svc_api_get_state']['idempotent'] is True
+        assert methods_info['svc_api_set_state']['idempotent'] is False
+
+    def test_gui_files(self, make_service, capsys, tmp_path, monkeypatch):
+        """The cached svc_api_get_gui_files is documented and zips the GUIs folder"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'GUIs').mkdir()
+        (tmp_path / 'GUIs' / 'index.html').write_text('<html/>')
+        service = make_service(GuiService)
+        assert 'does not contain docstrings' not in capsys.readouterr().out
+        assert service._SERVICE_INFO['methods_info']['svc_api_get_gui_files']['return_type'].startswith('bytes')
+        archive = zipfile.ZipFile(io.BytesIO(base64.b64decode(call(service, 'svc_api_get_gui_files'))))
+        assert archive.namelist() == ['index.html']
+        assert not (tmp_path / 'files.zip').exists()
+
+# eof class Test_ResponseCache:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,139 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Retry.py
+#
+# Timeouts, retries and hedging of the requests to other services.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, time, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceBase import ServiceBase
+from ServiceRegistry import ServiceRegistry
+from RpcClient import ServiceCall
+
+# --------------------------------------------------------------------------------------------------------------
+
+class DroppingResponder:
+    """Responder answering the echo requests, except the first ones"""
+
+    def __init__(self, dropped):
+        self.dropped = dropped
+        self.requests = 0
+
+    def __call__(self, properties, body):
+        self.requests += 1
+        if self.requests <= self.dropped:
+            return None
+        request = json.loads(body)
+        return json.dumps({'request': request['method'], 'result': 'pass', 'result_data': request['args'][0]}).encode()
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    """Retry without waiting"""
+    monkeypatch.setattr(ServiceCall, '_RETRY_BASE_DELAY', 0.001)
+
+def request_echo(service, value, **kwargs):
+    return service.request_service(service.create_request_data('svc_api_echo', [value]),
+                                   ServiceBase._SERVICE_REQUEST_EXCHANGE, 'FlakyKey', **kwargs)
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Retry:
+    """Requests to services which are slow or down"""
+
+    def test_defaults(self, make_service):
+        """By default requests wait 30 seconds for their response and are not retried"""
+        serve_args = make_service(EchoService)._serve_args
+        assert (serve_args['request_timeout'], serve_args['request_retries'], serve_args['request_hedge']) == (30, 0, False)
+        assert make_service(EchoService, '--request_timeout', '0')._serve_args['request_timeout'] == 0
+
+    def test_timeout(self, make_service):
+        """A request without response resolves as expired at its timeout"""
+        service = make_service(EchoService)
+        started = time.monotonic()
+        resp = request_echo(service, 'x', timeout=0.2)
+        assert resp['result'] == 'expired'
+        assert resp['attempts'] == 1
+        assert 0.2 <= time.monotonic() - started < 2
+
+    def test_registry_forward_bounded(self, broker, make_service, tmp_path, monkeypatch):
+        """An alias call without deadline to a service which never answers expires, even with --request_timeout 0"""
+        broker.responders['EchoServiceKey'] = lambda properties, body: None
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(ServiceRegistry, '_DEFAULT_REQUEST_TIMEOUT', 0.2)
+        registry = make_service(ServiceRegistry, '--request_timeout', '0')
+        registry._alias_dict = {'power_on': {'Service name': 'EchoService', 'Method name': 'svc_api_echo',
+                                             'Arguments': '${input}'}}
+        registry.services_information = {'EchoService': dict(EchoService._SERVICE_INFO)}
+        started = time.monotonic()
+        props = send_request(registry, 'power_on', ['3'])
+        assert 0.2 <= time.monotonic() - started < 2
+        assert get_responses(registry, props.correlation_id)[0]['result'] == 'expired'
+
+    def test_retries(self, broker, make_service, fast_retries):
+        """Idempotent requests are sent again after an attempt timeout, the attempts are reported"""
+        broker.responders['FlakyKey'] = DroppingResponder(2)
+        service = make_service(EchoService)
+        resp = request_echo(service, 'x', timeout=5, idempotent=True, retries=3, attempt_timeout=0.1)
+        assert resp['result_data'] == 'x'
+        assert resp['attempts'] == 3
+
+    def test_retries_exhausted(self, broker, make_service, fast_retries):
+        """Once the retries are exhausted, the request resolves as expired"""
+        broker.responders['FlakyKey'] = DroppingResponder(10)
+        service = make_service(EchoService)
+        resp = request_echo(service, 'x', timeout=5, idempotent=True, retries=1, attempt_timeout=0.1)
+        assert resp['result'] == 'expired'
+        assert resp['attempts'] == 2
+
+    def test_not_idempotent(self, broker, make_service, fast_retries):
+        """Requests which are not idempotent are never retried"""
+        broker.responders['FlakyKey'] = DroppingResponder(1)
+        service = make_service(EchoService, '--request_retries', '3')
+        resp = request_echo(service, 'x', timeout=0.3, attempt_timeout=0.1)
+        assert resp['result'] == 'expired'
+        assert resp['attempts'] == 1
+        assert broker.responders['FlakyKey'].requests == 1
+
+    def test_hedge(self, broker, make_service):
+        """A request slower than the 95th percentile is hedged, the first response wins"""
+        broker.responders['FlakyKey'] = DroppingResponder(1)
+        service = make_service(EchoService)
+        assert service.get_hedge_delay('FlakyKey', 'svc_api_echo') is None
+        for _ in range(ServiceBase._HEDGE_MIN_SAMPLES):
+            service.observe_client_latency('FlakyKey', 'svc_api_echo', 0.05)
+        assert service.get_hedge_delay('FlakyKey', 'svc_api_echo') <= 0.1
+        started = time.monotonic()
+        resp = request_echo(service, 'x', timeout=5, idempotent=True, hedge=True)
+        assert resp['result_data'] == 'x'
+        assert resp['attempts'] == 2
+        assert time.monotonic() - started < 1
+
+    def test_no_hedge_without_samples(self, broker, make_service):
+        """Requests are not hedged while too few latencies are known"""
+        broker.responders['FlakyKey'] = DroppingResponder(1)
+        service = make_service(EchoService, '--request_hedge')
+        resp = request_echo(service, 'x', timeout=0.3, idempotent=True)
+        assert resp['result'] == 'expired'
+        assert resp['attempts'] == 1
+
+# eof class Test_Retry:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,114 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_RpcClient.py
+#
+# Requests in flight on the long-lived connection of the RPC client.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import threading, time, pika, pytest
+
+from conftest import make_properties, wait_for
+
+from RpcClient import RpcClient
+
+# --------------------------------------------------------------------------------------------------------------
+
+@pytest.fixture
+def rpc_client(broker):
+    """RPC client connected to the fake broker, closed at the end of the test"""
+    client = RpcClient(pika.ConnectionParameters())
+    yield client
+    client.close()
+
+def submit(client, body, routing_key='EchoKey', deadline=None):
+    return client.submit('', routing_key, make_properties(), body, deadline)
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_RpcClient:
+    """RPC client"""
+
+    def test_correlation(self, broker, rpc_client):
+        """Responses are matched to their request by correlation id"""
+        broker.responders['EchoKey'] = lambda properties, body: body
+        futures = [submit(rpc_client, str(index).encode()) for index in range(10)]
+        assert [future.result(timeout=5)[1] for future in futures] == [str(index).encode() for index in range(10)]
+        assert all(props.reply_to == RpcClient.REPLY_TO for _, _, props, _ in broker.published)
+        assert rpc_client.in_flight == 0
+
+    def test_expiry(self, broker, rpc_client):
+        """Requests without a response before their deadline are resolved with None"""
+        future = submit(rpc_client, b'lost', deadline=time.time() + 0.1)
+        assert future.result(timeout=5) is None
+        assert rpc_client.in_flight == 0
+
+    def test_one_connection(self, broker, rpc_client):
+        """Concurrent first requests wait for the same connection"""
+        broker.connect_delay = 0.2
+        broker.responders['EchoKey'] = lambda properties, body: body
+        futures = []
+        threads = [threading.Thread(target=lambda: futures.append(submit(rpc_client, b'first'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [future.result(timeout=5)[1] for future in futures] == [b'first'] * 5
+        assert len(broker.connections) == 1
+
+    def test_lock_free_while_connecting(self, broker, rpc_client):
+        """The lock of the client is not held while the broker is connected"""
+        broker.connect_delay = 0.5
+        connecting = threading.Thread(target=submit, args=(rpc_client, b'first'))
+        connecting.start()
+        time.sleep(0.1)
+        started = time.monotonic()
+        rpc_client.discard('unknown')
+        assert time.monotonic() - started < 0.2
+        connecting.join()
+
+    def test_connect_failure(self, broker, rpc_client):
+        """A failed connect is raised to the waiting callers, the next request connects again"""
+        broker.fail_connects = 1
+        with pytest.raises(Exception, match="Unable to connect broker"):
+            submit(rpc_client, b'first')
+        broker.responders['EchoKey'] = lambda properties, body: body
+        assert submit(rpc_client, b'second').result(timeout=5)[1] == b'second'
+
+    def test_connection_lost(self, broker, rpc_client):
+        """Requests in flight fail when the connection is lost, the next request connects again"""
+        future = submit(rpc_client, b'first')
+        assert wait_for(lambda: broker.published)
+        broker.connections[0].lost = pika.exceptions.ConnectionClosed(320, 'CONNECTION_FORCED')
+        with pytest.raises(Exception, match="Connection to broker lost"):
+            future.result(timeout=5)
+        broker.responders['EchoKey'] = lambda properties, body: body
+        assert submit(rpc_client, b'second').result(timeout=5)[1] == b'second'
+        assert len(broker.connections) == 2
+
+    def test_close(self, broker, rpc_client):
+        """Requests in flight fail when the client is closed, no request is sent anymore"""
+        future = submit(rpc_client, b'first')
+        rpc_client.close()
+        with pytest.raises(Exception, match="closed"):
+            future.result(timeout=5)
+        with pytest.raises(Exception, match="closed"):
+            submit(rpc_client, b'second')
+
+# eof class Test_RpcClient:
+
+# --------------------------------------------------------------------------------------------------------------
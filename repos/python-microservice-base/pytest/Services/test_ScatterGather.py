@@ -0,0 +1,118 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_ScatterGather.py
+#
+# Fan-out of a request to many registered services, gathered until a global deadline.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, time, pytest
+
+from conftest import EchoService
+
+from ServiceBase import ServiceBase
+
+# --------------------------------------------------------------------------------------------------------------
+
+SERVICES = {
+    'LabA': ('lab', 'power'),
+    'LabB': ('lab', 'relay'),
+    'Bench': ('bench', 'power'),
+    'Slow': ('lab', 'power'),
+}
+
+def version_responder(name):
+    def respond(properties, body):
+        request = json.loads(body)
+        return json.dumps({'request': request['method'], 'result': 'pass',
+                           'result_data': f"{name} {' '.join(request['args'])}".strip()}).encode()
+    return respond
+
+@pytest.fixture
+def service(broker, make_service):
+    """Service requesting the registered services, the Slow one never answers"""
+    services_info = {name: dict(ServiceBase._SERVICE_INFO, name=name, routing_key=f'{name}Key', group=group, tag=tag)
+                     for name, (group, tag) in SERVICES.items()}
+    broker.responders[ServiceBase._SERVICE_REGISTRY_ROUTING_KEY] = lambda properties, body: json.dumps(
+        {'request': 'svc_api_get_services_info', 'result': 'pass', 'result_data': json.dumps(services_info)}).encode()
+    for name in SERVICES:
+        if name != 'Slow':
+            broker.responders[f'{name}Key'] = version_responder(name)
+    return make_service(EchoService)
+
+def results(responses):
+    return {name: (resp['result'], resp.get('result_data')) for name, resp in responses.items()}
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_ScatterGather:
+    """Fan-out requests"""
+
+    def test_partial_results(self, broker, service):
+        """All services are requested at once, the ones missing the deadline are reported as expired"""
+        started = time.monotonic()
+        responses = service.scatter_gather(service.create_request_data('svc_api_get_version', []), timeout=0.3)
+        assert time.monotonic() - started < 1
+        assert {name: resp['result'] for name, resp in responses.items()} == \
+               {'LabA': 'pass', 'LabB': 'pass', 'Bench': 'pass', 'Slow': 'expired'}
+        assert [responses[name]['result_data'] for name in ('LabA', 'LabB', 'Bench')] == ['LabA', 'LabB', 'Bench']
+        assert service.get_rpc_client().in_flight == 0
+
+    @pytest.mark.parametrize("cmd_args", [('--request_timeout', '0.3'), ('--request_timeout', '0')])
+    def test_default_deadline(self, service, make_service, monkeypatch, cmd_args):
+        """Without timeout, a service which never answers expires at --request_timeout, or at the default deadline"""
+        monkeypatch.setattr(ServiceBase, '_DEFAULT_REQUEST_TIMEOUT', 0.3)
+        gatherer = make_service(EchoService, *cmd_args)
+        started = time.monotonic()
+        responses = gatherer.scatter_gather(gatherer.create_request_data('svc_api_get_version', []))
+        assert 0.3 <= time.monotonic() - started < 2
+        assert results(responses)['Slow'][0] == 'expired'
+        assert results(responses)['LabA'] == ('pass', 'LabA')
+
+    @pytest.mark.parametrize(
+        "group, tag, names",
+        [('lab', None, ['LabA', 'LabB', 'Slow']),
+         (None, 'power', ['LabA', 'Bench', 'Slow']),
+         ('lab', 'relay', ['LabB'])]
+    )
+    def test_filters(self, broker, service, group, tag, names):
+        """Only the services of the given group and tag are requested"""
+        responses = service.scatter_gather(service.create_request_data('svc_api_get_version', []),
+                                           group=group, tag=tag, timeout=0.3)
+        assert sorted(responses) == sorted(names)
+        requested = [key for _, key, _, _ in broker.published if key.endswith('Key') and key != 'EchoServiceKey']
+        assert sorted(requested) == sorted(f'{name}Key' for name in names)
+
+    def test_named_services(self, service):
+        """Named services are requested in the given order, unknown ones fail"""
+        responses = service.scatter_gather(service.create_request_data('svc_api_get_version', []),
+                                           services=['Bench', 'Missing', 'LabA'], timeout=1)
+        assert list(responses) == ['Bench', 'Missing', 'LabA']
+        assert results(responses)['Missing'][0] == 'fail'
+
+    def test_request_per_service(self, service):
+        """Each service gets its own request, services without one are skipped"""
+        def request_data(name, info):
+            return None if name == 'Slow' else service.create_request_data('svc_api_get_version', [info['tag']])
+
+        responses = service.scatter_gather(request_data, timeout=1)
+        assert results(responses) == {'LabA': ('pass', 'LabA power'), 'LabB': ('pass', 'LabB relay'),
+                                      'Bench': ('pass', 'Bench power')}
+
+# eof class Test_ScatterGather:
+
+# --------------------------------------------------------------------------------------------------------------
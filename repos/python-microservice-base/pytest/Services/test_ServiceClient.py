@@ -0,0 +1,124 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_ServiceClient.py
+#
+# Typed clients generated from the methods_info of the services.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, inspect, pytest
+
+from conftest import EchoService
+
+from ServiceBase import ServiceBase
+from ServiceClient import ServiceClient, generate_client, generate_client_source
+
+# --------------------------------------------------------------------------------------------------------------
+
+def echo_responder(properties, body):
+    request = json.loads(body)
+    return json.dumps({'request': request['method'], 'result': 'pass', 'result_data': request['args']}).encode()
+
+def compile_client(source):
+    namespace = {'ServiceClient': ServiceClient}
+    exec(compile(source, '<client>', 'exec'), namespace)
+    return [value for value in namespace.values()
+            if isinstance(value, type) and value is not ServiceClient and issubclass(value, ServiceClient)]
+
+@pytest.fixture
+def client(broker, make_service):
+    """Client of the EchoService, requested through another service"""
+    broker.responders['EchoServiceKey'] = echo_responder
+    service = make_service(EchoService)
+    services_info = {'EchoService': service._SERVICE_INFO}
+    broker.responders[ServiceBase._SERVICE_REGISTRY_ROUTING_KEY] = lambda properties, body: json.dumps(
+        {'request': 'svc_api_get_services_info', 'result': 'pass', 'result_data': json.dumps(services_info)}).encode()
+    return service.get_service_client('EchoService', timeout=5)
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_ServiceClient:
+    """Generated service clients"""
+
+    def test_call(self, broker, client):
+        """A client method sends the checked and converted arguments of the service API"""
+        assert type(client).__name__ == 'EchoClient'
+        assert client.add('1', 2)['result_data'] == [1, 2]
+        assert client.echo(value='x')['result_data'] == ['x']
+        assert broker.requests('EchoServiceKey') == [{'method': 'svc_api_add', 'args': [1, 2]},
+                                                     {'method': 'svc_api_echo', 'args': ['x']}]
+
+    @pytest.mark.parametrize(
+        "args, kwargs, error",
+        [((), {}, "misses the required argument 'a'"),
+         ((1, 2, 3), {}, "at most 2 arguments"),
+         ((1,), {'c': 3}, "unexpected arguments: c"),
+         (('one',), {}, "Invalid arguments")]
+    )
+    def test_invalid_arguments(self, broker, client, args, kwargs, error):
+        """Invalid arguments are refused before anything is sent"""
+        with pytest.raises(Exception, match=error):
+            client.add(*args, **kwargs)
+        assert broker.requests('EchoServiceKey') == []
+
+    def test_signature(self, client):
+        """The client methods have the documented arguments and types of the service APIs"""
+        signature = inspect.signature(type(client).add)
+        assert list(signature.parameters) == ['self', 'a', 'b']
+        assert signature.parameters['a'].annotation is int
+        assert signature.parameters['b'].default is None
+        assert signature.return_annotation is dict
+        assert type(client).add.__qualname__ == 'EchoClient.add'
+        assert "``svc_api_add``" in type(client).add.__doc__
+
+    def test_source(self, make_service):
+        """The emitted source defines the same client as the generated class"""
+        service_info = make_service(EchoService)._SERVICE_INFO
+        generated = generate_client(service_info)
+        emitted = compile_client(generate_client_source(service_info))
+        assert [cls.__name__ for cls in emitted] == [generated.__name__]
+        assert emitted[0].METHODS == generated.METHODS
+        for method_name in generated.METHODS:
+            name = method_name[len('svc_api_'):]
+            assert str(inspect.signature(getattr(emitted[0], name))) == str(inspect.signature(getattr(generated, name)))
+
+    def test_invalid_names(self):
+        """Registered names which are no identifiers are neither emitted nor generated"""
+        service_info = {
+            'name': 'Bad\nService """', 'routing_key': 'BadKey', 'version': '1"""\nimport os',
+            'methods_info': {
+                'svc_api_ok': {'arguments': [{'name': 'x', 'type': 'str', 'description': 'x"""; import os'}]},
+                'svc_api_x(): pass\nimport os\ndef y': {'arguments': []},
+                'svc_api_args': {'arguments': [{'name': 'a=os.system("")'}]},
+                'svc_api_twice': {'arguments': [{'name': 'a'}, {'name': 'a'}]},
+                'svc_api_call': {'arguments': []},
+            }
+        }
+        emitted = compile_client(generate_client_source(service_info))
+        generated = generate_client(service_info)
+        for cls in emitted + [generated]:
+            assert list(cls.METHODS) == ['svc_api_ok']
+            assert cls.SERVICE_NAME == service_info['name']
+        assert generated.__name__ == 'Bad_Service____Client'
+        with pytest.raises(Exception, match="Invalid client class name"):
+            generate_client_source(service_info, 'Bad(Client)')
+        with pytest.raises(Exception, match="Invalid client class name"):
+            generate_client(service_info, 'class')
+
+# eof class Test_ServiceClient:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,94 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Shutdown.py
+#
+# Graceful drain and shutdown of a serving service.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, time, pytest
+
+from conftest import EchoService, deliver_request, get_responses, wait_for
+
+from ServiceBase import ServiceBase
+
+# --------------------------------------------------------------------------------------------------------------
+
+def registrations(broker):
+    return [json.loads(body)['state'] for _, key, _, body in list(broker.published)
+            if key == ServiceBase._SERVICE_INFORMATION_ROUTING_KEY]
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Shutdown:
+    """Lifecycle of a stopping service"""
+
+    def test_drain(self, broker, make_service, serve):
+        """A running request is answered and acknowledged before the service unregisters"""
+        service = make_service(EchoService, '--workers', '2')
+        thread = serve(service)
+        props = deliver_request(service, 'svc_api_sleep', ['0.3'])
+        assert wait_for(lambda: service.calls)
+        service.stop()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert get_responses(service, props.correlation_id)[0]['result_data'] == 0.3
+        assert service.get_channel('requests').channel.acks
+        assert registrations(broker)[-1] == 'off'
+        assert not service.connection.is_open
+        assert service.name not in service.connection.consumers
+
+    def test_hand_back(self, make_service, serve):
+        """Buffered requests which have not started are handed back to the broker"""
+        service = make_service(EchoService, '--workers', '1')
+        thread = serve(service)
+        deliver_request(service, 'svc_api_sleep', ['1.5'])
+        assert wait_for(lambda: service.calls)
+        for value in ('a', 'b'):
+            deliver_request(service, 'svc_api_echo', [value])
+        assert wait_for(lambda: len(service._buffered_requests) == 2)
+        service.stop()
+        thread.join(timeout=5)
+        assert service.calls == [('sleep', 1.5)]
+        nacks = [nack for channel in service.connection.channels for nack in channel.nacks]
+        assert len(nacks) == 2 and all(requeue for _, requeue in nacks)
+        assert len(get_responses(service)) == 1
+
+    def test_grace_period(self, broker, make_service, serve):
+        """The shutdown does not wait for a running request longer than the grace period"""
+        service = make_service(EchoService, '--workers', '1', '--grace_period', '0.2')
+        thread = serve(service)
+        deliver_request(service, 'svc_api_sleep', ['3'])
+        assert wait_for(lambda: service.calls)
+        started = time.monotonic()
+        service.stop()
+        thread.join(timeout=5)
+        assert time.monotonic() - started < 2
+        assert get_responses(service) == []
+        assert registrations(broker)[-1] == 'off'
+
+    def test_close_without_connection(self, broker, make_service):
+        """Closing a service which never served opens no connection"""
+        service = make_service(EchoService)
+        connections = len(broker.connections)
+        service.shutdown()
+        assert len(broker.connections) == connections
+        assert service._closed
+
+# eof class Test_Shutdown:
+
+# --------------------------------------------------------------------------------------------------------------
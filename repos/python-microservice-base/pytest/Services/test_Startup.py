@@ -0,0 +1,86 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Startup.py
+#
+# Service startup with the broker connected in parallel to the initialization.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import time, pytest
+
+from conftest import EchoService, deliver_request, get_responses, wait_for
+
+# --------------------------------------------------------------------------------------------------------------
+
+class HardwareService(EchoService):
+    """Service with a slow hardware initialization"""
+
+    def __init__(self, cmd_args=None):
+        super(HardwareService, self).__init__(cmd_args)
+        with self.startup_phase('hardware'):
+            time.sleep(0.3)
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Startup:
+    """Startup of the services"""
+
+    @pytest.mark.parametrize(
+        "cmd_args, bounds",
+        [((), (0.6, 5)),
+         (('--parallel_init',), (0.3, 0.55))]
+    )
+    def test_parallel_init(self, broker, make_service, cmd_args, bounds):
+        """With --parallel_init, the broker is connected while the service initializes"""
+        broker.connect_delay = 0.3
+        started = time.monotonic()
+        service = make_service(HardwareService, *cmd_args)
+        assert bounds[0] <= time.monotonic() - started < bounds[1]
+        service.wait_broker_session()
+        assert service.connection is not None and service.connection.is_open
+
+    def test_phases(self, make_service, serve):
+        """Each startup phase is timed and reported once the service serves requests"""
+        service = make_service(HardwareService, '--parallel_init')
+        serve(service)
+        startup = service.svc_api_get_metrics()['startup']
+        assert {'arguments', 'metadata', 'connect', 'register', 'hardware', 'topology', 'total'} <= set(startup)
+        assert startup['hardware'] >= 0.3
+        props = deliver_request(service, 'svc_api_echo', ['ready'])
+        assert wait_for(lambda: get_responses(service, props.correlation_id))
+
+    def test_broker_session_failed(self, broker, make_service):
+        """A broker session failed in the background is raised when serving"""
+        broker.close()
+        service = make_service(EchoService, '--parallel_init')
+        service.stop()
+        with pytest.raises(Exception):
+            service.serve()
+        assert service._closed
+
+    def test_metadata_per_class(self, make_service):
+        """The API metadata is parsed once per service class"""
+        table = EchoService._DISPATCH_TABLE
+        first = make_service(EchoService)
+        second = make_service(EchoService)
+        assert EchoService._DISPATCH_TABLE is table
+        assert first._api_info_dict['svc_api_add'] == table['svc_api_add'].info | {'idempotent': False}
+        assert second._api_info_dict == first._api_info_dict
+
+# eof class Test_Startup:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,96 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Topology.py
+#
+# Declared topology cache and the long-lived control connection.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, threading, pytest
+
+from conftest import EchoService
+
+from ServiceBase import ServiceBase
+
+# --------------------------------------------------------------------------------------------------------------
+
+def echo_responder(properties, body):
+    request = json.loads(body)
+    return json.dumps({'request': request['method'], 'result': 'pass', 'result_data': request['args'][0]}).encode()
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Topology:
+    """Control traffic of the services"""
+
+    def test_declare_once(self, make_service):
+        """An entity is declared once, then the declare is skipped"""
+        service = make_service(EchoService)
+        channel = service.get_channel('control')
+        assert service.declare(channel, 'exchange_declare', exchange='updates', exchange_type='fanout') is not None
+        assert service.declare(channel, 'exchange_declare', exchange='updates', exchange_type='fanout') is None
+        assert channel.channel.called('exchange_declare').count({'exchange': 'updates', 'exchange_type': 'fanout'}) == 1
+
+    def test_registrations(self, broker, make_service):
+        """Registrations are published on one connection, the registry queue is declared once"""
+        service = make_service(EchoService)
+        connections = len(broker.connections)
+        service.register_service()
+        service.unregister_service()
+        assert len(broker.connections) == connections
+        channel = service.get_channel('control').channel
+        assert [kwargs['queue'] for kwargs in channel.called('queue_declare')] == [ServiceBase._SERVICE_INFORMATION_QUEUE]
+        states = [json.loads(message['body'])['state'] for message in channel.published]
+        assert states == ['on', 'on', 'off']
+
+    def test_replay(self, make_service):
+        """The recorded topology is declared again in order on a new control channel"""
+        service = make_service(EchoService)
+        recorded = list(service._topology)
+        service.connection = service.connection.broker.connect()
+        service._channels = {}
+        service.replay_topology()
+        calls = service.get_channel('control').channel.calls
+        assert [(method, kwargs) for method, kwargs in calls] == recorded
+
+    def test_publish_from_other_thread(self, make_service):
+        """Control messages of other threads are published by the thread owning the connection"""
+        service = make_service(EchoService)
+        publisher = threading.Thread(target=service.publish_control, args=('updates', '', 'state'))
+        publisher.start()
+        publisher.join()
+        channel = service.get_channel('control').channel
+        assert [message['body'] for message in channel.published].count('state') == 0
+        service.connection.process_data_events(time_limit=0)
+        assert [message['body'] for message in channel.published].count('state') == 1
+
+    def test_one_client_connection(self, broker, make_service):
+        """Requests to other services share one long-lived client connection"""
+        broker.responders['OtherKey'] = echo_responder
+        service = make_service(EchoService)
+        for value in ('a', 'b', 'c'):
+            resp = service.request_service(service.create_request_data('svc_api_echo', [value]),
+                                           ServiceBase._SERVICE_REQUEST_EXCHANGE, 'OtherKey', timeout=5)
+            assert resp['result_data'] == value
+        connections = len(broker.connections)
+        service.request_service(service.create_request_data('svc_api_echo', ['d']),
+                                ServiceBase._SERVICE_REQUEST_EXCHANGE, 'OtherKey', timeout=5)
+        assert len(broker.connections) == connections
+
+# eof class Test_Topology:
+
+# --------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,102 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_Tracing.py
+#
+# Trace spans propagated across the services with the W3C traceparent header.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import json, pika, pytest
+
+from conftest import EchoService, send_request, get_responses
+
+from ServiceRegistry import ServiceRegistry
+from SpanRecorder import SpanRecorder
+
+# --------------------------------------------------------------------------------------------------------------
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+CALLER_ID = '00f067aa0ba902b7'
+TRACEPARENT = f'00-{TRACE_ID}-{CALLER_ID}-01'
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_Tracing:
+    """Trace spans of the requests"""
+
+    @pytest.mark.parametrize(
+        "value, context",
+        [(TRACEPARENT, (TRACE_ID, CALLER_ID)),
+         (TRACEPARENT.encode(), (TRACE_ID, CALLER_ID)),
+         ('00-short-id-01', None),
+         (None, None)]
+    )
+    def test_parse_traceparent(self, value, context):
+        """Only valid traceparent headers give a trace context"""
+        headers = {SpanRecorder.TRACEPARENT_HEADER: value} if value is not None else None
+        assert SpanRecorder.parse_traceparent(pika.BasicProperties(headers=headers)) == context
+
+    def test_server_span(self, make_service):
+        """A traced request is recorded as a child span of the caller with its phases"""
+        service = make_service(EchoService)
+        send_request(service, 'svc_api_echo', ['a'], headers={SpanRecorder.TRACEPARENT_HEADER: TRACEPARENT})
+        span = service._spans.get_spans(TRACE_ID)[0]
+        assert (span['kind'], span['name'], span['parentId']) == ('SERVER', 'svc_api_echo', CALLER_ID)
+        assert span['localEndpoint'] == {'serviceName': 'EchoService'}
+        assert 'handler.seconds' in span['tags'] and 'error' not in span['tags']
+
+    def test_new_trace(self, make_service):
+        """A request without trace context starts a new trace, failures are tagged"""
+        service = make_service(EchoService)
+        send_request(service, 'svc_api_fail')
+        span = service._spans.get_spans()[-1]
+        assert 'parentId' not in span and len(span['traceId']) == 32
+        assert span['tags']['error'] == 'true'
+
+    def test_alias_forward(self, broker, make_service, tmp_path, monkeypatch):
+        """An alias call forwarded by the ServiceRegistry stays in the trace of the caller"""
+        forwarded = []
+
+        def responder(properties, body):
+            forwarded.append(SpanRecorder.parse_traceparent(properties))
+            return json.dumps({'request': 'svc_api_echo', 'result': 'pass', 'result_data': 'switched'}).encode()
+
+        broker.responders['EchoServiceKey'] = responder
+        monkeypatch.chdir(tmp_path)
+        registry = make_service(ServiceRegistry)
+        registry._alias_dict = {'power_on': {'Service name': 'EchoService', 'Method name': 'svc_api_echo',
+                                             'Arguments': '${input}'}}
+        registry.services_information = {'EchoService': dict(EchoService._SERVICE_INFO)}
+        props = send_request(registry, 'power_on', ['3'], headers={SpanRecorder.TRACEPARENT_HEADER: TRACEPARENT})
+        assert get_responses(registry, props.correlation_id)[0]['result_data'] == 'switched'
+        spans = {span['kind']: span for span in registry._spans.get_spans(TRACE_ID)}
+        assert spans['SERVER']['parentId'] == CALLER_ID
+        assert spans['CLIENT']['parentId'] == spans['SERVER']['id']
+        assert forwarded == [(TRACE_ID, spans['CLIENT']['id'])]
+
+    def test_trace_file(self, make_service, tmp_path):
+        """Spans are appended to the trace file as JSON lines"""
+        trace_file = tmp_path / 'spans.jsonl'
+        service = make_service(EchoService, '--trace_file', str(trace_file), '--trace_size', '1')
+        for value in ('a', 'b'):
+            send_request(service, 'svc_api_echo', [value])
+        assert len(service._spans.get_spans()) == 1
+        assert [json.loads(line)['name'] for line in trace_file.read_text().splitlines()] == ['svc_api_echo'] * 2
+
+# eof class Test_Tracing:
+
+# --------------------------------------------------------------------------------------------------------------
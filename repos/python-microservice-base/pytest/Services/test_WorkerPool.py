@@ -0,0 +1,92 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_WorkerPool.py
+#
+# Requests executed on the connection thread or in the worker pool (--workers).
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import time, pytest
+
+from conftest import EchoService, send_request, deliver_request, get_responses, wait_for
+
+# --------------------------------------------------------------------------------------------------------------
+
+class OverlapService(EchoService):
+    """Service recording how many calls of a serialized service API overlap"""
+
+    def __init__(self, cmd_args=None):
+        self.running = 0
+        self.overlaps = []
+        super(OverlapService, self).__init__(cmd_args)
+
+    def svc_api_echo(self, value):
+        self.overlaps.append(self.running)
+        self.running += 1
+        time.sleep(0.05)
+        self.running -= 1
+        return value
+
+    svc_api_echo.__doc__ = EchoService.svc_api_echo.__doc__
+
+class Test_WorkerPool:
+    """Execution of requests with and without worker threads"""
+
+    def test_connection_thread(self, make_service):
+        """Without workers, the request is answered and acknowledged before on_request returns"""
+        service = make_service(EchoService)
+        props = send_request(service, 'svc_api_echo', ['hello'], delivery_tag=7)
+        responses = get_responses(service, props.correlation_id)
+        assert responses == [{'request': 'svc_api_echo', 'result': 'pass', 'result_data': 'hello'}]
+        assert service.get_channel('requests').channel.acks == [(7, False)]
+
+    @pytest.mark.parametrize("workers", [4])
+    def test_parallel_workers(self, make_service, serve, workers):
+        """Slow thread-safe requests run in parallel, their responses are published by the connection thread"""
+        service = make_service(EchoService, '--workers', str(workers))
+        serve(service)
+        assert service._serve_args['prefetch'] == workers
+        started = time.monotonic()
+        requests = [deliver_request(service, 'svc_api_sleep', [0.3]) for _ in range(workers)]
+        assert wait_for(lambda: len(get_responses(service)) == workers)
+        assert time.monotonic() - started < 0.3 * workers
+        for props in requests:
+            assert get_responses(service, props.correlation_id)[0]['result'] == 'pass'
+        assert wait_for(lambda: len(service.get_channel('requests').channel.acks) == workers)
+
+    def test_worker_errors_are_answered(self, make_service, serve):
+        """An exception of a service API executed by a worker is answered, not lost"""
+        service = make_service(EchoService, '--workers', '2')
+        serve(service)
+        props = deliver_request(service, 'svc_api_fail')
+        assert wait_for(lambda: get_responses(service, props.correlation_id))
+        response = get_responses(service, props.correlation_id)[0]
+        assert response['result'] == 'exception'
+        assert 'Failed on purpose' in response['result_data']
+
+    def test_serialized_apis(self, make_service, serve):
+        """Service APIs which are not thread-safe never run concurrently"""
+        service = make_service(OverlapService, '--workers', '4')
+        serve(service)
+        for value in range(4):
+            deliver_request(service, 'svc_api_echo', [str(value)])
+        assert wait_for(lambda: len(get_responses(service)) == 4)
+        assert service.overlaps == [0, 0, 0, 0]
+
+# eof class Test_WorkerPool:
+
+# --------------------------------------------------------------------------------------------------------------
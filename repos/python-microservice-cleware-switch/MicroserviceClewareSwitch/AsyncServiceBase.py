@@ -0,0 +1,996 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: AsyncServiceBase.py
+#
+# Description:
+#   Provide the asyncio based variant of the ServiceBase class.
+#
+# *******************************************************************************
+from ServiceBase import ServiceBase, ResultType, ResponseMessage, _BATCH_SIDE_EFFECTS, _TRACE_CONTEXT
+from ServiceCodec import get_codec, BINARY_CONTENT_TYPE
+from ServiceChannel import ThreadSafeChannel
+from ServiceMetrics import RequestTimer
+from SpanRecorder import SpanRecorder
+from pika.adapters.asyncio_connection import AsyncioConnection
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import inspect
+import types
+import pika
+import json
+import uuid
+import time
+import sys
+
+
+class AsyncServiceBase(ServiceBase):
+   """
+Base class for services running on an asyncio event loop.
+
+The service uses the same service information, registry protocol and request format as
+ServiceBase. Service API methods may be defined either with ``async def`` (awaited on
+the event loop) or with ``def`` (executed in a thread pool, serialized unless marked
+with ``thread_safe``), so a single process can handle many requests in flight.
+   """
+
+   # Let the broker push many requests, they are dispatched as tasks on the event loop
+   _DEFAULT_PREFETCH = 1000
+
+   def __init__(self, cmd_args=None):
+      """
+Constructor for the AsyncServiceBase class.
+
+The connection to the broker is established by ``serve_async``.
+
+**Arguments:**
+
+* ``cmd_args``
+
+  / *Condition*: optional / *Type*: list /
+
+  Command-line arguments for initializing the service.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._loop = None
+      self._channel = None
+      self._callback_queue = None
+      self._pending_responses = {}
+      self._request_tasks = set()
+      self._stopped = None
+      super(AsyncServiceBase, self).__init__(cmd_args)
+
+   def parse_serve_arguments(self, cmd_args):
+      """
+Parse the arguments which control how requests are served (see ``ServiceBase.parse_serve_arguments``).
+
+Responses are published and requests acknowledged on the event loop channel, without
+publisher confirms or acknowledgement batches, so ``--confirm`` and ``--ack_batch`` are refused.
+
+**Arguments:**
+
+* ``cmd_args``
+
+  / *Condition*: required / *Type*: list /
+
+  Command-line arguments to be parsed.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  A dictionary containing the parsed serving arguments.
+      """
+      serve_args = super(AsyncServiceBase, self).parse_serve_arguments(cmd_args)
+      if serve_args['confirm'] or serve_args['ack_batch'] > 0:
+         # The service is not constructed, there is nothing to close
+         self._closed = True
+         raise Exception(f"--confirm and --ack_batch are not supported by the asynchronous {self.name} service")
+      return serve_args
+
+   def connect_broker(self, **kwargs):
+      """
+Store the broker connection parameters, the connection is opened by ``serve_async``.
+
+**Arguments:**
+
+* ``**kwargs``
+
+  / *Condition*: optional / *Type*: dict /
+
+  Additional keyword arguments for broker connection parameters.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._connection_params = pika.ConnectionParameters(**kwargs)
+
+   async def _connect(self):
+      """
+Open the connection and the channel to the broker on the running event loop.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._loop = asyncio.get_running_loop()
+      opened = self._loop.create_future()
+
+      def on_open_error(_connection, ex):
+         if not opened.done():
+            opened.set_exception(Exception(f"Unable to connect broker. Reason: {ex}"))
+
+      def on_close(_connection, reason):
+         print(f" [!] Connection closed. Reason: {reason}")
+         self._fail_pending_responses(Exception(f"Connection closed. Reason: {reason}"))
+         if self._stopped is not None:
+            self._stopped.set()
+
+      self.connection = AsyncioConnection(self._connection_params,
+                                          on_open_callback=lambda connection: opened.set_result(connection),
+                                          on_open_error_callback=on_open_error,
+                                          on_close_callback=on_close,
+                                          custom_ioloop=self._loop)
+      await opened
+
+      channel_opened = self._loop.create_future()
+      self.connection.channel(on_open_callback=channel_opened.set_result)
+      self._channel = await channel_opened
+      # Nothing is declared on a new connection yet
+      self._topology = []
+
+   async def _call(self, func, **kwargs):
+      """
+Call an asynchronous pika channel method and wait for its completion.
+
+**Arguments:**
+
+* ``func``
+
+  / *Condition*: required / *Type*: callable /
+
+  The pika channel method accepting a ``callback`` argument.
+
+* ``**kwargs``
+
+  / *Condition*: optional / *Type*: dict /
+
+  Arguments passed to the channel method.
+
+**Returns:**
+
+  / *Type*: pika.frame.Method /
+
+  The frame received from the broker.
+      """
+      done = self._loop.create_future()
+      func(callback=lambda frame: done.done() or done.set_result(frame), **kwargs)
+      return await done
+
+   async def serve_async(self):
+      """
+Start service serving on the running event loop, returns once the service is stopped.
+
+If the connection to the broker is lost, it is reconnected with exponential backoff and
+jitter, the topology is declared again and the registration is sent again.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._stopped = asyncio.Event()
+      if self._executor is None:
+         self._executor = ThreadPoolExecutor(max_workers=self._serve_args['workers'] or None,
+                                             thread_name_prefix=f"{self.name}_worker")
+      with self.startup_phase('connect'):
+         await self._connect_with_backoff()
+      with self.startup_phase('topology'):
+         await self._setup(purge=not self._serve_args['keep_queue'])
+      self.report_startup()
+
+      self.start_http_server()
+      print(" [x] Awaiting RPC requests")
+      try:
+         while True:
+            await self._stopped.wait()
+            if self._stop_requested or self._closed:
+               break
+            # The connection was lost
+            started = time.monotonic()
+            self._stopped.clear()
+            self._consumer_tag = None
+            attempt = 0
+            while not self._stop_requested:
+               await self._connect_with_backoff()
+               try:
+                  await self._setup(purge=False)
+                  break
+               except Exception as ex:
+                  delay = self.get_reconnect_delay(attempt)
+                  attempt += 1
+                  print(f" [!] Unable to restore topology, retry in {delay:.1f}s. Reason: {ex}")
+                  await asyncio.sleep(delay)
+            else:
+               break
+            self.record_reconnect(time.monotonic() - started)
+      finally:
+         await self.shutdown_async()
+
+   async def _connect_with_backoff(self):
+      """
+Open the connection to the broker, retrying with exponential backoff and jitter.
+
+**Returns:**
+
+(*no returns*)
+      """
+      attempt = 0
+      while True:
+         try:
+            await self._connect()
+            return
+         except Exception as ex:
+            if self._stop_requested:
+               raise
+            delay = self.get_reconnect_delay(attempt)
+            attempt += 1
+            print(f" [x] Unable to connect broker, retry in {delay:.1f}s. Reason: {ex}")
+            await asyncio.sleep(delay)
+
+   async def _setup(self, purge):
+      """
+Declare the topology of the service, start consuming and publish the registration.
+
+**Arguments:**
+
+* ``purge``
+
+  / *Condition*: required / *Type*: bool /
+
+  Whether the request queue is purged.
+
+**Returns:**
+
+(*no returns*)
+      """
+      await self._call(self._channel.exchange_declare, exchange=ServiceBase._SERVICE_REQUEST_EXCHANGE, exchange_type='direct')
+      await self._call(self._channel.queue_declare, queue=self.name, arguments=self.get_request_queue_arguments())
+
+      # Purge the queue, unless the requests handed back by a previous instance are served
+      if purge:
+         await self._call(self._channel.queue_purge, queue=self.name)
+         print(f"Queue '{self.name}' purged")
+
+      # Bind the queue to the exchange with a routing key
+      await self._call(self._channel.queue_bind, exchange=ServiceBase._SERVICE_REQUEST_EXCHANGE, queue=self.name, routing_key=self._SERVICE_INFO['routing_key'])
+
+      # Exclusive queue receiving the responses of all outgoing requests
+      result = await self._call(self._channel.queue_declare, queue='', exclusive=True)
+      self._callback_queue = result.method.queue
+      self._channel.basic_consume(queue=self._callback_queue, on_message_callback=self._on_response, auto_ack=True)
+
+      await self._call(self._channel.basic_qos, prefetch_count=self._serve_args['prefetch'])
+      self._consumer_tag = self._channel.basic_consume(queue=self.name, on_message_callback=self.on_request)
+
+      await self._publish_service_state('on')
+      print(" [x] Registered service to Registry Service")
+
+   def serve(self):
+      """
+Call to start service serving on a new event loop.
+
+**Returns:**
+
+(*no returns*)
+      """
+      asyncio.run(self.serve_async())
+
+   def stop(self):
+      """
+Request the service to stop serving, ``serve_async`` then shuts it down gracefully.
+
+It is safe to call from a signal handler or another thread.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._stop_requested = True
+      if self._loop is not None and self._stopped is not None:
+         try:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+         except RuntimeError:
+            # The event loop is closed, the service is stopped already
+            pass
+
+   async def shutdown_async(self):
+      """
+Shut the service down within the grace period.
+
+The service stops consuming, waits up to ``--grace_period`` seconds for the running
+requests to publish their responses, publishes the 'off' registration and closes the
+connection. Deliveries which are still unacknowledged at that point are requeued by
+the broker.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if self._closed:
+         return
+      try:
+         if self._channel is not None and self._channel.is_open:
+            if self._consumer_tag is not None:
+               await self._call(self._channel.basic_cancel, consumer_tag=self._consumer_tag)
+               self._consumer_tag = None
+            if self._request_tasks:
+               _, pending = await asyncio.wait(set(self._request_tasks), timeout=self._serve_args['grace_period'])
+               if pending:
+                  print(f" [!] {len(pending)} requests still running after the grace period")
+            await self._publish_service_state('off')
+            print(" [x] Unregistered service from Registry Service")
+      except Exception as ex:
+         print(f" [!] Unable to shut down gracefully. Reason: {ex}")
+      finally:
+         # Closing the client and the HTTP listener waits for their threads, in the default
+         # executor so that the other coroutines keep running meanwhile
+         loop = asyncio.get_running_loop()
+         with self._rpc_client_lock:
+            rpc_client, self._rpc_client = self._rpc_client, None
+         if rpc_client is not None:
+            await loop.run_in_executor(None, rpc_client.close)
+         http_server, self._http_server = self._http_server, None
+         if http_server is not None:
+            await loop.run_in_executor(None, self._close_http_server, http_server)
+         self.close()
+
+   def close(self):
+      """
+Close the service connection.
+
+It waits for the threads of the request client and the HTTP listener, ``shutdown_async``
+closes these in the default executor before, so that the event loop is not blocked.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if self._closed:
+         return
+      self._closed = True
+      if self._executor is not None:
+         self._executor.shutdown(wait=False)
+         self._executor = None
+      self._dedup_window.close()
+      self._spans.close()
+      if self._http_server is not None:
+         self._close_http_server(self._http_server)
+         self._http_server = None
+      # The client of the typed service clients (see ``ServiceBase.get_service_client``)
+      with self._rpc_client_lock:
+         rpc_client, self._rpc_client = self._rpc_client, None
+      if rpc_client is not None:
+         rpc_client.close()
+      if self.connection is not None and self.connection.is_open:
+         self.connection.close()
+      if self._stopped is not None:
+         self._stopped.set()
+
+   @staticmethod
+   def _close_http_server(http_server):
+      http_server.shutdown()
+      http_server.server_close()
+
+   def register_service(self):
+      """
+Registration is published by ``serve_async`` once the connection is opened.
+
+**Returns:**
+
+(*no returns*)
+      """
+      pass
+
+   def unregister_service(self):
+      """
+Publish the unregistration if the channel is still open, see ``shutdown_async``.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if self._channel is not None and self._channel.is_open:
+         self._channel.basic_publish(exchange=ServiceBase._SERVICE_INFORMATION_EXCHANGE,
+                                     routing_key=ServiceBase._SERVICE_INFORMATION_ROUTING_KEY,
+                                     body=json.dumps({'info': self._SERVICE_INFO, 'state': 'off'}),
+                                     properties=pika.BasicProperties(delivery_mode=2))
+
+   async def _publish_service_state(self, state):
+      """
+Publish the service information with the given state to the ServiceRegistry.
+
+**Arguments:**
+
+* ``state``
+
+  / *Condition*: required / *Type*: str /
+
+  The state of the service ('on' or 'off').
+
+**Returns:**
+
+(*no returns*)
+      """
+      exchange_name = ServiceBase._SERVICE_INFORMATION_EXCHANGE
+      queue_name = ServiceBase._SERVICE_INFORMATION_QUEUE
+      await self._declare('exchange_declare', exchange=exchange_name, exchange_type='topic')
+      await self._declare('queue_declare', queue=queue_name, durable=True)
+      await self._declare('queue_bind', exchange=exchange_name, queue=queue_name, routing_key=ServiceBase._SERVICE_INFORMATION_ROUTING_KEY)
+
+      self._channel.basic_publish(
+         exchange=exchange_name,
+         routing_key=ServiceBase._SERVICE_INFORMATION_ROUTING_KEY,
+         body=json.dumps({'info': self._SERVICE_INFO, 'state': state}),
+         properties=pika.BasicProperties(
+            delivery_mode=2,  # Make message persistent
+         )
+      )
+
+   async def _declare(self, method, **kwargs):
+      """
+Declare (or bind) a broker entity once on the current connection.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the channel method, e.g. 'exchange_declare', 'queue_declare' or 'queue_bind'.
+
+* ``**kwargs``
+
+  / *Condition*: optional / *Type*: dict /
+
+  Arguments of the channel method.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if (method, kwargs) in self._topology:
+         return
+      await self._call(getattr(self._channel, method), **kwargs)
+      self._topology.append((method, kwargs))
+
+   def publish_control(self, exchange, routing_key, body, properties=None, declarations=()):
+      """
+Publish a control message (registration, notification) on the channel of the service.
+
+It is safe to call from any thread, the message is published by the event loop.
+
+**Arguments:**
+
+* ``exchange``
+
+  / *Condition*: required / *Type*: str /
+
+  The exchange to publish the message to.
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key of the message.
+
+* ``body``
+
+  / *Condition*: required / *Type*: str /
+
+  The message.
+
+* ``properties``
+
+  / *Condition*: optional / *Type*: pika.BasicProperties / *Default*: None /
+
+  The properties of the message.
+
+* ``declarations``
+
+  / *Condition*: optional / *Type*: list / *Default*: () /
+
+  The ``(method, kwargs)`` of the entities to declare before publishing.
+
+**Returns:**
+
+(*no returns*)
+      """
+      async def publish():
+         for method, kwargs in declarations:
+            await self._declare(method, **kwargs)
+         self._channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+
+      def on_done(future):
+         if future.exception() is not None:
+            print(f" [!] Unable to publish to '{exchange}'. Reason: {future.exception()}")
+
+      asyncio.run_coroutine_threadsafe(publish(), self._loop).add_done_callback(on_done)
+
+   async def request_service_aio(self, request_data, exchange_name, routing_key, content_type=None, timeout=None, priority=None,
+                                 idempotent=False, retries=None, attempt_timeout=None, hedge=None):
+      """
+Send a service request and await its response, from a coroutine running on the event loop of the service.
+
+Requests which are not retried nor hedged are sent on the channel of the service, they share
+its reply queue and are matched by correlation id, so any number of requests can be in flight
+at the same time. Retried or hedged requests are sent by the client shared by all threads of
+the service (see ``ServiceBase.request_service_aio``).
+
+The blocking ``request_service`` and ``request_service_async`` of ``ServiceBase`` are used by
+service API methods executed in the thread pool. The arguments are the ones of
+``ServiceBase.request_service``.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The response of the requested service, with the number of requests sent for it in ``attempts``.
+  Bytes results are returned as a memoryview of the received message body. If there is no response
+  before the deadline, the result is ``ResultType.EXPIRED``.
+      """
+      if idempotent:
+         if retries is None:
+            retries = self._serve_args['request_retries']
+         if hedge is None:
+            hedge = self._serve_args['request_hedge']
+         if retries > 0 or hedge:
+            return await super(AsyncServiceBase, self).request_service_aio(request_data, exchange_name, routing_key,
+                                                                           content_type, timeout, priority, idempotent,
+                                                                           retries, attempt_timeout, hedge)
+      if self._callback_queue is None:
+         raise Exception("Service is not connected, call serve_async first")
+
+      request_api = request_data.get('method', "")
+      codec = get_codec(content_type)
+      headers = {'accept': BINARY_CONTENT_TYPE}
+      if timeout is None:
+         timeout = self._serve_args['request_timeout'] or None
+      expiration = None
+      if timeout is not None:
+         headers[ServiceBase._DEADLINE_HEADER] = time.time() + timeout
+         expiration = str(max(int(timeout * 1000), 0))
+      # A single attempt, it waits at most for its attempt timeout
+      wait_timeout = timeout
+      if attempt_timeout is not None:
+         wait_timeout = attempt_timeout if timeout is None else min(timeout, attempt_timeout)
+
+      correlation_id = str(uuid.uuid4())
+      response = self._loop.create_future()
+      self._pending_responses[correlation_id] = response
+      span = self.start_span('CLIENT')
+      headers[SpanRecorder.TRACEPARENT_HEADER] = SpanRecorder.format_traceparent(span)
+      headers[ServiceBase._SENT_HEADER] = time.time()
+      sent = time.monotonic()
+      try:
+         self._channel.basic_publish(
+            exchange=exchange_name,
+            routing_key=routing_key,
+            properties=pika.BasicProperties(
+               reply_to=self._callback_queue,
+               correlation_id=correlation_id,
+               content_type=codec.content_type,
+               headers=headers,
+               expiration=expiration,
+               priority=priority,
+            ),
+            body=codec.encode(request_data),
+         )
+         try:
+            resp = await asyncio.wait_for(response, wait_timeout)
+         except asyncio.TimeoutError:
+            resp = ResponseMessage(request_api, ResultType.EXPIRED, "No response before the deadline").get_dict()
+         else:
+            self.observe_client_latency(routing_key, request_api, time.monotonic() - sent)
+      finally:
+         self._pending_responses.pop(correlation_id, None)
+      resp['attempts'] = 1
+      self.finish_span(span, request_api, resp.get('result') != ResultType.PASS,
+                       routing_key=routing_key, result=resp.get('result'), attempts=1)
+      return resp
+
+   def _on_response(self, ch, method, props, body):
+      """
+Resolve the pending request matching the correlation id of a response.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the message from the pika library.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The body of the message as bytes.
+
+**Returns:**
+
+(*no returns*)
+      """
+      response = self._pending_responses.get(props.correlation_id)
+      if response is not None and not response.done():
+         try:
+            response.set_result(self.decode_response(props, body))
+         except Exception as ex:
+            response.set_exception(ex)
+
+   def _fail_pending_responses(self, ex):
+      """
+Fail all requests still waiting for a response.
+
+**Arguments:**
+
+* ``ex``
+
+  / *Condition*: required / *Type*: Exception /
+
+  The exception set on the pending requests.
+
+**Returns:**
+
+(*no returns*)
+      """
+      for response in self._pending_responses.values():
+         if not response.done():
+            response.set_exception(ex)
+
+   def on_request(self, ch, method, props, body):
+      """
+Handle an incoming request by scheduling it as a task on the event loop.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the message from the pika library.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The body of the message as bytes.
+
+**Returns:**
+
+(*no returns*)
+      """
+      task = self._loop.create_task(self.process_request_async(ch, method, props, body, time.time()))
+      self._request_tasks.add(task)
+      task.add_done_callback(self._request_tasks.discard)
+      task.add_done_callback(self._on_request_done)
+
+   async def _run_api(self, api, *args, **kwargs):
+      """
+Execute a service API method, awaiting coroutines and running blocking methods in the thread pool.
+
+**Arguments:**
+
+* ``api``
+
+  / *Condition*: required / *Type*: callable /
+
+  The service API method.
+
+* ``*args``
+
+  / *Condition*: optional / *Type*: tuple /
+
+  The positional arguments of the call.
+
+* ``**kwargs``
+
+  / *Condition*: optional / *Type*: dict /
+
+  The keyword arguments of the call.
+
+**Returns:**
+
+  / *Type*: object /
+
+  The result of the service API method.
+      """
+      if inspect.iscoroutinefunction(api):
+         return await api(*args, **kwargs)
+
+      lock = self.get_api_lock(api)
+      if lock is None:
+         call = functools.partial(api, *args, **kwargs)
+      else:
+         def call():
+            with lock:
+               return api(*args, **kwargs)
+      # Run in a copy of the current context to keep the batch side effects visible
+      return await self._loop.run_in_executor(self._executor, contextvars.copy_context().run, call)
+
+   async def execute_request_async(self, body):
+      """
+Execute a decoded request (a single service API call or a batch of calls).
+
+**Arguments:**
+
+* ``body``
+
+  / *Condition*: required / *Type*: dict /
+
+  The request as a dictionary.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The requested API, the ResultType and the result data.
+      """
+      response = "Non-supported request"
+      result_type = ResultType.FAIL
+      request_api = ""
+      try:
+         request_api = body['method']
+         if request_api == self._BATCH_METHOD:
+            response = await self.execute_batch_async(body)
+            result_type = ResultType.PASS
+         else:
+            entry = self.get_api_entry(request_api)
+            if entry is not None:
+               args, kwargs = entry.bind(body.get('args'))
+               response = await self.call_api_async(entry, args, kwargs)
+               result_type = ResultType.PASS
+      except Exception as ex:
+         result_type = ResultType.EXCEPT
+         response = str(ex)
+      return request_api, result_type, response
+
+   async def call_api_async(self, entry, args, kwargs):
+      """
+Call a service API method, using and maintaining the response cache.
+
+**Arguments:**
+
+* ``entry``
+
+  / *Condition*: required / *Type*: ServiceApi /
+
+  The dispatch table entry of the method.
+
+* ``args``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The positional arguments of the call.
+
+* ``kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  The keyword arguments of the call.
+
+**Returns:**
+
+  / *Type*: object /
+
+  The result of the service API method.
+      """
+      if entry.cache is not None:
+         hit, token = self._response_cache.get(entry, args, kwargs)
+         if hit:
+            return token
+      try:
+         response = await self._run_api(self._api_dict[entry.name], *args, **kwargs)
+      finally:
+         if entry.invalidates:
+            self._response_cache.invalidate(entry.invalidates)
+      if entry.cache is not None:
+         self._response_cache.put(entry, token, response)
+      return response
+
+   async def execute_batch_async(self, body):
+      """
+Execute a batch request on the event loop, see ``ServiceBase.execute_batch``.
+
+**Arguments:**
+
+* ``body``
+
+  / *Condition*: required / *Type*: dict /
+
+  The batch request as a dictionary.
+
+**Returns:**
+
+  / *Type*: list /
+
+  The response of each call (``request``, ``result`` and ``result_data``), in call order.
+      """
+      calls = body.get('calls') or []
+      if not isinstance(calls, list):
+         raise Exception("The 'calls' of a batch request must be a list")
+
+      side_effects = []
+      token = _BATCH_SIDE_EFFECTS.set(side_effects)
+      try:
+         if body.get('independent') and len(calls) > 1:
+            results = await asyncio.gather(*[self._execute_batch_call_async(call) for call in calls])
+         else:
+            results = []
+            for call in calls:
+               if body.get('stop_on_error') and results and results[-1][1] != ResultType.PASS:
+                  results.append((self._get_call_method(call), ResultType.FAIL, "Skipped due to a previous failure"))
+               else:
+                  results.append(await self._execute_batch_call_async(call))
+      finally:
+         _BATCH_SIDE_EFFECTS.reset(token)
+
+      if side_effects:
+         await self._loop.run_in_executor(self._executor, self.run_side_effects, side_effects)
+      return [{'request': request_api, 'result': result_type, 'result_data': response}
+              for request_api, result_type, response in results]
+
+   async def _execute_batch_call_async(self, call):
+      """
+Execute one call of a batch request.
+
+**Arguments:**
+
+* ``call``
+
+  / *Condition*: required / *Type*: dict /
+
+  The call as a dictionary.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The requested API, the ResultType and the result data.
+      """
+      request_api = self._get_call_method(call)
+      if request_api == self._BATCH_METHOD:
+         return request_api, ResultType.FAIL, "Nested batch requests are not supported"
+      if not isinstance(call, dict):
+         return request_api, ResultType.EXCEPT, "Each call of a batch request must be a dictionary"
+      return await self.execute_request_async(call)
+
+   async def process_request_async(self, ch, method, props, body, received=None):
+      """
+Execute a request and publish its response.
+
+The latency of each phase of the request is recorded in the service metrics.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the message from the pika library.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The body of the message as bytes.
+
+* ``received``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  The time (seconds since the epoch) the request was received.
+
+**Returns:**
+
+(*no returns*)
+      """
+      timer = RequestTimer(self.get_queued_at(props, received))
+      span = self.start_span('SERVER', SpanRecorder.parse_traceparent(props))
+      trace_token = _TRACE_CONTEXT.set((span['traceId'], span['id']))
+      in_progress = False
+      try:
+         try:
+            body = self.decode_request(body, get_codec(props.content_type))
+         except Exception as ex:
+            timer.lap('decode')
+            request_api, result_type, response = "", ResultType.EXCEPT, str(ex)
+         else:
+            timer.lap('decode')
+            if self.replay_duplicate(ch, method, props, body):
+               return
+            in_progress = True
+            if self.reject_expired(ch, method, props, body):
+               self.record_metrics(timer, body.get('method', "") if isinstance(body, dict) else "", True)
+               return
+            request_api, result_type, response = await self.execute_request_async(body)
+
+         if response == "Non-supported request" and self.is_specific_request(request_api):
+            if inspect.iscoroutinefunction(self.on_specific_request):
+               await self.on_specific_request(ch, method, props, body)
+            else:
+               # Blocking handlers publish through the event loop from the worker thread
+               loop_connection = types.SimpleNamespace(add_callback_threadsafe=self._loop.call_soon_threadsafe)
+               await self._run_api(self.on_specific_request, ThreadSafeChannel(loop_connection, ch), method, props, body)
+            timer.lap('handler')
+            self.record_metrics(timer, request_api, False)
+         else:
+            timer.lap('handler')
+            self.remember_response(props, body, request_api, result_type, response)
+            self.publish_response(ch, props, request_api, result_type, response)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            timer.lap('publish')
+            self.record_metrics(timer, request_api, result_type != ResultType.PASS)
+      finally:
+         if in_progress:
+            self.forget_request(props, body)
+         _TRACE_CONTEXT.reset(trace_token)
+         self.finish_span(span, timer.name, timer.error, timer.phases)
+
+
+if __name__ == '__main__':
+   svc = AsyncServiceBase(sys.argv[1:])
+   svc.serve()
@@ -40,18 +40,29 @@ class ClewareAccessHelper(ClewareAccessHelperAbs):
    __ON_OFF = {'on': 1,
                'off': 0}
 
+   # Module of the USB Backend class of each platform, imported instead of scanning the package
+   _PLATFORM_MODULES = {'linux': 'ClewareAccessHelperLinux',
+                        'windows': 'ClewareAccessHelperWindows'}
+
    def __init__(self):
       """
       Get all supported USB Backend classes and set the real_obj to the instance of the class match with config file
       """
-      dir_path = os.path.dirname(os.path.realpath(__file__))
-      current_name = os.path.splitext(os.path.basename(__file__))[0]
-      for module_loader, name, ispkg in pkgutil.iter_modules([dir_path]):
-         if current_name != name:
-            try:
-               importlib.import_module(name)
-            except:
-               pass
+      module_name = self._PLATFORM_MODULES.get(platform.system().lower())
+      try:
+         importlib.import_module(module_name)
+      except Exception:
+         module_name = None
+      if module_name is None:
+         # Unknown platform, look for a USB Backend class in all modules of the package
+         dir_path = os.path.dirname(os.path.realpath(__file__))
+         current_name = os.path.splitext(os.path.basename(__file__))[0]
+         for module_loader, name, ispkg in pkgutil.iter_modules([dir_path]):
+            if current_name != name:
+               try:
+                  importlib.import_module(name)
+               except:
+                  pass
 
       supported_usb_access_classes_list = Utils.get_all_descendant_classes(ClewareAccessHelperAbs)
       supported_usb_access_classes_dict = {cls._sPlatform: cls for cls in supported_usb_access_classes_list}
@@ -143,9 +154,12 @@ class ClewareAccessHelper(ClewareAccessHelperAbs):
          return -1
 
       on_off = self.__ON_OFF[state.lower()]
+      # Service requests are already coerced to int by the dispatch table of the service
       if isinstance(switch_id, str):
          switch_id = int(switch_id, 0)
-      return self.real_obj.set_switch(int(device_no), switch_id, on_off)
+      if isinstance(device_no, str):
+         device_no = int(device_no)
+      return self.real_obj.set_switch(device_no, switch_id, on_off)
 
    def set_switch_by_port_name(self, port_name, state):
       res = "STATUS_ %s E_CODE_ %s TIME(ms)_ %s DIGITAL_OUT CHANNEL STATE SET_RET"
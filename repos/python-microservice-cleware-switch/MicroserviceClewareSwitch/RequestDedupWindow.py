@@ -0,0 +1,354 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: RequestDedupWindow.py
+#
+# Description:
+#   Provide the window of responses used to answer repeated requests without executing
+#   them again.
+#
+# *******************************************************************************
+from ServiceCodec import JsonCodec, BINARY_TYPES
+import base64
+import json
+import hashlib
+import collections
+import os
+import threading
+
+
+class RequestDedupWindow(object):
+   """
+Bounded window of the responses to the latest requests, used to deduplicate requests.
+
+Requests are identified by their ``idempotency-key`` header, or else by their message id or
+correlation id, together with a digest of the request (method and arguments).
+
+A request is marked in progress before it is executed, a duplicate arriving meanwhile (e.g. a
+redelivery executed by another worker) is parked until the response of the first one is kept.
+
+The window can be persisted to a file (one JSON object per line) to survive a restart;
+bytes results are persisted as base64 encoded strings tagged with their type.
+   """
+   IDEMPOTENCY_KEY_HEADER = 'idempotency-key'
+   _BYTES_TYPE = 'bytes'
+
+   def __init__(self, size, path=None):
+      """
+Constructor for the RequestDedupWindow class.
+
+**Arguments:**
+
+* ``size``
+
+  / *Condition*: required / *Type*: int /
+
+  The maximum number of responses kept, 0 disables deduplication.
+
+* ``path``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The file persisting the window.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.size = size
+      self.path = path
+      self.duplicates = 0
+      self._lock = threading.Lock()
+      self._responses = collections.OrderedDict()
+      self._running = {}
+      self._file = None
+      self._file_lines = 0
+      if self.size and self.path:
+         self._load()
+
+   def get_key(self, props, request):
+      """
+Get the key identifying a request.
+
+The request itself is part of the key, so that a reused id does not answer another request
+with the response kept for the first one.
+
+**Arguments:**
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the request message.
+
+* ``request``
+
+  / *Condition*: required / *Type*: dict /
+
+  The decoded request.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The key of the request, None if it cannot be identified or deduplication is disabled.
+      """
+      if not self.size:
+         return None
+      key = (props.headers or {}).get(self.IDEMPOTENCY_KEY_HEADER)
+      if key:
+         identity = 'key:' + (key.decode('utf-8') if isinstance(key, bytes) else str(key))
+      elif props.message_id:
+         identity = 'msg:' + props.message_id
+      elif props.correlation_id:
+         identity = 'id:' + props.correlation_id
+      else:
+         return None
+      try:
+         digest = hashlib.sha1(json.dumps(request, sort_keys=True, default=JsonCodec.default).encode('utf-8')).hexdigest()
+      except (TypeError, ValueError):
+         return None
+      return f'{identity}:{digest}'
+
+   def get(self, key):
+      """
+Get the response kept for a request.
+
+**Arguments:**
+
+* ``key``
+
+  / *Condition*: required / *Type*: str /
+
+  The key of the request.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  True and the kept (request, result, result_data) if the request is a duplicate, otherwise False and None.
+      """
+      if not self.size or key is None:
+         return False, None
+      with self._lock:
+         kept = self._responses.get(key)
+         if kept is None:
+            return False, None
+         self.duplicates += 1
+         return True, kept
+
+   def begin(self, key, waiter):
+      """
+Mark a request as in progress, unless it is a duplicate.
+
+A request marked in progress must be ended by ``put`` with its response, or else by ``discard``.
+
+**Arguments:**
+
+* ``key``
+
+  / *Condition*: required / *Type*: str /
+
+  The key of the request.
+
+* ``waiter``
+
+  / *Condition*: required / *Type*: callable /
+
+  Called with the kept (request, result, result_data), or with None if the response is
+  discarded, when the request is a duplicate of a request in progress.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  True and the kept (request, result, result_data) if the request is a duplicate of an executed
+  request, True and None if the duplicate is parked (``waiter`` is called later), otherwise
+  False and None.
+      """
+      if not self.size or key is None:
+         return False, None
+      with self._lock:
+         kept = self._responses.get(key)
+         if kept is None and key not in self._running:
+            self._running[key] = []
+            return False, None
+         self.duplicates += 1
+         if kept is None:
+            self._running[key].append(waiter)
+         return True, kept
+
+   def put(self, key, kept):
+      """
+Keep the response to a request.
+
+**Arguments:**
+
+* ``key``
+
+  / *Condition*: required / *Type*: str /
+
+  The key of the request.
+
+* ``kept``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The (request, result, result_data) of the response.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if not self.size or key is None:
+         return
+      with self._lock:
+         self._responses[key] = kept
+         while len(self._responses) > self.size:
+            self._responses.popitem(last=False)
+         if self.path:
+            self._persist(key, kept)
+         waiters = self._running.pop(key, [])
+      for waiter in waiters:
+         waiter(kept)
+
+   def discard(self, key):
+      """
+End a request marked in progress without keeping its response.
+
+The parked duplicates of the request are called with None.
+
+**Arguments:**
+
+* ``key``
+
+  / *Condition*: required / *Type*: str /
+
+  The key of the request.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if not self.size or key is None:
+         return
+      with self._lock:
+         waiters = self._running.pop(key, [])
+      for waiter in waiters:
+         waiter(None)
+
+   def _load(self):
+      """
+Load the window from its file.
+
+**Returns:**
+
+(*no returns*)
+      """
+      try:
+         with open(self.path, 'r') as file:
+            for line in file:
+               try:
+                  record = json.loads(line)
+               except ValueError:
+                  # Ignore a line truncated by a crash
+                  continue
+               result_data = record['result_data']
+               if record.get('result_data_type') == self._BYTES_TYPE:
+                  result_data = base64.b64decode(result_data)
+               self._responses[record['key']] = (record['request'], record['result'], result_data)
+               self._responses.move_to_end(record['key'])
+               if len(self._responses) > self.size:
+                  self._responses.popitem(last=False)
+      except FileNotFoundError:
+         pass
+      except Exception as ex:
+         print(f" [!] Unable to load the dedupe window from '{self.path}'. Reason: {ex}")
+      try:
+         self._compact()
+      except Exception as ex:
+         print(f" [!] Unable to persist the dedupe window to '{self.path}'. Reason: {ex}")
+
+   def _persist(self, key, kept):
+      """
+Append a response to the file of the window, compacting the file when it grew too large.
+
+**Arguments:**
+
+* ``key``
+
+  / *Condition*: required / *Type*: str /
+
+  The key of the request.
+
+* ``kept``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The (request, result, result_data) of the response.
+
+**Returns:**
+
+(*no returns*)
+      """
+      try:
+         if self._file is None or self._file_lines >= 2 * self.size:
+            self._compact()
+         else:
+            self._file.write(self._dump_record(key, kept))
+            self._file.flush()
+            self._file_lines += 1
+      except Exception as ex:
+         print(f" [!] Unable to persist the dedupe window to '{self.path}'. Reason: {ex}")
+
+   def _compact(self):
+      """
+Rewrite the file of the window with the responses currently kept.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if self._file is not None:
+         self._file.close()
+      tmp_path = self.path + '.tmp'
+      with open(tmp_path, 'w') as file:
+         for key, kept in self._responses.items():
+            file.write(self._dump_record(key, kept))
+      os.replace(tmp_path, self.path)
+      self._file = open(self.path, 'a')
+      self._file_lines = len(self._responses)
+
+   def close(self):
+      """
+Close the file of the window.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._lock:
+         if self._file is not None:
+            self._file.close()
+            self._file = None
+
+   @classmethod
+   def _dump_record(cls, key, kept):
+      request_api, result_type, response = kept
+      record = {'key': key, 'request': request_api, 'result': result_type, 'result_data': response}
+      if isinstance(response, BINARY_TYPES):
+         # Tag bytes results, so that they are not loaded back as their base64 encoded string
+         record['result_data_type'] = cls._BYTES_TYPE
+      return json.dumps(record, default=JsonCodec.default) + '\n'
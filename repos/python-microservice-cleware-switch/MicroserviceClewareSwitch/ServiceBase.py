@@ -26,90 +26,49 @@
 # - Initialize
 #
 # *******************************************************************************
-import abc
+# The decorators of service API methods are imported by the services from this module
+from ServiceApi import ServiceApi, thread_safe, cached, invalidates, serialized
+from ServiceCodec import JSON_CODEC, BINARY_CONTENT_TYPE, BINARY_TYPES, get_codec
+from ServiceMessage import ResultType, ResponseMessage, DEADLINE_HEADER, SENT_HEADER
+from ServiceChannel import ThreadSafeChannel, BatchedChannel
+from RpcClient import RpcClient, ServiceCall
+from ServiceClient import generate_client
+from ResponseCache import ResponseCache
+from RequestDedupWindow import RequestDedupWindow
+from SpanRecorder import SpanRecorder
+from SamplingProfiler import SamplingProfiler
+from ServiceMetrics import LatencyHistogram, RequestTimer, ServiceMetrics
+from ServiceHttpServer import ServiceHttpServer, ServiceUnixHttpServer
 import pika
 import json
 import collections
 import zipfile
 import os
-import base64
-import uuid
 import re
 import sys
 import argparse
+import threading
+import contextlib
+import heapq
+import random
+import cProfile
+import pstats
+import marshal
+import io
+import itertools
+import contextvars
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait
 
 
-class ResultType:
-   """
-Result Types.
-   """
-   PASS = "pass"
-   FAIL = "fail"
-   EXCEPT = "exception"
+_NO_LOCK = contextlib.nullcontext()
 
-   def __init__(self):
-      pass
-
-
-class ResponseMessage(object):
-   """
-Response message class
-   """
-   def __init__(self, request="", result=ResultType.PASS, result_data=""):
-      """
-Constructor for the ResponseMessage class.
-
-**Arguments:**
-
-* ``request``
-
-  / *Condition*: optional / *Type*: str / *Default*: "" /
-
-  The request string.
-
-* ``result``
-
-  / *Condition*: optional / *Type*: ResultType / *Default*: ResultType.PASS /
-
-  The result of processing the request.
-
-* ``result_data``
-
-  / *Condition*: optional / *Type*: str / *Default*: "" /
-
-  The result data returned.
-
-**Returns:**
-
-(*no returns*)
-      """
-      self.request = request
-      self.result = result
-      self.result_data = result_data
-
-   def get_json(self):
-      """
-Convert the response message to JSON format.
-
-**Returns:**
-
-  / *Type*: str /
-
-  The response message in JSON format.
-      """
-      return json.dumps(collections.OrderedDict(sorted(self.__dict__.items())))
-
-   def get_data(self):
-      """
-Retrieve the result data as a string.
-
-**Returns:**
-
-  / *Type*: str /
+# Side effects deferred until the end of the batch request being executed
+_BATCH_SIDE_EFFECTS = contextvars.ContextVar('batch_side_effects', default=None)
 
-  The result data as a string.
-      """
-      return self.result_data
+# Span of the request being executed, parent of the spans of the requests it sends
+_TRACE_CONTEXT = contextvars.ContextVar('trace_context', default=None)
 
 
 class ServiceBase:
@@ -128,6 +87,39 @@ class ServiceBase:
    }
 
    _SERVICE_REQUEST_EXCHANGE = 'services_request'
+   _SERVICE_INFORMATION_EXCHANGE = 'service_information'
+   _SERVICE_INFORMATION_QUEUE = 'service_infor_queue'
+   _SERVICE_INFORMATION_ROUTING_KEY = 'service.information'
+   # Routing key of the requests to the ServiceRegistry
+   _SERVICE_REGISTRY_ROUTING_KEY = 'abcxyz'
+
+   # Prefetch count used when none is given, None means the number of workers
+   _DEFAULT_PREFETCH = None
+
+   # Header carrying the absolute deadline (seconds since the epoch) of a request
+   _DEADLINE_HEADER = DEADLINE_HEADER
+   # Header carrying the time (seconds since the epoch) a request was sent
+   _SENT_HEADER = SENT_HEADER
+
+   # Seconds without a turn of the serving loop after which the consumer is reported unhealthy
+   _HEALTH_LOOP_TIMEOUT = 30
+
+   # Seconds requests to other services wait for their response when no timeout is given
+   _DEFAULT_REQUEST_TIMEOUT = 30
+
+   # Exponential backoff (with full jitter) between attempts to reconnect the broker
+   _RECONNECT_BASE_DELAY = 0.5
+   _RECONNECT_MAX_DELAY = 30
+
+   # Introspection APIs exposing the internals of the process, only served with --enable_profiling
+   _PROFILING_APIS = ('svc_api_profile_start', 'svc_api_profile_stop', 'svc_api_get_spans', 'svc_api_get_request_stats')
+
+   # Method name of the envelope executing many service API calls in one request
+   _BATCH_METHOD = 'batch'
+   _BATCH_MAX_PARALLEL = 8
+
+   # Latency samples of a requested method needed before its requests are hedged at the 95th percentile
+   _HEDGE_MIN_SAMPLES = 20
 
    def __init__(self, cmd_args=None):
       """
@@ -140,16 +132,107 @@ behavior and interaction with the overall system.
 
 All methods used to export APIs of a service must begin with the prefix 'svc_api_'.
       """
+      self._startup_started = time.perf_counter()
+      self._startup_timings = collections.OrderedDict()
+      self._broker_session = None
       self.connection = None      
       self.name = self._SERVICE_INFO['name']
-      self._kw_args = self.parse_arguments(cmd_args)
-      self._spec_args = self.parse_spec_arguments(cmd_args)
+      self._topology = []
+      self._channels = {}
+      self._connection_thread = None
+      self._rpc_client = None
+      self._rpc_client_lock = threading.Lock()
+      self._client_latencies = {}
+      self._client_latencies_lock = threading.Lock()
+      self._connection_stats = {'reconnects': 0, 'reconnect_seconds': 0.0, 'last_reconnect_seconds': None}
+      self._closed = False
+      self._stop_requested = False
+      self._consumer_channel = None
+      self._consumer_tag = None
+      self._loop_heartbeat = None
+      self._http_server = None
+      self._executor = None
+      self._buffered_requests = None
+      self._running_requests = 0
+      self._buffered_requests_lock = threading.Lock()
+      self._buffered_requests_seq = itertools.count()
+      self._batch_executor = None
+      self._serial_lock = threading.RLock()
+      with self.startup_phase('arguments'):
+         self._kw_args = self.parse_arguments(cmd_args)
+         self._serve_args = self.parse_serve_arguments(cmd_args)
+         self._spec_args = self.parse_spec_arguments(cmd_args)
       self._api_dict = self.get_svc_api_methods_dict()
-      self._api_info_dict = self.get_svc_api_methods_info_dict(self._api_dict)
-      self._SERVICE_INFO['methods'] = list(self._api_dict.keys())
-      self._SERVICE_INFO['methods_info'] = self._api_info_dict
-      self.connect_broker(**self._kw_args)
-      self.register_service()
+      self._response_cache = ResponseCache(self._DISPATCH_TABLE)
+      self._dedup_window = RequestDedupWindow(self._serve_args['dedup_size'], self._serve_args['dedup_file'])
+      self._expired_requests = 0
+      self._metrics = ServiceMetrics()
+      self._spans = SpanRecorder(self._serve_args['trace_size'], self._serve_args['trace_file'])
+      self._profiler = None
+      self._profiler_lock = threading.Lock()
+      with self.startup_phase('metadata'):
+         self._api_info_dict = self.get_svc_api_methods_info_dict(self._api_dict)
+         self._SERVICE_INFO['methods'] = list(self._api_dict.keys())
+         self._SERVICE_INFO['methods_info'] = self._api_info_dict
+      if self._serve_args['parallel_init']:
+         # The broker is connected while the subclass initializes (e.g. its hardware)
+         executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.name}_startup")
+         self._broker_session = executor.submit(self.open_broker_session)
+         executor.shutdown(wait=False)
+      else:
+         self.open_broker_session()
+
+   def open_broker_session(self):
+      """
+Connect the broker and register the service.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self.startup_phase('connect'):
+         self.connect_broker(**self._kw_args)
+      with self.startup_phase('register'):
+         self.register_service()
+
+   def wait_broker_session(self):
+      """
+Wait until the broker session opened in the background by ``--parallel_init`` is ready.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if self._broker_session is not None:
+         try:
+            self._broker_session.result()
+         finally:
+            self._broker_session = None
+
+   @contextlib.contextmanager
+   def startup_phase(self, name):
+      """
+Measure a phase of the service startup, reported once the service serves requests.
+
+**Arguments:**
+
+* ``name``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the phase, e.g. 'hardware'.
+
+**Returns:**
+
+  / *Type*: object /
+
+  A context manager timing its block.
+      """
+      started = time.perf_counter()
+      try:
+         yield
+      finally:
+         self._startup_timings[name] = time.perf_counter() - started
 
    def parse_arguments(self, cmd_args):
       """
@@ -175,6 +258,7 @@ Parse basic service arguments from the command line.
       parser.add_argument('--virtual_host', type=str, help=f'The virtual host for the {self.name} service')
       parser.add_argument('--username', type=str, help='The username for the RabbitMQ service')
       parser.add_argument('--password', type=str, help='The password for the RabbitMQ service')
+      parser.add_argument('--heartbeat', type=int, help='The heartbeat interval in seconds negotiated with the RabbitMQ service')
       
       if cmd_args is not None:
          args, remaining_args = parser.parse_known_args(cmd_args)
@@ -187,12 +271,122 @@ Parse basic service arguments from the command line.
       virtual_host = args.virtual_host or os.getenv('RABBITMQ_VIRTUAL_HOST') or '/'
       username = args.username or os.getenv('RABBITMQ_USERNAME') or 'guest'
       password = args.password or os.getenv('RABBITMQ_PASSWORD') or 'guest'
+      heartbeat = args.heartbeat if args.heartbeat is not None else int(os.getenv('RABBITMQ_HEARTBEAT', 30))
       
       return {
           'host': host,
           'port': port,
           'virtual_host': virtual_host,
-          'credentials': pika.PlainCredentials(username, password)
+          'credentials': pika.PlainCredentials(username, password),
+          'heartbeat': heartbeat
+      }
+
+   def parse_serve_arguments(self, cmd_args):
+      """
+Parse the arguments which control how requests are served.
+
+``--workers`` sets the number of worker threads executing requests (0 executes
+requests on the connection thread). ``--prefetch`` sets the number of unacknowledged
+deliveries the broker may push to the service; it defaults to the number of workers.
+``--max_priority`` sets the highest request priority of the request queue (0, the default,
+declares the queue without ``x-max-priority``); deliveries buffered for the worker pool are
+executed by priority as well. All instances of a service must use the same ``--max_priority``.
+``--dedup_size`` sets the number of responses kept to answer redelivered or repeated
+requests (0 disables it) and ``--dedup_file`` the file persisting them across restarts.
+``--grace_period`` sets the seconds a stopping service waits for in-flight requests and
+``--keep_queue`` keeps the requests queued while the service was down instead of purging them.
+``--http_port`` or ``--http_socket`` (a Unix socket path) enables the HTTP listener serving
+the metrics and the health endpoints. ``--trace_size`` sets the number of trace spans kept
+in memory and ``--trace_file`` the file the spans are appended to. ``--parallel_init`` connects
+the broker in the background while the service initializes, to start serving sooner.
+``--confirm`` publishes responses and updates in publisher confirm mode (requests are then
+acknowledged once their response is confirmed) and ``--ack_batch`` acknowledges that many done
+requests at once (0 acknowledges each request). ``--request_timeout`` sets the seconds requests
+to other services wait for their response by default (30 seconds, 0 waits forever),
+``--request_retries`` the number of times requests to idempotent service APIs are retried
+(0 by default) and ``--request_hedge`` hedges them once they are slower than the 95th
+percentile of their latency (see ``ServiceCall``).
+``--enable_profiling`` serves the profiling and introspection APIs (``svc_api_profile_start``,
+``svc_api_profile_stop``, ``svc_api_get_spans`` and ``svc_api_get_request_stats``).
+
+**Arguments:**
+
+* ``cmd_args``
+
+  / *Condition*: required / *Type*: list /
+
+  Command-line arguments to be parsed.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  A dictionary containing the parsed serving arguments.
+      """
+      parser = argparse.ArgumentParser(description=f'Start the {self.name} service.')
+      parser.add_argument('--workers', type=int, help=f'The number of worker threads for the {self.name} service')
+      parser.add_argument('--prefetch', type=int, help=f'The prefetch count for the {self.name} service')
+      parser.add_argument('--max_priority', type=int, help=f'The highest request priority of the {self.name} service')
+      parser.add_argument('--dedup_size', type=int, help=f'The number of responses kept to deduplicate requests to the {self.name} service')
+      parser.add_argument('--dedup_file', type=str, help=f'The file persisting the responses kept to deduplicate requests to the {self.name} service')
+      parser.add_argument('--grace_period', type=float, help=f'The seconds the {self.name} service waits for in-flight requests when stopping')
+      parser.add_argument('--keep_queue', action='store_true', help=f'Serve the requests queued while the {self.name} service was down')
+      parser.add_argument('--http_port', type=int, help=f'The HTTP port serving the metrics and health of the {self.name} service')
+      parser.add_argument('--http_socket', type=str, help=f'The Unix socket serving the metrics and health of the {self.name} service')
+      parser.add_argument('--trace_size', type=int, help=f'The number of trace spans kept by the {self.name} service')
+      parser.add_argument('--trace_file', type=str, help=f'The file the {self.name} service appends its trace spans to')
+      parser.add_argument('--parallel_init', action='store_true', help=f'Connect the broker while the {self.name} service initializes')
+      parser.add_argument('--confirm', action='store_true', help=f'Publish the responses of the {self.name} service in confirm mode')
+      parser.add_argument('--ack_batch', type=int, help=f'The number of requests to the {self.name} service acknowledged at once')
+      parser.add_argument('--request_timeout', type=float, help=f'The seconds requests of the {self.name} service wait for their response (0 waits forever)')
+      parser.add_argument('--request_retries', type=int, help=f'The number of retries of idempotent requests of the {self.name} service')
+      parser.add_argument('--request_hedge', action='store_true', help=f'Hedge the slow idempotent requests of the {self.name} service')
+      parser.add_argument('--enable_profiling', action='store_true', help=f'Serve the profiling APIs of the {self.name} service')
+
+      if cmd_args is not None:
+         args, remaining_args = parser.parse_known_args(cmd_args)
+      else:
+         args, remaining_args = parser.parse_known_args()
+
+      workers = args.workers if args.workers is not None else int(os.getenv('SERVICE_WORKERS', 0))
+      prefetch = args.prefetch or int(os.getenv('SERVICE_PREFETCH', 0)) or self._DEFAULT_PREFETCH or max(workers, 1)
+
+      max_priority = args.max_priority if args.max_priority is not None else int(os.getenv('SERVICE_MAX_PRIORITY', 0))
+      dedup_size = args.dedup_size if args.dedup_size is not None else int(os.getenv('SERVICE_DEDUP_SIZE', 1024))
+      dedup_file = args.dedup_file or os.getenv('SERVICE_DEDUP_FILE')
+      grace_period = args.grace_period if args.grace_period is not None else float(os.getenv('SERVICE_GRACE_PERIOD', 10))
+      keep_queue = args.keep_queue or os.getenv('SERVICE_KEEP_QUEUE', '0').lower() in ('1', 'true', 'yes')
+      http_port = args.http_port if args.http_port is not None else int(os.getenv('SERVICE_HTTP_PORT', 0))
+      http_socket = args.http_socket or os.getenv('SERVICE_HTTP_SOCKET')
+      trace_size = args.trace_size if args.trace_size is not None else int(os.getenv('SERVICE_TRACE_SIZE', 1024))
+      trace_file = args.trace_file or os.getenv('SERVICE_TRACE_FILE')
+      parallel_init = args.parallel_init or os.getenv('SERVICE_PARALLEL_INIT', '0').lower() in ('1', 'true', 'yes')
+      confirm = args.confirm or os.getenv('SERVICE_CONFIRM', '0').lower() in ('1', 'true', 'yes')
+      ack_batch = args.ack_batch if args.ack_batch is not None else int(os.getenv('SERVICE_ACK_BATCH', 0))
+      request_timeout = args.request_timeout if args.request_timeout is not None else float(os.getenv('SERVICE_REQUEST_TIMEOUT', self._DEFAULT_REQUEST_TIMEOUT))
+      request_retries = args.request_retries if args.request_retries is not None else int(os.getenv('SERVICE_REQUEST_RETRIES', 0))
+      request_hedge = args.request_hedge or os.getenv('SERVICE_REQUEST_HEDGE', '0').lower() in ('1', 'true', 'yes')
+      enable_profiling = args.enable_profiling or os.getenv('SERVICE_ENABLE_PROFILING', '0').lower() in ('1', 'true', 'yes')
+
+      return {
+          'workers': max(workers, 0),
+          'prefetch': prefetch,
+          'max_priority': min(max(max_priority, 0), 255),
+          'dedup_size': max(dedup_size, 0),
+          'dedup_file': dedup_file,
+          'grace_period': max(grace_period, 0),
+          'keep_queue': keep_queue,
+          'http_port': max(http_port, 0),
+          'http_socket': http_socket,
+          'trace_size': max(trace_size, 0),
+          'trace_file': trace_file,
+          'parallel_init': parallel_init,
+          'confirm': confirm,
+          'ack_batch': max(ack_batch, 0),
+          'request_timeout': max(request_timeout, 0),
+          'request_retries': max(request_retries, 0),
+          'request_hedge': request_hedge,
+          'enable_profiling': enable_profiling
       }
 
    def parse_spec_arguments(self, cmd_args):
@@ -226,20 +420,47 @@ Close the service connection.
 
 (*no returns*)
       """
-      self.connection.close()
+      if self._closed:
+         return
+      self._closed = True
+      if self._executor is not None:
+         self._executor.shutdown(wait=False)
+         self._executor = None
+      if self._batch_executor is not None:
+         self._batch_executor.shutdown(wait=False)
+         self._batch_executor = None
+      self._dedup_window.close()
+      self._spans.close()
+      if self._http_server is not None:
+         self._http_server.shutdown()
+         self._http_server.server_close()
+         self._http_server = None
+      with self._rpc_client_lock:
+         rpc_client, self._rpc_client = self._rpc_client, None
+      if rpc_client is not None:
+         rpc_client.close()
+      if self.connection is not None and self.connection.is_open:
+         self.connection.close()
 
    def __del__(self):
       """
 Destructor for the ServiceBase class.
 
 This method is called when an instance of the ServiceBase class is about to be destroyed.
-It ensures that any necessary cleanup is performed and service connections are properly closed.
+It is a last resort for services which were not shut down (see ``shutdown``): the service
+is unregistered and its connection closed, without waiting for in-flight requests.
 
 **Returns:**
 
 (*no returns*)
       """
-      self.unregister_service()
+      if getattr(self, '_closed', True):
+         return
+      try:
+         if self.connection is not None and self.connection.is_open:
+            self.unregister_service()
+      except Exception as ex:
+         print(f" [!] Unable to unregister service. Reason: {ex}")
       self.close()
 
    @staticmethod
@@ -267,16 +488,16 @@ Create request data for a given method name and arguments.
 
   A dictionary containing the method name and arguments.
       """
-      request_data = {
-            'method': request_api,
-            'args': args_list
-      }
-      return  request_data
+      return {'method': method_name, 'args': args}
 
    def connect_broker(self, **kwargs):
       """
 Establish a connection to the broker.
 
+The calling thread owns the connection, the channels of the previous connection are dropped.
+While the broker is unreachable, the connection is retried with exponential backoff and
+jitter until it succeeds or the service is stopped.
+
 **Arguments:**
 
 * ``**kwargs``
@@ -289,238 +510,1331 @@ Establish a connection to the broker.
 
 (*no returns*)
       """
-      try:
-         self.connection = pika.BlockingConnection(pika.ConnectionParameters(**kwargs))
-      except Exception as ex:
-         print(" [x] Unable to connect broker. Reason:" + str(ex))
-
-   def serve(self):
+      attempt = 0
+      while True:
+         try:
+            self.connection = pika.BlockingConnection(pika.ConnectionParameters(**kwargs))
+            self._channels = {}
+            self._connection_thread = threading.get_ident()
+            return
+         except pika.exceptions.AMQPConnectionError as ex:
+            if self._stop_requested:
+               raise Exception(f"Service stopped before connecting broker. Reason: {ex}")
+            delay = self.get_reconnect_delay(attempt)
+            attempt += 1
+            print(f" [x] Unable to connect broker, retry in {delay:.1f}s. Reason: {ex}")
+            self.sleep_unless_stopped(delay)
+
+   @classmethod
+   def get_reconnect_delay(cls, attempt):
       """
-Call to start service serving.
+Get the delay before an attempt to reconnect the broker (exponential backoff with full jitter).
 
-**Returns:**
+**Arguments:**
 
-(*no returns*)
-      """
-      channel = self.connection.channel()
+* ``attempt``
 
-      channel.exchange_declare(exchange=ServiceBase._SERVICE_REQUEST_EXCHANGE, exchange_type='direct')
-      channel.queue_declare(queue=self.name)
+  / *Condition*: required / *Type*: int /
 
-      # Purge the queue
-      channel.queue_purge(queue=self.name)
-      print(f"Queue '{self.name}' purged")
+  The number of failed attempts so far.
 
-      # Bind the queue to the exchange with a routing key
-      channel.queue_bind(exchange=ServiceBase._SERVICE_REQUEST_EXCHANGE, queue=self.name, routing_key=self._SERVICE_INFO['routing_key'])
+**Returns:**
 
-      channel.basic_qos(prefetch_count=1)
-      channel.basic_consume(queue=self.name, on_message_callback=self.on_request)
+  / *Type*: float /
 
-      print(" [x] Awaiting RPC requests")
-      channel.start_consuming()
+  The delay in seconds.
+      """
+      return random.uniform(0, min(cls._RECONNECT_MAX_DELAY, cls._RECONNECT_BASE_DELAY * 2 ** min(attempt, 16)))
 
-   def register_service(self):
+   def sleep_unless_stopped(self, delay):
       """
-Register a service to the ServiceRegistry.
+Sleep for the given delay, or until the service is requested to stop.
+
+**Arguments:**
+
+* ``delay``
+
+  / *Condition*: required / *Type*: float /
+
+  The delay in seconds.
 
 **Returns:**
 
 (*no returns*)
       """
-      exchange_name = 'service_information'
-      channel = self.connection.channel()
-      channel.exchange_declare(exchange=exchange_name, exchange_type='topic')
+      end = time.monotonic() + delay
+      while not self._stop_requested and time.monotonic() < end:
+         time.sleep(min(0.2, max(end - time.monotonic(), 0)))
 
-      service_info = {
-         'info': self._SERVICE_INFO,
-         'state': 'on'
-      }
+   def declare(self, channel, method, **kwargs):
+      """
+Declare (or bind) a broker entity once, and record it to be declared again after a reconnect.
 
-      # Ensure the queue is durable and named to be reused
-      queue_name = 'service_infor_queue'
-      channel.queue_declare(queue=queue_name, durable=True)
+Entities recorded already are declared on the current connection, so the call is skipped.
 
-      # Bind the queue to specific routing keys
-      channel.queue_bind(exchange=exchange_name, queue=queue_name, routing_key='service.information')
+**Arguments:**
 
-      channel.basic_publish(
-         exchange=exchange_name,
-         routing_key='service.information',
-         body=json.dumps(service_info),
-         properties=pika.BasicProperties(
-            delivery_mode=2,  # Make message persistent
-         )
-      )
+* ``channel``
 
-      print(" [x] Registered service to Registry Service")
+  / *Condition*: required / *Type*: pika.channel.Channel /
 
-   def unregister_service(self):
+  The channel used to declare the entity.
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the channel method, e.g. 'exchange_declare', 'queue_declare' or 'queue_bind'.
+
+* ``**kwargs``
+
+  / *Condition*: optional / *Type*: dict /
+
+  Arguments of the channel method.
+
+**Returns:**
+
+  / *Type*: pika.frame.Method /
+
+  The frame received from the broker, None if the declare is skipped.
       """
-Unregister a service from the ServiceRegistry.
+      if (method, kwargs) in self._topology:
+         return None
+      result = getattr(channel, method)(**kwargs)
+      self._topology.append((method, kwargs))
+      return result
+
+   def replay_topology(self):
+      """
+Declare again the exchanges, queues and bindings recorded by ``declare``, in order.
 
 **Returns:**
 
 (*no returns*)
       """
-      exchange_name = 'service_information'
-      channel = self.connection.channel()
-      channel.exchange_declare(exchange=exchange_name, exchange_type='topic')
+      channel = self.get_channel('control')
+      for method, kwargs in self._topology:
+         getattr(channel, method)(**kwargs)
 
-      service_info = {
-         'info': self._SERVICE_INFO,
-         'state': 'off'
-      }
+   def get_channel(self, name):
+      """
+Get a named long-lived channel of the service connection, opened on first use and again
+after it was closed (e.g. by a reconnect).
 
-      # Ensure the queue is durable and named to be reused
-      queue_name = 'service_infor_queue'
-      channel.queue_declare(queue=queue_name, durable=True)
+Channels must only be used by the thread owning the connection (see ``publish_control``).
 
-      # Bind the queue to specific routing keys
-      channel.queue_bind(exchange=exchange_name, queue=queue_name, routing_key='service.information')
+**Arguments:**
 
-      channel.basic_publish(
-         exchange=exchange_name,
-         routing_key='service.information',
-         body=json.dumps(service_info),
-         properties=pika.BasicProperties(
-            delivery_mode=2,  # Make message persistent
-         )
-      )
+* ``name``
 
-      print(" [x] Unregistered service from Registry Service")
+  / *Condition*: required / *Type*: str /
+
+  The name of the channel, e.g. 'control' for registrations, notifications and declares,
+  or 'requests' for consuming requests.
 
-   def request_service(self, request_data, exchange_name, routing_key):
+**Returns:**
+
+  / *Type*: BatchedChannel /
+
+  The channel, publishing in confirm mode with ``--confirm``.
       """
-Send a service request to a specific exchange with a given routing key.
+      channel = self._channels.get(name)
+      if channel is None or not channel.is_open:
+         channel = BatchedChannel(self.connection, self.connection.channel(),
+                                  self._serve_args['confirm'], self._serve_args['ack_batch'])
+         self._channels[name] = channel
+      return channel
+
+   def flush_channels(self):
+      """
+Send the pending acknowledgements of the named channels (see ``BatchedChannel.flush``).
 
-**Arguments:**
+**Returns:**
 
-* ``request_data``
+  / *Type*: int /
 
-  / *Condition*: required / *Type*: dict /
+  The number of acknowledgements not sent yet.
+      """
+      pending = 0
+      for channel in list(self._channels.values()):
+         channel.flush()
+         pending += channel.pending
+      return pending
 
-  The data for the service request.
+   def publish_control(self, exchange, routing_key, body, properties=None, declarations=()):
+      """
+Publish a control message (registration, notification) on the 'control' channel of the
+service connection.
 
-* ``exchange_name``
+The message is published right away by the thread owning the connection, other threads
+schedule it on that thread.
+
+**Arguments:**
+
+* ``exchange``
 
   / *Condition*: required / *Type*: str /
 
-  The name of the exchange to send the request to.
+  The exchange to publish the message to.
 
 * ``routing_key``
 
   / *Condition*: required / *Type*: str /
 
-  The routing key for the request.
+  The routing key of the message.
+
+* ``body``
+
+  / *Condition*: required / *Type*: str /
+
+  The message.
+
+* ``properties``
+
+  / *Condition*: optional / *Type*: pika.BasicProperties / *Default*: None /
+
+  The properties of the message.
+
+* ``declarations``
+
+  / *Condition*: optional / *Type*: list / *Default*: () /
+
+  The ``(method, kwargs)`` of the entities to declare before publishing (see ``declare``).
 
 **Returns:**
 
 (*no returns*)
       """
-      connection = pika.BlockingConnection(pika.ConnectionParameters(**self._kw_args))
-      channel = connection.channel()
-      result = channel.queue_declare(queue='', exclusive=True)
-      callback_queue = result.method.queue
-      correlation_id = str(uuid.uuid4())
-      resp = None
-      def on_response(ch, method, properties, body):
-         if properties.correlation_id == correlation_id:
-            response = json.loads(body.decode())
-            print(f" [.] Got response: {response}")
-            nonlocal resp
-            resp = response
-            ch.stop_consuming()
+      def publish():
+         channel = self.get_channel('control')
+         for method, kwargs in declarations:
+            self.declare(channel, method, **kwargs)
+         channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
 
-      channel.basic_consume(queue=callback_queue, on_message_callback=on_response, auto_ack=True)
-      print(f" [x] Requesting Service with data: {request_data}")
-      channel.basic_publish(
-         exchange=exchange_name,
-         routing_key=routing_key,
-         properties=pika.BasicProperties(
-            reply_to=callback_queue,
-            correlation_id=correlation_id,
-         ),
-         body=json.dumps(request_data),
-      )
+      if threading.get_ident() == self._connection_thread:
+         publish()
+         return
 
-      channel.start_consuming()
-      # while resp is None:
-      #    connection.process_data_events()
-      connection.close()
-      return resp
+      def publish_logged():
+         try:
+            publish()
+         except Exception as ex:
+            print(f" [!] Unable to publish to '{exchange}'. Reason: {ex}")
 
-   def get_svc_api_methods_dict(self):
+      self.connection.add_callback_threadsafe(publish_logged)
+
+   def reconnect(self):
       """
-Retrieve all service API methods provided by the service (methods starting with the prefix 'svc_api_').
+Reconnect the broker after the connection was lost.
 
-**Returns:**
+The topology is declared again, consuming requests resumes and the service registration
+is sent again. Requests which were buffered or running are redelivered by the broker (the
+dedupe window answers those which already executed). If the service is requested to stop
+while the broker is down, it returns without connecting.
 
-  / *Type*: dict /
+**Returns:**
 
-  A dictionary containing the names and references of all service API methods.
+(*no returns*)
       """
-      methods = {method: getattr(self, method) for method in dir(self) if method.startswith('svc_api') and callable(getattr(self, method))}
-      if not self._SERVICE_INFO['gui_support']:
-         del methods['svc_api_get_gui_files']
-      return methods
-   
-   def get_svc_api_methods_info_dict(self, methods_dict):
+      started = time.monotonic()
+      self._consumer_tag = None
+      if self._buffered_requests is not None:
+         with self._buffered_requests_lock:
+            self._buffered_requests.clear()
+      attempt = 0
+      while True:
+         if self.connection is not None and self.connection.is_open:
+            try:
+               self.connection.close()
+            except Exception:
+               pass
+         try:
+            self.connect_broker(**self._kw_args)
+         except Exception:
+            # The service was requested to stop while the broker is down
+            if self._stop_requested:
+               return
+            raise
+         try:
+            self.replay_topology()
+            self.consume_requests()
+            self.register_service()
+            break
+         except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError) as ex:
+            if self._stop_requested:
+               raise
+            delay = self.get_reconnect_delay(attempt)
+            attempt += 1
+            print(f" [!] Unable to restore topology, retry in {delay:.1f}s. Reason: {ex}")
+            self.sleep_unless_stopped(delay)
+      self.record_reconnect(time.monotonic() - started)
+
+   def record_reconnect(self, seconds):
       """
-Retrieve information for all service APIs from the docstrings of the methods.
+Record a reconnect of the broker in the connection metrics.
 
 **Arguments:**
 
-* ``methods_dict``
+* ``seconds``
 
-  / *Condition*: required / *Type*: dict /
+  / *Condition*: required / *Type*: float /
 
-  A dictionary containing the names and references of all service API methods.
+  The time from losing the connection to serving again.
 
 **Returns:**
 
-  / *Type*: dict /
+(*no returns*)
+      """
+      self._connection_stats['reconnects'] += 1
+      self._connection_stats['reconnect_seconds'] += seconds
+      self._connection_stats['last_reconnect_seconds'] = seconds
+      print(f" [x] Reconnected broker in {seconds:.3f}s")
 
-  A dictionary containing the information of all service APIs extracted from their docstrings.
+   def serve(self):
       """
-      info_dict = {}
-      for method_name, method in methods_dict.items():
-         doc_string = method.__doc__
-         if doc_string is None:
-            print(f" [!] API '{method_name}' does not contain docstrings.")
-            continue
-         info_dict[method_name] = self.parse_docstring(method.__doc__)
-      return info_dict
+Call to start service serving.
 
-   def parse_docstring(self, docstring):
+Serving lasts until ``stop`` is called, then the service is shut down gracefully.
+
+**Returns:**
+
+(*no returns*)
       """
-Parse function's docstring to get arguments and return information.
+      try:
+         self.wait_broker_session()
+      except Exception:
+         self.close()
+         raise
 
-**Arguments:**
+      # The connection may be opened by the startup thread, it is served by this one
+      self._connection_thread = threading.get_ident()
+      topology_started = time.perf_counter()
+      channel = self.get_channel('control')
 
-* ``docstring``
+      self.declare(channel, 'exchange_declare', exchange=ServiceBase._SERVICE_REQUEST_EXCHANGE, exchange_type='direct')
+      try:
+         self.declare(channel, 'queue_declare', queue=self.name, arguments=self.get_request_queue_arguments())
+      except pika.exceptions.ChannelClosedByBroker as ex:
+         # The queue exists with other arguments (e.g. another --max_priority), deleting it
+         # would drop the requests queued for the running instances
+         self.close()
+         raise Exception(f"Queue '{self.name}' exists with other arguments than {self.get_request_queue_arguments()}, "
+                         f"delete it or start the service with matching --max_priority. Reason: {ex}")
+
+      # Purge the queue, unless the requests handed back by a previous instance are served
+      if not self._serve_args['keep_queue']:
+         channel.queue_purge(queue=self.name)
+         print(f"Queue '{self.name}' purged")
 
-  / *Condition*: required / *Type*: str /
+      # Bind the queue to the exchange with a routing key
+      self.declare(channel, 'queue_bind', exchange=ServiceBase._SERVICE_REQUEST_EXCHANGE, queue=self.name, routing_key=self._SERVICE_INFO['routing_key'])
 
-  Function's docstring.
+      if self._serve_args['workers'] > 0:
+         self._executor = ThreadPoolExecutor(max_workers=self._serve_args['workers'],
+                                             thread_name_prefix=f"{self.name}_worker")
+         self._buffered_requests = []
+         print(f" [x] Serving with {self._serve_args['workers']} workers")
+
+      self._startup_timings['topology'] = time.perf_counter() - topology_started
+      with self.startup_phase('consume'):
+         self.consume_requests()
+      self.report_startup()
+
+      self.start_http_server()
+      print(" [x] Awaiting RPC requests")
+      try:
+         while not self._stop_requested:
+            self._loop_heartbeat = time.monotonic()
+            try:
+               self.connection.process_data_events(time_limit=1)
+               self.flush_channels()
+            except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError) as ex:
+               print(f" [!] Connection to broker lost. Reason: {ex!r}")
+               self.reconnect()
+      finally:
+         self.shutdown()
+
+   def consume_requests(self):
+      """
+Start consuming the request queue of the service on the 'requests' channel.
 
 **Returns:**
 
-  / *Type*: str /
+(*no returns*)
+      """
+      channel = self.get_channel('requests')
+      channel.basic_qos(prefetch_count=self._serve_args['prefetch'])
+      self._consumer_channel = channel
+      self._consumer_tag = channel.basic_consume(queue=self.name, on_message_callback=self.on_request)
 
-  Payloads of the waiting signal if received.
+   def report_startup(self):
       """
-      result = {}
+Record the total startup time and print the time taken by each startup phase.
 
-      arg_pattern = re.compile(r'\*\s+``([^`]*)``\s+/\s+\*Condition\*:(.*?)\s+/\s+\*Type\*:(.*?)\s+(?:/\s+\*Default\*:(.*?))?\s*(?:/\s*([^*]+?.*?))?\n', re.DOTALL)
-      return_pattern = re.compile(r'\*\*Returns:\*\*\s+/\s+\*Type\*:(.*?)(?=(?:/\s+\*\*\n|\Z))', re.DOTALL)
+**Returns:**
 
-      try:
-         # Find matches for arguments
-         arg_matches = arg_pattern.findall(docstring)
-         arguments = []
+(*no returns*)
+      """
+      self._startup_timings['total'] = time.perf_counter() - self._startup_started
+      phases = ', '.join(f'{name} {seconds * 1000:.1f}ms' for name, seconds in self._startup_timings.items())
+      mode = "parallel" if self._serve_args['parallel_init'] else "sequential"
+      print(f" [x] Startup ({mode}): {phases}")
 
-         for match in arg_matches:
+   def stop(self):
+      """
+Request the service to stop serving.
+
+Only a flag is set, so that it is safe to call from a signal handler or another thread.
+The serving loop notices it within a second and shuts the service down (see ``shutdown``).
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._stop_requested = True
+
+   @property
+   def stop_requested(self):
+      """
+Whether the service was requested to stop serving.
+      """
+      return self._stop_requested
+
+   def shutdown(self):
+      """
+Shut the service down within the grace period.
+
+The service stops consuming, hands the buffered requests which have not started back
+to the broker, waits up to ``--grace_period`` seconds for the running ones to publish
+their responses, publishes the 'off' registration and closes the connection. Deliveries
+which are still unacknowledged at that point are requeued by the broker.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if self._closed:
+         return
+      deadline = time.monotonic() + self._serve_args['grace_period']
+      try:
+         if self._consumer_tag is not None:
+            self._consumer_channel.basic_cancel(self._consumer_tag)
+            self._consumer_tag = None
+         handed_back = self.hand_back_buffered_requests()
+         if handed_back:
+            print(f" [x] Handed {handed_back} requests back to the broker")
+         # Replies and acks of the workers are sent by the connection thread
+         while self._running_requests > 0 and time.monotonic() < deadline:
+            self.connection.process_data_events(time_limit=0.1)
+         self.connection.process_data_events(time_limit=0)
+         if self._running_requests > 0:
+            print(f" [!] {self._running_requests} requests still running after the grace period")
+         # Acknowledge the batched requests whose responses are published
+         while self.flush_channels() > 0 and time.monotonic() < deadline:
+            self.connection.process_data_events(time_limit=0.1)
+         self.unregister_service()
+         self.release_resources()
+      except Exception as ex:
+         print(f" [!] Unable to shut down gracefully. Reason: {ex}")
+      finally:
+         self.close()
+
+   def start_http_server(self):
+      """
+Start the HTTP listener serving the metrics and health endpoints in a background thread,
+if ``--http_port`` or ``--http_socket`` is given.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if self._http_server is not None:
+         return
+      try:
+         if self._serve_args['http_socket']:
+            self._http_server = ServiceUnixHttpServer(self, self._serve_args['http_socket'])
+         elif self._serve_args['http_port']:
+            self._http_server = ServiceHttpServer(self, ('', self._serve_args['http_port']))
+         else:
+            return
+      except Exception as ex:
+         print(f" [!] Unable to start HTTP listener. Reason: {ex}")
+         return
+      thread_worker = threading.Thread(target=self._http_server.serve_forever)
+      thread_worker.daemon = True
+      thread_worker.name = "http_listener"
+      thread_worker.start()
+      print(f" [x] Serving metrics and health on {self._http_server.server_address}")
+
+   def get_health(self):
+      """
+Get the liveness checks of the service, served by ``/healthz``.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  Whether the broker is connected, whether the consumer is alive (the serving loop turned
+  recently) and the checks of ``check_health``.
+      """
+      heartbeat = self._loop_heartbeat
+      checks = {
+         'broker': self.connection is not None and self.connection.is_open,
+         'consumer': self._consumer_tag is not None and
+                     (heartbeat is None or time.monotonic() - heartbeat < self._HEALTH_LOOP_TIMEOUT)
+      }
+      checks.update(self.check_health())
+      return checks
+
+   def check_health(self):
+      """
+Get the service specific liveness checks, e.g. whether its hardware is reachable.
+
+This method can be overridden by subclasses, it is called by the HTTP listener thread.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The result of each check.
+      """
+      return {}
+
+   def get_readiness(self):
+      """
+Get the readiness checks of the service, served by ``/readyz``.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The liveness checks, and whether the service accepts requests (it is not stopping).
+      """
+      checks = self.get_health()
+      checks['accepting'] = not self._stop_requested
+      return checks
+
+   def get_prometheus_metrics(self):
+      """
+Get the service metrics in the Prometheus text format, served by ``/metrics``.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The request counters and latency histograms per method, the response cache counters
+  and the request counters.
+      """
+      def labels(**kwargs):
+         # Label values escape backslashes and double quotes
+         return ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                         for key, value in kwargs.items())
+
+      stats = self._metrics.get_stats()
+      bounds = stats['buckets']
+      lines = ['# HELP service_requests_total Requests served per method.',
+               '# TYPE service_requests_total counter']
+      for method, entry in stats['methods'].items():
+         lines.append(f"service_requests_total{{{labels(service=self.name, method=method)}}} {entry['count']}")
+      lines += ['# HELP service_request_errors_total Requests which did not pass per method.',
+                '# TYPE service_request_errors_total counter']
+      for method, entry in stats['methods'].items():
+         lines.append(f"service_request_errors_total{{{labels(service=self.name, method=method)}}} {entry['errors']}")
+      lines += ['# HELP service_request_duration_seconds Latency of the request phases per method.',
+                '# TYPE service_request_duration_seconds histogram']
+      for method, entry in stats['methods'].items():
+         for phase, hist in entry['latency'].items():
+            phase_labels = labels(service=self.name, method=method, phase=phase)
+            cumulative = 0
+            for bound, count in zip(bounds, hist['counts']):
+               cumulative += count
+               lines.append(f'service_request_duration_seconds_bucket{{{phase_labels},le="{bound}"}} {cumulative}')
+            cumulative += hist['counts'][-1]
+            lines.append(f'service_request_duration_seconds_bucket{{{phase_labels},le="+Inf"}} {cumulative}')
+            lines.append(f"service_request_duration_seconds_sum{{{phase_labels}}} {hist['sum']}")
+            lines.append(f'service_request_duration_seconds_count{{{phase_labels}}} {cumulative}')
+      cache_stats = self._response_cache.get_stats()
+      for counter in ('hits', 'misses', 'evictions', 'invalidations'):
+         lines += [f'# HELP service_cache_{counter}_total Response cache {counter} per method.',
+                   f'# TYPE service_cache_{counter}_total counter']
+         for method, counters in cache_stats.items():
+            lines.append(f"service_cache_{counter}_total{{{labels(service=self.name, method=method)}}} {counters[counter]}")
+      request_stats = self.svc_api_get_request_stats()
+      lines += ['# HELP service_expired_requests_total Requests dropped because their deadline passed.',
+                '# TYPE service_expired_requests_total counter',
+                f"service_expired_requests_total{{{labels(service=self.name)}}} {request_stats['expired']}",
+                '# HELP service_duplicate_requests_total Requests answered from the dedupe window.',
+                '# TYPE service_duplicate_requests_total counter',
+                f"service_duplicate_requests_total{{{labels(service=self.name)}}} {request_stats['duplicates']}",
+                '# HELP service_reconnects_total Reconnects of the broker connection.',
+                '# TYPE service_reconnects_total counter',
+                f"service_reconnects_total{{{labels(service=self.name)}}} {self._connection_stats['reconnects']}",
+                '# HELP service_reconnect_seconds_total Time spent reconnecting the broker.',
+                '# TYPE service_reconnect_seconds_total counter',
+                f"service_reconnect_seconds_total{{{labels(service=self.name)}}} {self._connection_stats['reconnect_seconds']}",
+                '# HELP service_startup_seconds Time taken by each startup phase.',
+                '# TYPE service_startup_seconds gauge']
+      for phase, seconds in self._startup_timings.items():
+         lines.append(f"service_startup_seconds{{{labels(service=self.name, phase=phase)}}} {seconds}")
+      return '\n'.join(lines) + '\n'
+
+   def hand_back_buffered_requests(self):
+      """
+Reject the buffered requests which have not started yet so that the broker requeues them.
+
+**Returns:**
+
+  / *Type*: int /
+
+  The number of requests handed back.
+      """
+      if self._buffered_requests is None:
+         return 0
+      with self._buffered_requests_lock:
+         requests = [request for _, _, request in self._buffered_requests]
+         self._buffered_requests.clear()
+      for tsch, method, *_ in requests:
+         tsch.channel.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+      return len(requests)
+
+   def release_resources(self):
+      """
+Release the broker resources owned by the service before the connection is closed.
+
+This method can be overridden by subclasses, the connection is still open when it is called.
+
+**Returns:**
+
+(*no returns*)
+      """
+      pass
+
+   def get_request_queue_arguments(self):
+      """
+Get the arguments used to declare the request queue of the service.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The queue arguments, ``x-max-priority`` enables priorities if ``--max_priority`` is set.
+      """
+      if self._serve_args['max_priority'] > 0:
+         return {'x-max-priority': self._serve_args['max_priority']}
+      return None
+
+   def register_service(self):
+      """
+Register a service to the ServiceRegistry.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.publish_registration('on')
+      print(" [x] Registered service to Registry Service")
+
+   def unregister_service(self):
+      """
+Unregister a service from the ServiceRegistry.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.publish_registration('off')
+      print(" [x] Unregistered service from Registry Service")
+
+   def publish_registration(self, state):
+      """
+Publish the information and state of the service to the ServiceRegistry.
+
+The exchange and the durable queue of the ServiceRegistry are declared with the first
+registration only.
+
+**Arguments:**
+
+* ``state``
+
+  / *Condition*: required / *Type*: str /
+
+  The state of the service, 'on' or 'off'.
+
+**Returns:**
+
+(*no returns*)
+      """
+      exchange_name = ServiceBase._SERVICE_INFORMATION_EXCHANGE
+      queue_name = ServiceBase._SERVICE_INFORMATION_QUEUE
+      service_info = {
+         'info': self._SERVICE_INFO,
+         'state': state
+      }
+      self.publish_control(
+         exchange_name,
+         ServiceBase._SERVICE_INFORMATION_ROUTING_KEY,
+         json.dumps(service_info),
+         properties=pika.BasicProperties(
+            delivery_mode=2,  # Make message persistent
+         ),
+         declarations=[
+            ('exchange_declare', {'exchange': exchange_name, 'exchange_type': 'topic'}),
+            # Ensure the queue is durable and named to be reused
+            ('queue_declare', {'queue': queue_name, 'durable': True}),
+            # Bind the queue to specific routing keys
+            ('queue_bind', {'exchange': exchange_name, 'queue': queue_name, 'routing_key': ServiceBase._SERVICE_INFORMATION_ROUTING_KEY}),
+         ]
+      )
+
+   def request_service(self, request_data, exchange_name, routing_key, content_type=None, timeout=None, priority=None,
+                       idempotent=False, retries=None, attempt_timeout=None, hedge=None):
+      """
+Send a service request to a specific exchange with a given routing key.
+
+The request is sent by the client shared by all threads of the service (see ``get_rpc_client``),
+over one long-lived connection.
+
+**Arguments:**
+
+* ``request_data``
+
+  / *Condition*: required / *Type*: dict /
+
+  The data for the service request.
+
+* ``exchange_name``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the exchange to send the request to.
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key for the request.
+
+* ``content_type``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The content type selecting the wire codec of the request (JSON if not given).
+
+* ``timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds the caller waits for the response, ``--request_timeout`` if not given. The deadline
+  is sent along with the request so that the service drops it, instead of executing it, once
+  nobody waits for it anymore.
+
+* ``priority``
+
+  / *Condition*: optional / *Type*: int / *Default*: None /
+
+  The priority of the request, higher priorities are served first.
+
+* ``idempotent``
+
+  / *Condition*: optional / *Type*: bool / *Default*: False /
+
+  Whether the requested service API may be executed more than once, only such requests are
+  retried and hedged.
+
+* ``retries``
+
+  / *Condition*: optional / *Type*: int / *Default*: None /
+
+  The number of retries of an idempotent request, ``--request_retries`` if not given.
+
+* ``attempt_timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds each attempt of an idempotent request waits for its response before it is retried
+  (only the overall timeout applies if not given).
+
+* ``hedge``
+
+  / *Condition*: optional / *Type*: bool / *Default*: None /
+
+  Whether an idempotent request is sent again once it is slower than the 95th percentile of the
+  latency of the requested method (see ``ServiceCall``), ``--request_hedge`` if not given.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The response of the requested service, with the number of requests sent for it in ``attempts``.
+  Bytes results are returned as a memoryview of the received message body. If there is no response
+  before the deadline, the result is ``ResultType.EXPIRED``.
+      """
+      return self.request_service_async(request_data, exchange_name, routing_key, content_type, timeout, priority,
+                                        idempotent, retries, attempt_timeout, hedge).result()
+
+   def request_service_async(self, request_data, exchange_name, routing_key, content_type=None, timeout=None, priority=None,
+                             idempotent=False, retries=None, attempt_timeout=None, hedge=None):
+      """
+Send a service request without waiting for its response.
+
+Any number of requests, to any services, may be in flight at once: they share the client of
+the service (see ``get_rpc_client``). The futures can be collected as they finish, e.g. with
+``concurrent.futures.as_completed``. The arguments are the ones of ``request_service``.
+
+**Returns:**
+
+  / *Type*: concurrent.futures.Future /
+
+  The future resolved with the response of the requested service, see ``request_service``.
+      """
+      codec = get_codec(content_type)
+      print(f" [x] Requesting Service with data: {request_data}")
+      return self.request_service_encoded(request_data.get('method', ""), codec.encode(request_data), codec,
+                                          exchange_name, routing_key, timeout, priority,
+                                          idempotent, retries, attempt_timeout, hedge)
+
+   def request_service_encoded(self, request_api, body, codec, exchange_name, routing_key, timeout=None, priority=None,
+                               idempotent=False, retries=None, attempt_timeout=None, hedge=None):
+      """
+Send an encoded service request without waiting for its response, see ``request_service_async``.
+
+**Arguments:**
+
+* ``request_api``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested service API method.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The request encoded by ``codec``.
+
+* ``codec``
+
+  / *Condition*: required / *Type*: Codec /
+
+  The codec of the request.
+
+* ``exchange_name``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the exchange to send the request to.
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key for the request.
+
+* ``timeout``, ``priority``, ``idempotent``, ``retries``, ``attempt_timeout``, ``hedge``
+
+  / *Condition*: optional /
+
+  See ``request_service``.
+
+**Returns:**
+
+  / *Type*: concurrent.futures.Future /
+
+  The future resolved with the response of the requested service, see ``request_service``.
+      """
+      headers = {'accept': BINARY_CONTENT_TYPE}
+      if timeout is None:
+         timeout = self._serve_args['request_timeout'] or None
+      deadline = None
+      expiration = None
+      if timeout is not None:
+         deadline = time.time() + timeout
+         headers[ServiceBase._DEADLINE_HEADER] = deadline
+         # Let the broker drop the request if it is still queued at the deadline
+         expiration = str(max(int(timeout * 1000), 0))
+      rpc_client = self.get_rpc_client()
+      span = self.start_span('CLIENT')
+      headers[SpanRecorder.TRACEPARENT_HEADER] = SpanRecorder.format_traceparent(span)
+      properties = pika.BasicProperties(
+         content_type=codec.content_type,
+         headers=headers,
+         expiration=expiration,
+         priority=priority,
+      )
+      hedge_after = None
+      if not idempotent:
+         retries = 0
+      else:
+         if retries is None:
+            retries = self._serve_args['request_retries']
+         if hedge is None:
+            hedge = self._serve_args['request_hedge']
+         if hedge:
+            hedge_after = self.get_hedge_delay(routing_key, request_api)
+      call = ServiceCall(rpc_client, exchange_name, routing_key, properties, body,
+                         deadline, retries, attempt_timeout, hedge_after)
+      future = Future()
+
+      def on_response(response_future):
+         try:
+            response = response_future.result()
+            if response is None:
+               resp = ResponseMessage(request_api, ResultType.EXPIRED, "No response before the deadline").get_dict()
+            else:
+               resp = self.decode_response(*response)
+               print(f" [.] Got response: {resp}")
+         except Exception as ex:
+            self.finish_span(span, request_api, True, routing_key=routing_key, reason=str(ex), attempts=call.attempts)
+            future.set_exception(ex)
+            return
+         if call.latency is not None:
+            self.observe_client_latency(routing_key, request_api, call.latency)
+         resp['attempts'] = call.attempts
+         self.finish_span(span, request_api, resp.get('result') != ResultType.PASS,
+                          routing_key=routing_key, result=resp.get('result'), attempts=call.attempts)
+         future.set_result(resp)
+
+      call.start().add_done_callback(on_response)
+      return future
+
+   async def request_service_aio(self, request_data, exchange_name, routing_key, content_type=None, timeout=None, priority=None,
+                                 idempotent=False, retries=None, attempt_timeout=None, hedge=None):
+      """
+Send a service request and await its response, from a coroutine running on an asyncio event loop.
+
+The event loop is not blocked, many requests can be awaited at once (e.g. with ``asyncio.gather``).
+The arguments are the ones of ``request_service``.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The response of the requested service, see ``request_service``.
+      """
+      return await asyncio.wrap_future(self.request_service_async(request_data, exchange_name, routing_key,
+                                                                  content_type, timeout, priority,
+                                                                  idempotent, retries, attempt_timeout, hedge))
+
+   def get_rpc_client(self):
+      """
+Get the client shared by all threads of the service to request services, created on first use.
+
+**Returns:**
+
+  / *Type*: RpcClient /
+
+  The client of the service.
+      """
+      with self._rpc_client_lock:
+         if self._rpc_client is None:
+            self._rpc_client = RpcClient(pika.ConnectionParameters(**self._kw_args), f"{self.name}_rpc_client")
+         return self._rpc_client
+
+   def get_services_info(self, timeout=None):
+      """
+Request the information of all services registered to the ServiceRegistry.
+
+**Arguments:**
+
+* ``timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds to wait for the response of the ServiceRegistry, ``--request_timeout`` if not given.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The registered information (``_SERVICE_INFO``) of each service, by service name.
+      """
+      resp = self.request_service(self.create_request_data('svc_api_get_services_info', []),
+                                  ServiceBase._SERVICE_REQUEST_EXCHANGE, ServiceBase._SERVICE_REGISTRY_ROUTING_KEY,
+                                  timeout=timeout, idempotent=True)
+      return self.parse_services_info(resp)
+
+   @staticmethod
+   def parse_services_info(resp):
+      """
+Get the information of the services from the response of the ServiceRegistry to ``svc_api_get_services_info``.
+
+**Arguments:**
+
+* ``resp``
+
+  / *Condition*: required / *Type*: dict /
+
+  The response of the ServiceRegistry.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The registered information of each service, by service name.
+      """
+      if resp.get('result') != ResultType.PASS:
+         raise Exception(f"Unable to get the services information. Reason: {resp.get('result_data')}")
+      services_info = resp['result_data']
+      # The ServiceRegistry returns the information JSON encoded
+      return json.loads(services_info) if isinstance(services_info, str) else services_info
+
+   def get_service_client(self, service_name, timeout=None, content_type=None):
+      """
+Get a client of a registered service, generated from the ``methods_info`` the service registered.
+
+**Arguments:**
+
+* ``service_name``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service.
+
+* ``timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds each call of the client waits for its response, ``--request_timeout`` if not given.
+
+* ``content_type``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The content type selecting the wire codec of the requests (JSON if not given).
+
+**Returns:**
+
+  / *Type*: ServiceClient /
+
+  The client, sending its requests through this service.
+      """
+      services_info = self.get_services_info()
+      if service_name not in services_info:
+         raise Exception(f"Service {service_name} is unavailable!!!")
+      return generate_client(services_info[service_name])(self, timeout, content_type)
+
+   def scatter_gather(self, request_data, services=None, group=None, tag=None, timeout=None, content_type=None):
+      """
+Send a request to many registered services at once and gather their responses until a global deadline.
+
+All requests are in flight at once on the client shared by the threads of the service (see
+``get_rpc_client``), so gathering takes as long as the slowest service, bounded by the deadline,
+instead of the sum of all of them. Requests to idempotent service APIs (see ``methods_info``)
+are retried and hedged within the deadline.
+
+**Arguments:**
+
+* ``request_data``
+
+  / *Condition*: required / *Type*: dict /
+
+  The data of the request sent to every service, or a function returning it from the name and
+  the registered information of a service (None skips the service).
+
+* ``services``
+
+  / *Condition*: optional / *Type*: list / *Default*: None /
+
+  The names of the requested services, all registered services if not given.
+
+* ``group``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  Only request the services registered with this group.
+
+* ``tag``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  Only request the services registered with this tag.
+
+* ``timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds until the deadline of all requests (including the lookup of the services),
+  ``--request_timeout`` if not given. The gathering always has a deadline, 30 seconds if
+  ``--request_timeout`` is 0.
+
+* ``content_type``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The content type selecting the wire codec of the requests (JSON if not given).
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The response of each requested service, by service name. The results are partial: services
+  without response before the deadline have the result ``ResultType.EXPIRED``, unavailable ones
+  ``ResultType.FAIL`` and failed requests ``ResultType.EXCEPT``.
+      """
+      if timeout is None:
+         timeout = self._serve_args['request_timeout'] or self._DEFAULT_REQUEST_TIMEOUT
+      deadline = time.time() + timeout
+      services_info = self.get_services_info(timeout)
+      names = list(services_info) if services is None else list(services)
+      responses = {}
+      requests = {}
+      for name in names:
+         info = services_info.get(name)
+         if info is None:
+            responses[name] = ResponseMessage("", ResultType.FAIL, f"Service {name} is unavailable!!!").get_dict()
+            continue
+         if (group is not None and info.get('group') != group) or (tag is not None and info.get('tag') != tag):
+            continue
+         data = request_data(name, info) if callable(request_data) else request_data
+         if data is None:
+            continue
+         request_api = data.get('method', "")
+         idempotent = ((info.get('methods_info') or {}).get(request_api) or {}).get('idempotent', False)
+         remaining = max(deadline - time.time(), 0)
+         try:
+            future = self.request_service_async(data, ServiceBase._SERVICE_REQUEST_EXCHANGE, info['routing_key'],
+                                                content_type, remaining, idempotent=idempotent)
+         except Exception as ex:
+            responses[name] = ResponseMessage(request_api, ResultType.EXCEPT, str(ex)).get_dict()
+            continue
+         requests[name] = (request_api, future)
+
+      wait([future for _, future in requests.values()], timeout=max(deadline - time.time(), 0))
+      for name, (request_api, future) in requests.items():
+         if not future.done():
+            # Its late response is dropped
+            responses[name] = ResponseMessage(request_api, ResultType.EXPIRED, "No response before the deadline").get_dict()
+         elif future.exception() is not None:
+            responses[name] = ResponseMessage(request_api, ResultType.EXCEPT, str(future.exception())).get_dict()
+         else:
+            responses[name] = future.result()
+      return {name: responses[name] for name in names if name in responses}
+
+   def observe_client_latency(self, routing_key, method, seconds):
+      """
+Record the latency of a response to a request of the service.
+
+**Arguments:**
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key of the requested service.
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested service API method.
+
+* ``seconds``
+
+  / *Condition*: required / *Type*: float /
+
+  The latency of the response.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._client_latencies_lock:
+         histogram = self._client_latencies.get((routing_key, method))
+         if histogram is None:
+            histogram = self._client_latencies[(routing_key, method)] = LatencyHistogram()
+         histogram.observe(seconds)
+
+   def get_hedge_delay(self, routing_key, method):
+      """
+Get the seconds after which a request is hedged, the 95th percentile of the latency of the
+requested method.
+
+**Arguments:**
+
+* ``routing_key``
+
+  / *Condition*: required / *Type*: str /
+
+  The routing key of the requested service.
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested service API method.
+
+**Returns:**
+
+  / *Type*: float /
+
+  The delay in seconds, None while there are too few latency samples to hedge the request.
+      """
+      with self._client_latencies_lock:
+         histogram = self._client_latencies.get((routing_key, method))
+         if histogram is None or sum(histogram.counts) < self._HEDGE_MIN_SAMPLES:
+            return None
+         return histogram.quantile(0.95)
+
+   def get_svc_api_methods_dict(self):
+      """
+Retrieve all service API methods provided by the service (methods starting with the prefix 'svc_api_').
+
+The profiling APIs are only provided with ``--enable_profiling``.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  A dictionary containing the names and references of all service API methods.
+      """
+      return {name: getattr(self, name) for name in self._DISPATCH_TABLE
+              if self._serve_args['enable_profiling'] or name not in self._PROFILING_APIS}
+
+   def get_api_entry(self, request_api):
+      """
+Get the dispatch table entry of a requested service API method provided by the service.
+
+**Arguments:**
+
+* ``request_api``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested method.
+
+**Returns:**
+
+  / *Type*: ServiceApi /
+
+  The entry, None if the service does not provide the method.
+      """
+      if request_api not in self._api_dict:
+         return None
+      return self._DISPATCH_TABLE.get(request_api)
+
+   @classmethod
+   def build_dispatch_table(cls):
+      """
+Build the dispatch table of the service class from its service API methods.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  A dictionary containing the names and ServiceApi entries of all service API methods.
+      """
+      table = {}
+      for name in dir(cls):
+         if not name.startswith('svc_api'):
+            continue
+         function = getattr(cls, name)
+         if not callable(function):
+            continue
+         if name == 'svc_api_get_gui_files' and not cls._SERVICE_INFO.get('gui_support'):
+            continue
+         info = None
+         if function.__doc__ is not None:
+            info = cls.parse_docstring(function.__doc__)
+         table[name] = ServiceApi(name, function, info)
+      return table
+
+   def __init_subclass__(cls, **kwargs):
+      """
+Build the dispatch table once when a service class is created.
+
+**Returns:**
+
+(*no returns*)
+      """
+      super().__init_subclass__(**kwargs)
+      cls._DISPATCH_TABLE = cls.build_dispatch_table()
+
+   def get_api_lock(self, method):
+      """
+Get the lock which must be held while executing a service API method.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: callable /
+
+  The service API method (or request handler) to be executed.
+
+**Returns:**
+
+  / *Type*: threading.RLock /
+
+  The service lock for serialized methods, None for thread-safe methods.
+      """
+      if getattr(method, '_svc_api_thread_safe', False):
+         return None
+      return self._serial_lock
+   
+   def get_svc_api_methods_info_dict(self, methods_dict):
+      """
+Retrieve information for all service APIs from the docstrings of the methods.
+
+**Arguments:**
+
+* ``methods_dict``
+
+  / *Condition*: required / *Type*: dict /
+
+  A dictionary containing the names and references of all service API methods.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  A dictionary containing the information of all service APIs extracted from their docstrings.
+      """
+      info_dict = {}
+      for method_name, method in methods_dict.items():
+         doc_string = method.__doc__
+         if doc_string is None:
+            print(f" [!] API '{method_name}' does not contain docstrings.")
+            continue
+         entry = self._DISPATCH_TABLE.get(method_name)
+         if entry is not None and entry.info is not None:
+            info = dict(entry.info)
+         else:
+            info = self.parse_docstring(method.__doc__)
+         # Cached service APIs are idempotent, their requests may be retried and hedged
+         info['idempotent'] = entry is not None and entry.cache is not None
+         info_dict[method_name] = info
+      return info_dict
+
+   @staticmethod
+   def parse_docstring(docstring):
+      """
+Parse function's docstring to get arguments and return information.
+
+**Arguments:**
+
+* ``docstring``
+
+  / *Condition*: required / *Type*: str /
+
+  Function's docstring.
+
+**Returns:**
+
+  / *Type*: str /
+
+  Payloads of the waiting signal if received.
+      """
+      result = {}
+
+      arg_pattern = re.compile(r'\*\s+``([^`]*)``\s+/\s+\*Condition\*:(.*?)\s+/\s+\*Type\*:(.*?)\s+(?:/\s+\*Default\*:(.*?))?\s*(?:/\s*([^*]+?.*?))?\n', re.DOTALL)
+      return_pattern = re.compile(r'\*\*Returns:\*\*\s+/\s+\*Type\*:(.*?)(?=(?:/\s+\*\*\n|\Z))', re.DOTALL)
+
+      try:
+         # Find matches for arguments
+         arg_matches = arg_pattern.findall(docstring)
+         arguments = []
+
+         for match in arg_matches:
             arg_name, condition, arg_type, default_value, description = map(str.strip, match)
             # Fix the description to exclude the next argument's type information
             description = re.sub(r'\n\s+\*\*.*', '', description)
@@ -532,69 +1846,884 @@ Parse function's docstring to get arguments and return information.
                'description': description
             })
 
-         result['arguments'] = arguments
+         result['arguments'] = arguments
+
+         # Find matches for return type
+         return_matches = return_pattern.findall(docstring)
+         if return_matches:
+            result['return_type'] = return_matches[0].strip()
+      except Exception as ex:
+         print(f" [!] Unable to analysis the docstring: '{docstring}'. Please check the docstring format.")
+
+      return result
+
+   @thread_safe
+   @cached()
+   def svc_api_get_version(self):
+      """
+Get the service version.
+
+**Returns:**
+
+  / *Type*: str /
+
+  Version of the service.
+      """      
+      return self._SERVICE_INFO['version']
+
+   @cached(ttl=60, maxsize=1)
+   def svc_api_get_gui_files(self):
+      """
+Get the GUI files of the service, the content of its 'GUIs' folder compressed into a ZIP archive.
+
+The archive is cached for a minute.
+
+**Returns:**
+
+  / *Type*: bytes /
+
+  The ZIP archive, None if the service has no GUI support.
+      """
+      # Compress the files into a ZIP file
+      file_content = None
+      if self._SERVICE_INFO['gui_support']:
+         zip_file_path = 'files.zip'
+         with zipfile.ZipFile(zip_file_path, 'w') as zipf:
+            for root, dirs, files in os.walk('GUIs'):
+               for file in files:
+                  zipf.write(os.path.join(root, file), os.path.relpath(os.path.join(root, file), 'GUIs'))
+
+         with open(zip_file_path, 'rb') as file:
+            file_content = file.read()
+
+         os.remove(zip_file_path)
+
+      return file_content
+
+   @thread_safe
+   def svc_api_profile_start(self, mode='sampling', interval=0.005):
+      """
+Start profiling the running service, until ``svc_api_profile_stop`` is called.
+
+**Arguments:**
+
+* ``mode``
+
+  / *Condition*: optional / *Type*: str / *Default*: 'sampling' /
+
+  'sampling' samples the stacks of all threads from a background thread. 'cprofile'
+  traces every call with cProfile; it only sees the thread executing the requests, so
+  it requires a service serving without ``--workers``.
+
+* ``interval``
+
+  / *Condition*: optional / *Type*: float / *Default*: 0.005 /
+
+  Seconds between two samples of the 'sampling' mode.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The started profiling mode.
+      """
+      with self._profiler_lock:
+         if self._profiler is not None:
+            raise Exception("Profiler is already running")
+         if mode == 'sampling':
+            profiler = SamplingProfiler(max(float(interval), 0.001))
+            profiler.start()
+         elif mode == 'cprofile':
+            if self._executor is not None:
+               raise Exception("cProfile mode requires a service serving without workers, use the sampling mode")
+            profiler = cProfile.Profile()
+            profiler.enable()
+         else:
+            raise Exception(f"Unsupported profiling mode '{mode}'")
+         self._profiler = profiler
+      print(f" [x] Profiling started ({mode})")
+      return mode
+
+   @thread_safe
+   def svc_api_profile_stop(self, output=None):
+      """
+Stop profiling the running service and get the profile.
+
+**Arguments:**
+
+* ``output``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The format of the profile: 'collapsed' (collapsed stacks, for flame graphs) for the
+  'sampling' mode; 'pstats' (a file loadable by ``pstats.Stats``) or 'text' (the stats
+  sorted by cumulative time) for the 'cprofile' mode. Defaults to 'collapsed' and 'pstats'.
+
+**Returns:**
+
+  / *Type*: bytes /
+
+  The profile, sent as the raw message body to callers accepting binary responses.
+      """
+      with self._profiler_lock:
+         profiler = self._profiler
+         if profiler is None:
+            raise Exception("Profiler is not running")
+         if isinstance(profiler, SamplingProfiler):
+            if output not in (None, 'collapsed'):
+               raise Exception(f"Unsupported output '{output}' for the sampling mode")
+            self._profiler = None
+            profile = profiler.stop()
+            print(f" [x] Profiling stopped ({profiler.samples} samples)")
+            return profile
+         if output not in (None, 'pstats', 'text'):
+            raise Exception(f"Unsupported output '{output}' for the cprofile mode")
+         self._profiler = None
+         profiler.disable()
+      print(" [x] Profiling stopped")
+      if output in (None, 'pstats'):
+         profiler.create_stats()
+         return marshal.dumps(profiler.stats)
+      stream = io.StringIO()
+      pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats()
+      return stream.getvalue().encode()
+
+   @thread_safe
+   def svc_api_get_cache_stats(self):
+      """
+Get the counters of the response cache.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The hits, misses, evictions, invalidations and current size per cached API.
+      """
+      return self._response_cache.get_stats()
+
+   @thread_safe
+   def svc_api_get_metrics(self):
+      """
+Get the request metrics of the service.
+
+Latencies are split into the queue wait (from the time the request was sent, or received
+if the sender did not tell), the decoding, the handler and the publishing of the response.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The bucket bounds of the latency histograms in seconds, the number of requests, errors
+  and latency histograms per method, the response cache counters, the request counters,
+  the broker reconnect counters, the publish and acknowledgement counters of the channels
+  and the seconds taken by each startup phase.
+      """
+      metrics = self._metrics.get_stats()
+      metrics['cache'] = self._response_cache.get_stats()
+      metrics['requests'] = self.svc_api_get_request_stats()
+      metrics['connection'] = dict(self._connection_stats)
+      metrics['channels'] = {name: channel.get_stats() for name, channel in list(self._channels.items())}
+      metrics['startup'] = dict(self._startup_timings)
+      return metrics
+
+   @thread_safe
+   def svc_api_get_spans(self, trace_id=None):
+      """
+Get the latest trace spans of the service (Zipkin v2 JSON format).
+
+**Arguments:**
+
+* ``trace_id``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  Only get the spans of this trace.
+
+**Returns:**
+
+  / *Type*: list /
+
+  The spans, oldest first.
+      """
+      return self._spans.get_spans(trace_id)
+
+   @thread_safe
+   def svc_api_get_request_stats(self):
+      """
+Get the counters of requests which were not executed.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The number of expired requests and of duplicate requests answered from the dedupe window.
+      """
+      return {
+         'expired': self._expired_requests,
+         'duplicates': self._dedup_window.duplicates
+      }
+
+   def is_specific_request(self, request):
+      """
+Check if the request is a specific request.
+
+**Arguments:**
+
+* ``request``
+
+  / *Condition*: required / *Type*: object /
+
+  The request object to be checked.
+
+**Returns:**
+
+  / *Type*: bool /
+
+  True if the request is a specific request, otherwise False.
+      """
+      return False
+
+   def on_specific_request(self, ch, method, props, body):
+      """
+Handle the event when a specific request is received.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the message from the pika library.
+
+* ``body``
+
+  / *Condition*: required / *Type*: dict /
+
+  The body of the message as a dictionary.
+
+**Returns:**
+
+(*no returns*)
+      """
+      raise Exception("Not suppoted request")
+
+   def on_request(self, ch, method, props, body):
+      """
+Handle an incoming request.
+
+The request is processed directly on the connection thread, or handed to the worker
+pool when the service is started with ``--workers``.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the message from the pika library.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The body of the message as bytes.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if self._executor is None:
+         self.process_request(ch, method, props, body)
+      else:
+         # Each submitted task executes the buffered request with the highest priority
+         with self._buffered_requests_lock:
+            heapq.heappush(self._buffered_requests, (-(props.priority or 0), next(self._buffered_requests_seq),
+                                                     (ThreadSafeChannel(self.connection, ch), method, props, body, time.time())))
+         future = self._executor.submit(self._process_buffered_request)
+         future.add_done_callback(self._on_request_done)
+
+   def _process_buffered_request(self):
+      """
+Execute the buffered request with the highest priority (the oldest one among equal priorities).
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._buffered_requests_lock:
+         if not self._buffered_requests:
+            # The request was handed back to the broker by a shutdown
+            return
+         _, _, request = heapq.heappop(self._buffered_requests)
+         self._running_requests += 1
+      try:
+         self.process_request(*request)
+      finally:
+         with self._buffered_requests_lock:
+            self._running_requests -= 1
+
+   def _on_request_done(self, future):
+      """
+Report an error raised by a request executed in the worker pool.
+
+**Arguments:**
+
+* ``future``
+
+  / *Condition*: required / *Type*: concurrent.futures.Future /
+
+  The future of the finished request.
+
+**Returns:**
+
+(*no returns*)
+      """
+      ex = future.exception()
+      if ex is not None:
+         print(f" [!] Unable to process request. Reason: {ex}")
+
+   def process_request(self, ch, method, props, body, received=None):
+      """
+Execute a request and publish its response.
+
+The latency of each phase of the request is recorded in the service metrics.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
 
-         # Find matches for return type
-         return_matches = return_pattern.findall(docstring)
-         if return_matches:
-            result['return_type'] = return_matches[0].strip()
+  The properties of the message from the pika library.
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The body of the message as bytes.
+
+* ``received``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  The time (seconds since the epoch) the request was received, if it waited to be executed.
+
+**Returns:**
+
+(*no returns*)
+      """
+      timer = RequestTimer(self.get_queued_at(props, received))
+      span = self.start_span('SERVER', SpanRecorder.parse_traceparent(props))
+      trace_token = _TRACE_CONTEXT.set((span['traceId'], span['id']))
+      in_progress = False
+      try:
+         try:
+            body = self.decode_request(body, get_codec(props.content_type))
+         except Exception as ex:
+            timer.lap('decode')
+            request_api, result_type, response = "", ResultType.EXCEPT, str(ex)
+         else:
+            timer.lap('decode')
+            if self.replay_duplicate(ch, method, props, body):
+               return
+            in_progress = True
+            if self.reject_expired(ch, method, props, body):
+               self.record_metrics(timer, body.get('method', "") if isinstance(body, dict) else "", True)
+               return
+            request_api, result_type, response = self.execute_request(body)
+
+         if response == "Non-supported request" and self.is_specific_request(request_api):
+            with self._acquire(self.get_api_lock(self.on_specific_request)):
+               self.on_specific_request(ch, method, props, body)
+            timer.lap('handler')
+            self.record_metrics(timer, request_api, False)
+         else:
+            timer.lap('handler')
+            self.remember_response(props, body, request_api, result_type, response)
+            # print(props.reply_to)
+            self.publish_response(ch, props, request_api, result_type, response)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            timer.lap('publish')
+            self.record_metrics(timer, request_api, result_type != ResultType.PASS)
+      finally:
+         if in_progress:
+            self.forget_request(props, body)
+         _TRACE_CONTEXT.reset(trace_token)
+         self.finish_span(span, timer.name, timer.error, timer.phases)
+
+   def start_span(self, kind, parent=None):
+      """
+Start a trace span of the service.
+
+**Arguments:**
+
+* ``kind``
+
+  / *Condition*: required / *Type*: str /
+
+  'SERVER' for a request executed by the service, 'CLIENT' for a request sent by the service.
+
+* ``parent``
+
+  / *Condition*: optional / *Type*: tuple / *Default*: None /
+
+  The trace id and span id of the parent span. If not given, the span is a child of the
+  request being executed, or starts a new trace.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The span, to be finished by ``finish_span``.
+      """
+      if parent is None:
+         parent = _TRACE_CONTEXT.get()
+      span = {
+         'traceId': parent[0] if parent is not None else '%032x' % random.getrandbits(128),
+         'id': '%016x' % random.getrandbits(64),
+         'kind': kind,
+         'timestamp': int(time.time() * 1000000),
+         'localEndpoint': {'serviceName': self.name}
+      }
+      if parent is not None:
+         span['parentId'] = parent[1]
+      return span
+
+   def finish_span(self, span, name, error, phases=None, **tags):
+      """
+Finish a trace span and keep it.
+
+**Arguments:**
+
+* ``span``
+
+  / *Condition*: required / *Type*: dict /
+
+  The span returned by ``start_span``.
+
+* ``name``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested method.
+
+* ``error``
+
+  / *Condition*: required / *Type*: bool /
+
+  Whether the request did not pass.
+
+* ``phases``
+
+  / *Condition*: optional / *Type*: dict / *Default*: None /
+
+  The latency in seconds per phase of the request, kept as tags.
+
+* ``**tags``
+
+  / *Condition*: optional / *Type*: dict /
+
+  Other tags of the span.
+
+**Returns:**
+
+(*no returns*)
+      """
+      span['name'] = name
+      span['duration'] = max(int(time.time() * 1000000) - span['timestamp'], 1)
+      span_tags = {f'{phase}.seconds': f'{seconds:.6f}' for phase, seconds in (phases or {}).items()}
+      span_tags.update((key, str(value)) for key, value in tags.items())
+      if error:
+         span_tags['error'] = 'true'
+      span['tags'] = span_tags
+      self._spans.record(span)
+
+   @classmethod
+   def get_queued_at(cls, props, received=None):
+      """
+Get the time a request started waiting to be executed.
+
+**Arguments:**
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the request message.
+
+* ``received``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  The time (seconds since the epoch) the request was received.
+
+**Returns:**
+
+  / *Type*: float /
+
+  The time the request was sent if the sender told it, otherwise the time it was received.
+      """
+      sent = (props.headers or {}).get(cls._SENT_HEADER)
+      if isinstance(sent, (int, float)):
+         return sent
+      return received
+
+   def record_metrics(self, timer, request_api, error):
+      """
+Record the phases of a served request in the service metrics.
+
+Requests for unknown methods are recorded as 'unknown', so that the metrics stay bounded.
+
+**Arguments:**
+
+* ``timer``
+
+  / *Condition*: required / *Type*: RequestTimer /
+
+  The timer of the request.
+
+* ``request_api``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested method.
+
+* ``error``
+
+  / *Condition*: required / *Type*: bool /
+
+  Whether the request did not pass.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if not isinstance(request_api, str) or not (request_api in self._api_dict
+                                                  or request_api == self._BATCH_METHOD
+                                                  or self.is_specific_request(request_api)):
+         request_api = 'unknown'
+      timer.name = request_api
+      timer.error = error
+      self._metrics.record(request_api, error, timer.phases)
+
+   def replay_duplicate(self, ch, method, props, body):
+      """
+Answer a request which was already executed with the response kept in the dedupe window.
+
+This prevents a redelivered request (e.g. after a reconnect) or a request repeated with
+the same ``idempotency-key`` header from executing its service API a second time.
+
+Otherwise the request is marked in progress, and must be ended by ``remember_response`` or
+``forget_request``. A duplicate of a request in progress is answered once the response is
+kept, or handed back to the broker if the response is not kept.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the message from the pika library.
+
+* ``body``
+
+  / *Condition*: required / *Type*: dict /
+
+  The decoded request.
+
+**Returns:**
+
+  / *Type*: bool /
+
+  True if the request was a duplicate and has been answered or parked.
+      """
+      if not self._is_remembered(body.get('method') if isinstance(body, dict) else None):
+         return False
+      hit, kept = self._dedup_window.begin(self._dedup_window.get_key(props, body),
+                                           lambda kept: self._answer_duplicate(ch, method, props, kept))
+      if not hit:
+         return False
+      if kept is None:
+         print(f" [x] Duplicate request '{body.get('method')}' parked until the first one is answered")
+      else:
+         self._answer_duplicate(ch, method, props, kept)
+      return True
+
+   def _answer_duplicate(self, ch, method, props, kept):
+      """
+Answer a duplicate request with the kept response, or hand it back to the broker if there is none.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the message from the pika library.
+
+* ``kept``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The kept (request, result, result_data), None if the response was not kept.
+
+**Returns:**
+
+(*no returns*)
+      """
+      try:
+         if kept is None:
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            return
+         print(f" [x] Duplicate request '{kept[0]}' answered with the kept response")
+         self.publish_response(ch, props, *kept)
+         ch.basic_ack(delivery_tag=method.delivery_tag)
       except Exception as ex:
-         print(f" [!] Unable to analysis the docstring: '{docstring}'. Please check the docstring format.")
+         print(f" [!] Unable to answer duplicate request '{props.correlation_id}'. Reason: {ex}")
+
+   def forget_request(self, props, body):
+      """
+End a request marked in progress by ``replay_duplicate`` whose response is not kept.
+
+Nothing is done if the response of the request has been kept by ``remember_response``.
+
+**Arguments:**
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the request message.
+
+* ``body``
+
+  / *Condition*: required / *Type*: dict /
+
+  The decoded request.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._dedup_window.discard(self._dedup_window.get_key(props, body))
+
+   def _is_remembered(self, request_api):
+      """
+Check whether the response to a service API is kept in the dedupe window.
+
+Responses of cached (idempotent) service APIs are not kept, executing them again is harmless.
+
+**Arguments:**
+
+* ``request_api``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested API.
+
+**Returns:**
+
+  / *Type*: bool /
+
+  True if the response is kept.
+      """
+      entry = self._DISPATCH_TABLE.get(request_api)
+      return entry is None or entry.cache is None
+
+   @classmethod
+   def get_deadline(cls, props):
+      """
+Get the deadline of a request.
+
+The deadline is given by the ``deadline`` header, or by the ``timestamp`` and
+``expiration`` properties of the message.
+
+**Arguments:**
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the request message.
+
+**Returns:**
+
+  / *Type*: float /
+
+  The deadline in seconds since the epoch, None if the request has no deadline.
+      """
+      deadline = (props.headers or {}).get(cls._DEADLINE_HEADER)
+      try:
+         if deadline is not None:
+            return float(deadline)
+         if props.expiration and props.timestamp:
+            return props.timestamp + int(props.expiration) / 1000.0
+      except (TypeError, ValueError):
+         print(f" [!] Ignore invalid deadline of request '{props.correlation_id}'")
+      return None
+
+   def reject_expired(self, ch, method, props, body):
+      """
+Answer a request whose deadline passed with ``ResultType.EXPIRED`` instead of executing it.
+
+**Arguments:**
+
+* ``ch``
+
+  / *Condition*: required / *Type*: pika.channel.Channel /
+
+  The channel object from the pika library.
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+
+  The method object containing delivery information from the pika library.
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the message from the pika library.
+
+* ``body``
+
+  / *Condition*: required / *Type*: dict /
+
+  The decoded request.
+
+**Returns:**
+
+  / *Type*: bool /
+
+  True if the request expired and has been answered.
+      """
+      deadline = self.get_deadline(props)
+      if deadline is None:
+         return False
+      late = time.time() - deadline
+      if late <= 0:
+         return False
+      self._expired_requests += 1
+      request_api = body.get('method', "") if isinstance(body, dict) else ""
+      print(f" [!] Request '{request_api}' expired {late:.3f}s ago, dropped ({self._expired_requests} expired requests)")
+      self.publish_response(ch, props, request_api, ResultType.EXPIRED, f"Request expired {late:.3f}s before being executed")
+      ch.basic_ack(delivery_tag=method.delivery_tag)
+      return True
+
+   def remember_response(self, props, body, request_api, result_type, response):
+      """
+Keep the response to a request in the dedupe window, and answer its parked duplicates.
+
+Responses of cached (idempotent) service APIs are not kept, executing them again is harmless.
 
-      return result
+**Arguments:**
 
-   def svc_api_get_version(self):
-      """
-Get the service version.
+* ``props``
 
-**Returns:**
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
 
-  / *Type*: str /
+  The properties of the request message.
 
-  Version of the service.
-      """      
-      return self._SERVICE_INFO['version']
+* ``body``
 
-   def svc_api_get_gui_files(self):
-      # Compress the files into a ZIP file
-      file_content = None
-      if self._SERVICE_INFO['gui_support']:
-         zip_file_path = 'files.zip'
-         with zipfile.ZipFile(zip_file_path, 'w') as zipf:
-            for root, dirs, files in os.walk('GUIs'):
-               for file in files:
-                  zipf.write(os.path.join(root, file), os.path.relpath(os.path.join(root, file), 'GUIs'))
+  / *Condition*: required / *Type*: dict /
 
-         with open(zip_file_path, 'rb') as file:
-            file_content = file.read()
+  The decoded request.
 
-         os.remove(zip_file_path)
+* ``request_api``
 
-      return file_content
+  / *Condition*: required / *Type*: str /
 
-   def is_specific_request(self, request):
-      """
-Check if the request is a specific request.
+  The requested API.
 
-**Arguments:**
+* ``result_type``
 
-* ``request``
+  / *Condition*: required / *Type*: ResultType /
+
+  The result of processing the request.
+
+* ``response``
 
   / *Condition*: required / *Type*: object /
 
-  The request object to be checked.
+  The result data returned.
 
 **Returns:**
 
-  / *Type*: bool /
-
-  True if the request is a specific request, otherwise False.
+(*no returns*)
       """
-      return False
+      if not self._is_remembered(request_api):
+         return
+      self._dedup_window.put(self._dedup_window.get_key(props, body), (request_api, result_type, response))
 
-   def on_specific_request(self, ch, method, props, body):
+   def publish_response(self, ch, props, request_api, result_type, response):
       """
-Handle the event when a specific request is received.
+Publish the response to a request to the reply queue of the caller.
+
+The response is encoded with the codec used by the caller. Bytes results are sent as the
+raw message body (content type ``application/octet-stream``, request and result in the
+headers) if the caller accepts it, otherwise they are encoded by the codec.
 
 **Arguments:**
 
@@ -604,98 +2733,425 @@ Handle the event when a specific request is received.
 
   The channel object from the pika library.
 
-* ``method``
+* ``props``
 
-  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
 
-  The method object containing delivery information from the pika library.
+  The properties of the request message.
 
-* ``props``
+* ``request_api``
 
-  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+  / *Condition*: required / *Type*: str /
 
-  The properties of the message from the pika library.
+  The requested API.
 
-* ``body``
+* ``result_type``
 
-  / *Condition*: required / *Type*: dict /
+  / *Condition*: required / *Type*: ResultType /
 
-  The body of the message as a dictionary.
+  The result of processing the request.
+
+* ``response``
+
+  / *Condition*: required / *Type*: object /
+
+  The result data returned.
 
 **Returns:**
 
 (*no returns*)
       """
-      raise Exception("Not suppoted request")
+      if isinstance(response, BINARY_TYPES) and self.accepts_binary(props):
+         properties = pika.BasicProperties(correlation_id=props.correlation_id,
+                                           content_type=BINARY_CONTENT_TYPE,
+                                           headers={'request': request_api, 'result': result_type})
+         body = response
+      else:
+         if isinstance(response, memoryview):
+            # Not every codec supports buffers, e.g. raw results forwarded by the registry
+            response = response.tobytes()
+         codec = get_codec(props.content_type)
+         properties = pika.BasicProperties(correlation_id=props.correlation_id,
+                                           content_type=codec.content_type)
+         body = self.encode_response(request_api, result_type, response, codec)
+      ch.basic_publish(exchange='', routing_key=props.reply_to, properties=properties, body=body)
 
-   def on_request(self, ch, method, props, body):
+   @staticmethod
+   def accepts_binary(props):
       """
-Handle an incoming request.
+Check if the caller accepts raw binary responses.
 
 **Arguments:**
 
-* ``ch``
+* ``props``
 
-  / *Condition*: required / *Type*: pika.channel.Channel /
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
 
-  The channel object from the pika library.
+  The properties of the request message.
 
-* ``method``
+**Returns:**
 
-  / *Condition*: required / *Type*: pika.spec.Basic.Deliver /
+  / *Type*: bool /
 
-  The method object containing delivery information from the pika library.
+  True if the ``accept`` header of the request contains ``application/octet-stream``.
+      """
+      accept = (props.headers or {}).get('accept')
+      if isinstance(accept, bytes):
+         accept = accept.decode('utf-8')
+      return isinstance(accept, str) and BINARY_CONTENT_TYPE in accept
 
-* ``props``
+   @staticmethod
+   def decode_response(properties, body):
+      """
+Decode the response to a request.
+
+**Arguments:**
+
+* ``properties``
 
   / *Condition*: required / *Type*: pika.spec.BasicProperties /
 
-  The properties of the message from the pika library.
+  The properties of the response message.
 
 * ``body``
 
   / *Condition*: required / *Type*: bytes /
 
-  The body of the message as bytes.
+  The body of the response message.
 
 **Returns:**
 
-(*no returns*)
+  / *Type*: dict /
+
+  The response message as a dictionary, raw binary results are returned as a memoryview
+  of the body without copying.
+      """
+      if properties.content_type == BINARY_CONTENT_TYPE:
+         headers = properties.headers or {}
+         return {
+            'request': headers.get('request', ""),
+            'result': headers.get('result', ResultType.PASS),
+            'result_data': memoryview(body)
+         }
+      return get_codec(properties.content_type).decode(body)
+
+   def execute_request(self, body):
+      """
+Execute a decoded request (a single service API call or a batch of calls).
+
+**Arguments:**
+
+* ``body``
+
+  / *Condition*: required / *Type*: dict /
+
+  The request as a dictionary.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The requested API, the ResultType and the result data.
       """
       response = "Non-supported request"
       result_type = ResultType.FAIL
       request_api = ""
       try:
-         if isinstance(body, bytes):
-            body = json.loads(body.decode('utf-8'))
-
          request_api = body['method']
-         if body['method'] in self._api_dict:
-            if not body['args']:
-               response = self._api_dict[body['method']]()
-            elif isinstance(body['args'], str):
-               response = self._api_dict[body['method']](body['args'])
-            else:
-               response = self._api_dict[body['method']](*body['args'])
+         if request_api == self._BATCH_METHOD:
+            response = self.execute_batch(body)
             result_type = ResultType.PASS
+         else:
+            entry = self.get_api_entry(request_api)
+            if entry is not None:
+               args, kwargs = entry.bind(body.get('args'))
+               response = self.call_api(entry, args, kwargs)
+               result_type = ResultType.PASS
       except Exception as ex:
          result_type = ResultType.EXCEPT
          response = str(ex)
+      return request_api, result_type, response
 
-      if response == "Non-supported request" and self.is_specific_request(request_api):
-         self.on_specific_request(ch, method, props, body)
-      else:
-         if isinstance(response, bytes):
-            # Convert bytes data to base64 encoded string
-            response = base64.b64encode(response).decode('utf-8')
-
-         resp = ResponseMessage(request_api, result_type, response)
-         # print(props.reply_to)
-         ch.basic_publish(exchange='',
-                        routing_key=props.reply_to,
-                        properties=pika.BasicProperties(correlation_id=props.correlation_id),
-                        body=resp.get_json())
-         ch.basic_ack(delivery_tag=method.delivery_tag)
+   def call_api(self, entry, args, kwargs):
+      """
+Call a service API method, using and maintaining the response cache.
+
+**Arguments:**
+
+* ``entry``
+
+  / *Condition*: required / *Type*: ServiceApi /
+
+  The dispatch table entry of the method.
+
+* ``args``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The positional arguments of the call.
+
+* ``kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  The keyword arguments of the call.
+
+**Returns:**
+
+  / *Type*: object /
+
+  The result of the service API method.
+      """
+      if entry.cache is not None:
+         hit, token = self._response_cache.get(entry, args, kwargs)
+         if hit:
+            return token
+      try:
+         with self._acquire(None if entry.thread_safe else self._serial_lock):
+            response = entry.function(self, *args, **kwargs)
+      finally:
+         if entry.invalidates:
+            self._response_cache.invalidate(entry.invalidates)
+      if entry.cache is not None:
+         self._response_cache.put(entry, token, response)
+      return response
+
+   def invalidate_cache(self, *tags):
+      """
+Invalidate cached responses, e.g. when the state of the service changed outside of its APIs.
+
+**Arguments:**
+
+* ``*tags``
+
+  / *Condition*: required / *Type*: str /
+
+  Names or tags of the cached service API methods.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._response_cache.invalidate(tags)
+
+   def execute_batch(self, body):
+      """
+Execute a batch request: ``{"method": "batch", "calls": [{"method": ..., "args": ...}, ...]}``.
+
+Calls are executed in order. When the batch is marked ``"independent": true`` the calls
+are executed in parallel (serialized APIs still hold the service lock). When the batch
+is marked ``"stop_on_error": true`` the calls following a failed call are skipped.
+Side effects emitted by the calls through ``emit_side_effect`` run once after the batch.
+
+**Arguments:**
+
+* ``body``
+
+  / *Condition*: required / *Type*: dict /
+
+  The batch request as a dictionary.
+
+**Returns:**
+
+  / *Type*: list /
+
+  The response of each call (``request``, ``result`` and ``result_data``), in call order.
+      """
+      calls = body.get('calls') or []
+      if not isinstance(calls, list):
+         raise Exception("The 'calls' of a batch request must be a list")
+
+      side_effects = []
+      token = _BATCH_SIDE_EFFECTS.set(side_effects)
+      try:
+         if body.get('independent') and len(calls) > 1:
+            if self._batch_executor is None:
+               self._batch_executor = ThreadPoolExecutor(max_workers=self._BATCH_MAX_PARALLEL,
+                                                         thread_name_prefix=f"{self.name}_batch")
+            futures = [self._batch_executor.submit(contextvars.copy_context().run, self._execute_batch_call, call)
+                       for call in calls]
+            results = [future.result() for future in futures]
+         else:
+            results = []
+            for call in calls:
+               if body.get('stop_on_error') and results and results[-1][1] != ResultType.PASS:
+                  results.append((self._get_call_method(call), ResultType.FAIL, "Skipped due to a previous failure"))
+               else:
+                  results.append(self._execute_batch_call(call))
+      finally:
+         _BATCH_SIDE_EFFECTS.reset(token)
+
+      self.run_side_effects(side_effects)
+      return [{'request': request_api, 'result': result_type, 'result_data': response}
+              for request_api, result_type, response in results]
+
+   def _execute_batch_call(self, call):
+      """
+Execute one call of a batch request.
+
+**Arguments:**
+
+* ``call``
+
+  / *Condition*: required / *Type*: dict /
+
+  The call as a dictionary.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The requested API, the ResultType and the result data.
+      """
+      request_api = self._get_call_method(call)
+      if request_api == self._BATCH_METHOD:
+         return request_api, ResultType.FAIL, "Nested batch requests are not supported"
+      if not isinstance(call, dict):
+         return request_api, ResultType.EXCEPT, "Each call of a batch request must be a dictionary"
+      return self.execute_request(call)
+
+   @staticmethod
+   def _get_call_method(call):
+      return call.get('method', "") if isinstance(call, dict) else ""
+
+   def emit_side_effect(self, func):
+      """
+Run a side effect of a service API, such as notifying updates.
+
+Within a batch request the side effect is deferred and run once at the end of the batch,
+however many calls emitted it.
+
+**Arguments:**
+
+* ``func``
+
+  / *Condition*: required / *Type*: callable /
+
+  The side effect to be run, called without arguments.
+
+**Returns:**
+
+(*no returns*)
+      """
+      pending = _BATCH_SIDE_EFFECTS.get()
+      if pending is None:
+         func()
+      elif func not in pending:
+         pending.append(func)
+
+   def run_side_effects(self, side_effects):
+      """
+Run the side effects deferred during a batch request.
+
+**Arguments:**
+
+* ``side_effects``
+
+  / *Condition*: required / *Type*: list /
+
+  The side effects to be run.
+
+**Returns:**
+
+(*no returns*)
+      """
+      for func in side_effects:
+         try:
+            with self._serial_lock:
+               func()
+         except Exception as ex:
+            print(f" [!] Unable to run side effect '{getattr(func, '__name__', func)}'. Reason: {ex}")
+
+   @staticmethod
+   def decode_request(body, codec=JSON_CODEC):
+      """
+Decode the body of an incoming request.
+
+**Arguments:**
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The body of the message as bytes (already decoded bodies are returned as is).
+
+* ``codec``
+
+  / *Condition*: optional / *Type*: Codec / *Default*: JSON_CODEC /
+
+  The codec matching the content type of the request.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The request as a dictionary.
+      """
+      if isinstance(body, BINARY_TYPES):
+         body = codec.decode(body)
+      return body
+
+   @staticmethod
+   def encode_response(request_api, result_type, response, codec=JSON_CODEC):
+      """
+Encode the response to a request.
+
+**Arguments:**
+
+* ``request_api``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested API.
+
+* ``result_type``
+
+  / *Condition*: required / *Type*: ResultType /
+
+  The result of processing the request.
+
+* ``response``
+
+  / *Condition*: required / *Type*: object /
+
+  The result data returned.
+
+* ``codec``
+
+  / *Condition*: optional / *Type*: Codec / *Default*: JSON_CODEC /
+
+  The codec used by the caller.
+
+**Returns:**
+
+  / *Type*: bytes /
+
+  The encoded response message.
+      """
+      return ResponseMessage(request_api, result_type, response).encode(codec)
+
+   @staticmethod
+   def _acquire(lock):
+      """
+Get a context manager holding the given lock, or doing nothing if there is no lock.
+
+**Arguments:**
+
+* ``lock``
+
+  / *Condition*: required / *Type*: threading.RLock /
+
+  The lock to be held, or None.
+
+**Returns:**
+
+  / *Type*: object /
+
+  A context manager.
+      """
+      return lock if lock is not None else _NO_LOCK
+
+ServiceBase._DISPATCH_TABLE = ServiceBase.build_dispatch_table()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,435 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: ServiceChannel.py
+#
+# Description:
+#   Provide the channel proxies publishing and acknowledging on the connection thread.
+#
+# *******************************************************************************
+import pika
+import functools
+import collections
+
+
+class ThreadSafeChannel(object):
+   """
+Channel proxy used by worker threads to publish and acknowledge on the connection thread.
+   """
+   def __init__(self, connection, channel):
+      """
+Constructor for the ThreadSafeChannel class.
+
+**Arguments:**
+
+* ``connection``
+
+  / *Condition*: required / *Type*: pika.BlockingConnection /
+
+  The connection which owns the channel.
+
+* ``channel``
+
+  / *Condition*: required / *Type*: pika.adapters.blocking_connection.BlockingChannel /
+
+  The channel the request was received on.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.connection = connection
+      self.channel = channel
+
+   def basic_publish(self, **kwargs):
+      """
+Schedule a publish on the connection thread.
+
+**Arguments:**
+
+* ``**kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  Keyword arguments passed to ``basic_publish`` of the underlying channel.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.connection.add_callback_threadsafe(functools.partial(self.channel.basic_publish, **kwargs))
+
+   def basic_ack(self, **kwargs):
+      """
+Schedule an acknowledgement on the connection thread.
+
+**Arguments:**
+
+* ``**kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  Keyword arguments passed to ``basic_ack`` of the underlying channel.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.connection.add_callback_threadsafe(functools.partial(self.channel.basic_ack, **kwargs))
+
+
+class BatchedChannel(object):
+   """
+Channel proxy which publishes in confirm mode and batches the acknowledgements of deliveries.
+
+In confirm mode, messages are published without waiting for the broker. Their delivery tags
+are kept in a queue until the broker confirms them, one by one or several at once
+(``Basic.Ack`` or ``Basic.Nack`` with ``multiple=True``), and the messages it rejects are
+published again. The acknowledgement of a delivery is held until the messages published before
+it (its response) are confirmed, so a request is only acknowledged once its response is safe
+with the broker. A request whose acknowledgement is lost with the channel is delivered again.
+
+With an acknowledgement batch, the deliveries which are done are acknowledged together with
+``multiple=True`` once the batch is full or the connection loop is idle (see ``flush``).
+Only the contiguous range of done deliveries is acknowledged, a delivery which is still
+running holds back the acknowledgement of the later ones. It relies on consecutive delivery
+tags, i.e. a single consumer on the channel.
+
+Other channel methods are forwarded to the underlying channel. The proxy must only be used
+by the thread owning the connection, worker threads go through ``ThreadSafeChannel``.
+   """
+   _MAX_PUBLISH_ATTEMPTS = 3
+
+   def __init__(self, connection, channel, confirm=False, ack_batch=0):
+      """
+Constructor for the BatchedChannel class.
+
+**Arguments:**
+
+* ``connection``
+
+  / *Condition*: required / *Type*: pika.BlockingConnection /
+
+  The connection which owns the channel.
+
+* ``channel``
+
+  / *Condition*: required / *Type*: pika.adapters.blocking_connection.BlockingChannel /
+
+  The underlying channel.
+
+* ``confirm``
+
+  / *Condition*: optional / *Type*: bool / *Default*: False /
+
+  Whether the published messages are confirmed by the broker.
+
+* ``ack_batch``
+
+  / *Condition*: optional / *Type*: int / *Default*: 0 /
+
+  The number of done deliveries acknowledged at once (0 acknowledges each delivery).
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.connection = connection
+      self.channel = channel
+      self.confirm = confirm
+      self.ack_batch = ack_batch
+      self.stats = {'published': 0, 'confirmed': 0, 'republished': 0, 'dropped': 0, 'acks': 0, 'acked': 0}
+      self._settled = {}
+      self._done = 0
+      self._acked_upto = 0
+      self._publish_seq = 0
+      self._unconfirmed = collections.OrderedDict()
+      self._held = collections.deque()
+      if confirm:
+         # BlockingChannel.confirm_delivery waits for the confirm of each message it publishes,
+         # the underlying channel reports the confirms to a callback instead
+         channel._impl.confirm_delivery(ack_nack_callback=self._on_confirm)
+
+   def __getattr__(self, name):
+      return getattr(self.channel, name)
+
+   @property
+   def pending(self):
+      """
+The number of done deliveries whose acknowledgement is not sent yet.
+      """
+      return self._done + len(self._held)
+
+   def basic_consume(self, queue, on_message_callback, **kwargs):
+      """
+Start consuming a queue, the callback receives the proxy as channel.
+
+**Arguments:**
+
+* ``queue``
+
+  / *Condition*: required / *Type*: str /
+
+  The queue to consume.
+
+* ``on_message_callback``
+
+  / *Condition*: required / *Type*: callable /
+
+  The callback called with ``(channel, method, properties, body)`` for each delivery.
+
+* ``**kwargs``
+
+  / *Condition*: optional / *Type*: dict /
+
+  Other arguments of ``basic_consume``.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The consumer tag.
+      """
+      def on_message(_channel, method, props, body):
+         on_message_callback(self, method, props, body)
+
+      return self.channel.basic_consume(queue=queue, on_message_callback=on_message, **kwargs)
+
+   def basic_publish(self, **kwargs):
+      """
+Publish a message, in confirm mode its delivery tag is kept until the broker confirms it.
+
+A message rejected by the broker is published again, up to ``_MAX_PUBLISH_ATTEMPTS`` times.
+
+**Arguments:**
+
+* ``**kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  Arguments of ``basic_publish``.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._publish(kwargs, 1, None)
+
+   def basic_ack(self, delivery_tag, multiple=False):
+      """
+Acknowledge a delivery, or mark it done with an acknowledgement batch.
+
+In confirm mode, the acknowledgement waits for the confirms of the messages published before.
+
+**Arguments:**
+
+* ``delivery_tag``
+
+  / *Condition*: required / *Type*: int /
+
+  The delivery tag.
+
+* ``multiple``
+
+  / *Condition*: optional / *Type*: bool / *Default*: False /
+
+  Not supported, deliveries are acknowledged one by one (or batched by the proxy).
+
+**Returns:**
+
+(*no returns*)
+      """
+      if multiple:
+         raise Exception("Acknowledging multiple deliveries is done by the channel batching")
+      if self._unconfirmed:
+         self._held.append((self._publish_seq, delivery_tag))
+         return
+      self._settle(delivery_tag, True)
+
+   def basic_nack(self, delivery_tag, requeue=True):
+      """
+Reject a delivery right away.
+
+**Arguments:**
+
+* ``delivery_tag``
+
+  / *Condition*: required / *Type*: int /
+
+  The delivery tag.
+
+* ``requeue``
+
+  / *Condition*: optional / *Type*: bool / *Default*: True /
+
+  Whether the broker delivers the message again.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue)
+      if self.ack_batch > 0:
+         self._settle(delivery_tag, False)
+
+   def flush(self):
+      """
+With an acknowledgement batch, acknowledge the contiguous range of done deliveries.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if not self.channel.is_open:
+         return
+      self._ack_done()
+
+   def get_stats(self):
+      """
+Get the publish and acknowledgement counters of the channel.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The counters, the number of pending acknowledgements and of messages not confirmed yet.
+      """
+      stats = dict(self.stats)
+      stats['pending'] = self.pending
+      stats['unconfirmed'] = len(self._unconfirmed)
+      return stats
+
+   def _publish(self, kwargs, attempt, first_seq):
+      """
+Publish a message, keeping its delivery tag in confirm mode.
+
+**Arguments:**
+
+* ``kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  Arguments of ``basic_publish``.
+
+* ``attempt``
+
+  / *Condition*: required / *Type*: int /
+
+  The number of times the message is published.
+
+* ``first_seq``
+
+  / *Condition*: required / *Type*: int /
+
+  The delivery tag of the first publish of the message, None for the first publish.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if attempt > 1:
+         self.stats['republished'] += 1
+      self.stats['published'] += 1
+      self.channel.basic_publish(**kwargs)
+      if self.confirm:
+         self._publish_seq += 1
+         self._unconfirmed[self._publish_seq] = (kwargs, attempt, first_seq or self._publish_seq)
+
+   def _on_confirm(self, method_frame):
+      """
+Handle a ``Basic.Ack`` or ``Basic.Nack`` of the broker, called by the I/O loop of the connection.
+
+The confirm is handled once the I/O loop dispatches the callbacks of the connection, where the
+channel can publish and acknowledge.
+
+**Arguments:**
+
+* ``method_frame``
+
+  / *Condition*: required / *Type*: pika.frame.Method /
+
+  The frame of the confirm.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.connection.add_callback_threadsafe(functools.partial(self._confirm, method_frame.method))
+
+   def _confirm(self, method):
+      """
+Settle the messages confirmed or rejected by the broker, then send the acknowledgements they held.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: pika.spec.Basic.Ack or pika.spec.Basic.Nack /
+
+  The confirm.
+
+**Returns:**
+
+(*no returns*)
+      """
+      if method.multiple:
+         seqs = []
+         for seq in self._unconfirmed:
+            if seq > method.delivery_tag:
+               break
+            seqs.append(seq)
+      else:
+         seqs = [method.delivery_tag] if method.delivery_tag in self._unconfirmed else []
+      rejected = isinstance(method, pika.spec.Basic.Nack)
+      for seq in seqs:
+         kwargs, attempt, first_seq = self._unconfirmed.pop(seq)
+         if not rejected:
+            self.stats['confirmed'] += 1
+         elif attempt < self._MAX_PUBLISH_ATTEMPTS:
+            self._publish(kwargs, attempt + 1, first_seq)
+         else:
+            self.stats['dropped'] += 1
+            print(f" [!] Message to '{kwargs.get('routing_key')}' rejected {attempt} times by the broker, dropped")
+      # A held acknowledgement waits for the messages first published up to its delivery tag
+      oldest = min((first_seq for _, _, first_seq in self._unconfirmed.values()), default=None)
+      while self._held and (oldest is None or self._held[0][0] < oldest):
+         _, delivery_tag = self._held.popleft()
+         self._settle(delivery_tag, True)
+
+   def _settle(self, delivery_tag, acked):
+      if self.ack_batch <= 0:
+         self.channel.basic_ack(delivery_tag=delivery_tag)
+         self.stats['acks'] += 1
+         self.stats['acked'] += 1
+         return
+      self._settled[delivery_tag] = acked
+      if acked:
+         self._done += 1
+         if self._done >= self.ack_batch:
+            self._ack_done()
+
+   def _ack_done(self):
+      last_acked = None
+      acked = 0
+      while self._acked_upto + 1 in self._settled:
+         self._acked_upto += 1
+         if self._settled.pop(self._acked_upto):
+            last_acked = self._acked_upto
+            acked += 1
+      if last_acked is not None:
+         self.channel.basic_ack(delivery_tag=last_acked, multiple=True)
+         self._done -= acked
+         self.stats['acks'] += 1
+         self.stats['acked'] += acked
@@ -27,10 +27,12 @@
 # - Initialize
 #
 # *******************************************************************************
-from ServiceBase import ServiceBase, ResultType, ResponseMessage
+# The service base modules are copied from python-microservice-base (see sync_service_base.py)
+from ServiceBase import ServiceBase, ResultType, ResponseMessage, cached, invalidates
 from ClewareAccessHelper import ClewareAccessHelper
 import time
 import pika
+from contextlib import contextmanager
 import json
 import sys
 from signal import *
@@ -71,9 +73,34 @@ Constructor for the ServiceCleware class.
 
 (*no returns*)
       """
+      # Whether Cleware devices were reachable at the last access, reported by check_health
+      self._hardware_reachable = False
       super(ServiceCleware, self).__init__(cmd_args)
-      self.cleware_helper = ClewareAccessHelper()
+      # With --parallel_init, the devices are enumerated while the broker is connected
+      with self.startup_phase('hardware'):
+         self.cleware_helper = ClewareAccessHelper()
+         try:
+            self._hardware_reachable = self.cleware_helper.open_cleware() > 0
+         except Exception as ex:
+            print(f" [!] Unable to reach Cleware devices. Reason: {ex}")
+
+   @contextmanager
+   def track_hardware(self):
+      """
+Record whether an access to the Cleware devices failed, as the last known hardware state.
+
+**Returns:**
 
+(*no returns*)
+      """
+      try:
+         yield
+      except Exception:
+         self._hardware_reachable = False
+         raise
+
+   # Switches may also be changed by other tools, keep the cached state short-lived
+   @cached(ttl=1.0, maxsize=1)
    def svc_api_get_all_devices_state(self):
       """
 Retrieve the state of all Cleware devices.
@@ -84,8 +111,12 @@ Retrieve the state of all Cleware devices.
 
   A dictionary containing the states of all Cleware devices.
       """
-      return self.cleware_helper.get_all_devices_state()
+      with self.track_hardware():
+         states = self.cleware_helper.get_all_devices_state()
+      self._hardware_reachable = len(states) > 0
+      return states
 
+   @invalidates('svc_api_get_all_devices_state')
    def svc_api_set_switch(self, device_no, switch_id, state):
       """
 Set state for a Cleware device's switch.
@@ -94,15 +125,15 @@ Set state for a Cleware device's switch.
 
 * ``device_no``
 
-  / *Condition*: required / *Type*: str /
+  / *Condition*: required / *Type*: int /
 
   Cleware device's number.
 
 * ``switch_id``
 
-  / *Condition*: required / *Type*: str /
+  / *Condition*: required / *Type*: int /
 
-  Switch number to turn on or off.
+  Switch number to turn on or off (decimal or hexadecimal, e.g. "0x10").
 
 * ``state``
 
@@ -116,10 +147,26 @@ Set state for a Cleware device's switch.
 
   Return ret code, 1 for succeed, 0 for failure.
       """
-      ret = self.cleware_helper.set_switch(device_no, switch_id, state)
-      self.notify_updates()
+      with self.track_hardware():
+         ret = self.cleware_helper.set_switch(device_no, switch_id, state)
+      self.emit_side_effect(self.notify_updates)
       return ret
 
+   def check_health(self):
+      """
+Check that Cleware devices are reachable.
+
+The devices are not accessed, the state of the last access is reported: probing them here
+would wait for the lock of a running switch command and slow it down.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  ``hardware`` is True if at least one Cleware device was found at the last access.
+      """
+      return {'hardware': self._hardware_reachable}
+
    def notify_updates(self):
       """
 Notify updates to the realtime update channel for Cleware devices.
@@ -128,20 +175,16 @@ Notify updates to the realtime update channel for Cleware devices.
 
 (*no returns*)
       """
-      connection = pika.BlockingConnection(pika.ConnectionParameters(**self._kw_args))
-      channel = connection.channel()
-
-      # Declare an exchange (use 'topic' type for flexible routing)
+      # Fanout exchange of the realtime updates, declared with the first update only
       exchange_name = 'updates_sw_state'
-      channel.exchange_declare(exchange=exchange_name, exchange_type='fanout')
 
       # Publish updates to the 'updates' topic
       time.sleep(0.05)
       update_info = json.dumps(self.cleware_helper.get_all_devices_state())
-      channel.basic_publish(exchange=exchange_name, routing_key='', body=update_info)
+      self.publish_control(exchange_name, '', update_info,
+                           declarations=[('exchange_declare', {'exchange': exchange_name, 'exchange_type': 'fanout'})])
 
       print("Sent to RabbitMQ update info :%s" % update_info)
-      connection.close()
 
 
 def signal_handler(sig, frame, obj):
@@ -172,13 +215,12 @@ Handle signals from the operating system.
 
 (*no returns*)
    """
-   # This function will be called when a SIGINT signal (Ctrl+C) is received
-   print("Ctrl+C pressed - Cleaning up...")
-   # Perform any necessary cleanup here
-   # For example, call the cleanup method of the object
-   del obj
-   # Exit the program
-   exit(0)
+   # A first signal (e.g. Ctrl+C) stops the service gracefully, a second one exits right away
+   if obj.stop_requested:
+      print("Signal received again - Exiting...")
+      exit(1)
+   print("Signal received - Shutting down...")
+   obj.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,516 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: ServiceClient.py
+#
+# Description:
+#   Provide the clients of services generated from the methods_info they register.
+#
+# *******************************************************************************
+from ServiceCodec import get_codec
+from ServiceApi import ServiceApi
+import re
+import keyword
+import inspect
+
+
+class ServiceClient(object):
+   """
+Base class of the clients generated from the ``methods_info`` of a service (see ``generate_client``).
+
+A client exposes each service API of the service as a method taking its documented arguments.
+The arguments are checked and converted as the service does (see ``ServiceApi.get_coercer``)
+before anything is sent, and the request body is encoded straight from them, the method name
+being encoded once per client. The requests are sent by the client shared by all threads of
+the given service (see ``ServiceBase.get_rpc_client``).
+   """
+   # Name and routing key of the service, set by the generated class
+   SERVICE_NAME = None
+   ROUTING_KEY = None
+   # Per service API method: whether it is idempotent and the (name, type, required) of its arguments
+   METHODS = {}
+
+   def __init__(self, service, timeout=None, content_type=None):
+      """
+Constructor for the ServiceClient class.
+
+**Arguments:**
+
+* ``service``
+
+  / *Condition*: required / *Type*: ServiceBase /
+
+  The service sending the requests.
+
+* ``timeout``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  Seconds each call waits for its response, ``--request_timeout`` of the service if not given.
+
+* ``content_type``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The content type selecting the wire codec of the requests (JSON if not given).
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._service = service
+      self._timeout = timeout
+      self._codec = get_codec(content_type)
+      self._methods = {}
+      for method, info in self.METHODS.items():
+         arguments = [(name, ServiceApi.get_coercer(arg_type), required) for name, arg_type, required in info['arguments']]
+         self._methods[method] = (arguments, self._codec.request_encoder(method), info['idempotent'])
+
+   def call(self, method, *args, **kwargs):
+      """
+Call a service API method and wait for its response.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service API method.
+
+* ``args``
+
+  / *Condition*: optional / *Type*: tuple /
+
+  The positional arguments of the method.
+
+* ``kwargs``
+
+  / *Condition*: optional / *Type*: dict /
+
+  The keyword arguments of the method, omitted (or None) optional arguments take their default.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The response of the service, see ``ServiceBase.request_service``.
+      """
+      return self.call_async(method, *args, **kwargs).result()
+
+   def call_async(self, method, *args, **kwargs):
+      """
+Call a service API method without waiting for its response.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service API method.
+
+* ``args``
+
+  / *Condition*: optional / *Type*: tuple /
+
+  The positional arguments of the method.
+
+* ``kwargs``
+
+  / *Condition*: optional / *Type*: dict /
+
+  The keyword arguments of the method, omitted (or None) optional arguments take their default.
+
+**Returns:**
+
+  / *Type*: concurrent.futures.Future /
+
+  The future resolved with the response of the service.
+      """
+      body, idempotent = self.encode_request(method, args, kwargs)
+      return self._service.request_service_encoded(method, body, self._codec, self._service._SERVICE_REQUEST_EXCHANGE,
+                                                   self.ROUTING_KEY, timeout=self._timeout, idempotent=idempotent)
+
+   def encode_request(self, method, args, kwargs):
+      """
+Check and convert the arguments of a call, then encode its request.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service API method.
+
+* ``args``
+
+  / *Condition*: required / *Type*: tuple /
+
+  The positional arguments of the call.
+
+* ``kwargs``
+
+  / *Condition*: required / *Type*: dict /
+
+  The keyword arguments of the call.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The request body and whether the method is idempotent.
+      """
+      try:
+         arguments, encoder, idempotent = self._methods[method]
+      except KeyError:
+         raise Exception(f"Service {self.SERVICE_NAME} has no API '{method}'")
+      if len(args) > len(arguments):
+         raise Exception(f"API '{method}' takes at most {len(arguments)} arguments but {len(args)} were given")
+      kwargs = dict(kwargs)
+      values = {}
+      for index, (name, coercer, required) in enumerate(arguments):
+         value = args[index] if index < len(args) else kwargs.pop(name, None)
+         if value is None:
+            if required:
+               raise Exception(f"API '{method}' misses the required argument '{name}'")
+            continue
+         if coercer is not None:
+            try:
+               value = coercer(value)
+            except (TypeError, ValueError) as ex:
+               raise Exception(f"Invalid arguments for API '{method}': {ex}")
+         values[name] = value
+      if kwargs:
+         raise Exception(f"API '{method}' got unexpected arguments: {', '.join(kwargs)}")
+      if all(argument[0] in values for argument in arguments[:len(values)]):
+         return encoder(list(values.values())), idempotent
+      # An optional argument is omitted before given ones, they are passed by name
+      return encoder(values), idempotent
+
+
+# Types of the documented arguments which are annotated in the generated clients
+_CLIENT_ANNOTATIONS = {'int': int, 'float': float, 'bool': bool, 'str': str, 'dict': dict, 'list': list}
+
+
+def is_identifier(value):
+   """
+Check whether a value may be used as a Python name in a generated client.
+
+**Arguments:**
+
+* ``value``
+
+  / *Condition*: required / *Type*: str /
+
+  The name.
+
+**Returns:**
+
+  / *Type*: bool /
+
+  True if the value is an identifier which is not a keyword.
+   """
+   return isinstance(value, str) and value.isidentifier() and not keyword.iskeyword(value)
+
+
+def get_client_class_name(service_info, class_name=None):
+   """
+Get the name of the client class of a service.
+
+**Arguments:**
+
+* ``service_info``
+
+  / *Condition*: required / *Type*: dict /
+
+  The information the service registered (its ``_SERVICE_INFO``).
+
+* ``class_name``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The name of the class, the service name without its 'Service' prefix or suffix followed
+  by 'Client' if not given (e.g. 'ClewareClient' for 'ServiceCleware').
+
+**Returns:**
+
+  / *Type*: str /
+
+  The name of the class.
+   """
+   if class_name is None:
+      service_name = str(service_info['name'])
+      class_name = re.sub(r'\W', '_', re.sub(r'^Service|Service$', '', service_name) or service_name) + 'Client'
+      if class_name[0].isdigit():
+         class_name = '_' + class_name
+   if not is_identifier(class_name):
+      raise Exception(f"Invalid client class name '{class_name}'")
+   return class_name
+
+
+def get_client_methods(service_info):
+   """
+Get the service API methods of a service which are exported to its client.
+
+Each service API method ``svc_api_<name>`` becomes a method ``<name>`` of the client. Methods
+whose name or argument names are no Python identifiers, or clash with ``ServiceClient``,
+are not exported.
+
+**Arguments:**
+
+* ``service_info``
+
+  / *Condition*: required / *Type*: dict /
+
+  The information the service registered (its ``_SERVICE_INFO``).
+
+**Returns:**
+
+  / *Type*: dict /
+
+  Per service API method: the name of the client method, whether it is idempotent, the
+  (name, type, required) of its arguments and their documented information.
+   """
+   methods = {}
+   for method_name, info in sorted((service_info.get('methods_info') or {}).items()):
+      name = method_name[len('svc_api_'):] if method_name.startswith('svc_api_') else method_name
+      documented = info.get('arguments') or []
+      names = [argument.get('name') for argument in documented]
+      if not is_identifier(name) or hasattr(ServiceClient, name) or not all(is_identifier(value) for value in names) \
+            or len(set(names)) != len(names) or 'self' in names:
+         print(f" [!] API '{method_name}' of service {service_info['name']} is not exported to the client.")
+         continue
+      methods[method_name] = {
+         'name': name,
+         'idempotent': bool(info.get('idempotent', False)),
+         'arguments': [(argument['name'], argument.get('type'), argument.get('condition') != 'optional')
+                       for argument in documented],
+         'documented': documented,
+         'return_type': info.get('return_type') or ''
+      }
+   return methods
+
+
+def get_client_method_doc(service_name, method_name, method, text):
+   """
+Get the docstring of a client method.
+
+**Arguments:**
+
+* ``service_name``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service.
+
+* ``method_name``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service API method.
+
+* ``method``
+
+  / *Condition*: required / *Type*: dict /
+
+  The client method, see ``get_client_methods``.
+
+* ``text``
+
+  / *Condition*: required / *Type*: callable /
+
+  The function converting the documentation values to docstring text.
+
+**Returns:**
+
+  / *Type*: list /
+
+  The lines of the docstring.
+   """
+   doc = [f"Call ``{method_name}`` of the {text(service_name)} service."]
+   if method['arguments']:
+      doc += ['', '**Arguments:**']
+   for (argument_name, arg_type, required), documented in zip(method['arguments'], method['documented']):
+      condition = 'required' if required else 'optional'
+      default = '' if required else f" *Default*: {text(documented.get('default'))} /"
+      doc += ['', f'* ``{argument_name}``', '',
+              f'  / *Condition*: {condition} / *Type*: {text(arg_type)} /{default}', '',
+              f"  {text(documented.get('description') or '')}"]
+   return_type, _, return_description = method['return_type'].partition('/')
+   doc += ['', '**Returns:**', '', '  / *Type*: dict /', '',
+           '  The response of the service'
+           + (f', its result data ({text(return_type)}): {text(return_description)}' if return_type.strip() else '.')]
+   return doc
+
+
+def generate_client_source(service_info, class_name=None):
+   """
+Generate the source code of the client class of a service from its ``methods_info``.
+
+Each service API method ``svc_api_<name>`` becomes a method ``<name>`` of the class, with the
+documented arguments of the API (optional ones default to None, the default of the service).
+Only names which are Python identifiers are emitted (see ``get_client_methods``), the other
+registered values are emitted as literals or escaped docstring text.
+
+**Arguments:**
+
+* ``service_info``
+
+  / *Condition*: required / *Type*: dict /
+
+  The information the service registered (its ``_SERVICE_INFO``).
+
+* ``class_name``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The name of the class, see ``get_client_class_name``.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The source code of the class, deriving from ``ServiceClient``.
+   """
+   service_name = service_info['name']
+   class_name = get_client_class_name(service_info, class_name)
+
+   def text(value):
+      # Keep documentation text from ending the generated docstrings
+      return ' '.join(str(value).split()).replace('\\', '\\\\').replace('"""', '\\"\\"\\"')
+
+   methods = get_client_methods(service_info)
+   lines = []
+   for method_name, method in methods.items():
+      params = ['self']
+      for argument_name, arg_type, required in method['arguments']:
+         param = argument_name
+         if arg_type in _CLIENT_ANNOTATIONS:
+            param += f': {arg_type}'
+         params.append(param if required else param + (' = None' if ':' in param else '=None'))
+      lines += ['', f"   def {method['name']}({', '.join(params)}) -> dict:", '      """']
+      lines += get_client_method_doc(service_name, method_name, method, text)
+      lines += ['      """',
+                f"      return self.call({method_name!r}{''.join(', ' + argument[0] for argument in method['arguments'])})"]
+
+   header = [f'class {class_name}(ServiceClient):', '   """',
+             f"Client of the {text(service_name)} service (version {text(service_info.get('version', ''))}), "
+             f"generated from its methods_info.", '   """',
+             f'   SERVICE_NAME = {service_name!r}',
+             f"   ROUTING_KEY = {service_info.get('routing_key')!r}",
+             '   METHODS = {']
+   header += [f"      {method_name!r}: {{'idempotent': {method['idempotent']!r}, 'arguments': {method['arguments']!r}}},"
+              for method_name, method in methods.items()]
+   header.append('   }')
+   return '\n'.join(header + lines) + '\n'
+
+
+def make_client_method(method_name, method, doc):
+   """
+Make a method of a client class, calling a service API method.
+
+**Arguments:**
+
+* ``method_name``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service API method.
+
+* ``method``
+
+  / *Condition*: required / *Type*: dict /
+
+  The client method, see ``get_client_methods``.
+
+* ``doc``
+
+  / *Condition*: required / *Type*: str /
+
+  The docstring of the method.
+
+**Returns:**
+
+  / *Type*: function /
+
+  The method, its arguments are checked by ``ServiceClient.encode_request``.
+   """
+   def call_api(self, *args, **kwargs):
+      return self.call(method_name, *args, **kwargs)
+
+   parameters = [inspect.Parameter('self', inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+   for argument_name, arg_type, required in method['arguments']:
+      parameters.append(inspect.Parameter(argument_name, inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                                          default=inspect.Parameter.empty if required else None,
+                                          annotation=_CLIENT_ANNOTATIONS.get(arg_type, inspect.Parameter.empty)))
+   call_api.__name__ = method['name']
+   call_api.__doc__ = doc
+   call_api.__signature__ = inspect.Signature(parameters, return_annotation=dict)
+   call_api.__annotations__ = {parameter.name: parameter.annotation for parameter in parameters
+                               if parameter.annotation is not inspect.Parameter.empty}
+   call_api.__annotations__['return'] = dict
+   return call_api
+
+
+def generate_client(service_info, class_name=None):
+   """
+Generate the client class of a service from its ``methods_info``.
+
+The class is built at runtime with the same methods as the source emitted by
+``generate_client_source``, no generated code is executed.
+
+**Arguments:**
+
+* ``service_info``
+
+  / *Condition*: required / *Type*: dict /
+
+  The information the service registered (its ``_SERVICE_INFO``).
+
+* ``class_name``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The name of the class, see ``get_client_class_name``.
+
+**Returns:**
+
+  / *Type*: type /
+
+  The client class, deriving from ``ServiceClient``.
+   """
+   service_name = service_info['name']
+   class_name = get_client_class_name(service_info, class_name)
+
+   def text(value):
+      return ' '.join(str(value).split())
+
+   methods = get_client_methods(service_info)
+   namespace = {
+      '__doc__': f"Client of the {text(service_name)} service (version {text(service_info.get('version', ''))}), "
+                 f"generated from its methods_info.",
+      'SERVICE_NAME': service_name,
+      'ROUTING_KEY': service_info.get('routing_key'),
+      'METHODS': {method_name: {'idempotent': method['idempotent'], 'arguments': method['arguments']}
+                  for method_name, method in methods.items()}
+   }
+   for method_name, method in methods.items():
+      call_api = make_client_method(method_name, method,
+                                    '\n'.join(get_client_method_doc(service_name, method_name, method, text)))
+      call_api.__qualname__ = f"{class_name}.{method['name']}"
+      namespace[method['name']] = call_api
+   return type(class_name, (ServiceClient,), namespace)
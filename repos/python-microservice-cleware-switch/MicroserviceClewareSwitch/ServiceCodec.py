@@ -0,0 +1,198 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: ServiceCodec.py
+#
+# Description:
+#   Provide the wire codecs encoding and decoding the message bodies for their AMQP content type.
+#
+# *******************************************************************************
+import abc
+import json
+import base64
+
+try:
+   import msgpack
+except ImportError:
+   msgpack = None
+
+try:
+   import cbor2
+except ImportError:
+   cbor2 = None
+
+
+class Codec(abc.ABC):
+   """
+Wire codec encoding and decoding message bodies for an AMQP content type.
+
+Codecs implement ``encode`` and ``decode``, a codec missing one of them cannot be created.
+   """
+   content_type = None
+   # True if the codec can carry bytes without converting them to base64
+   binary = False
+
+   @abc.abstractmethod
+   def encode(self, data):
+      """
+Encode data to a message body.
+
+**Arguments:**
+
+* ``data``
+
+  / *Condition*: required / *Type*: object /
+
+  The data to be encoded.
+
+**Returns:**
+
+  / *Type*: bytes /
+
+  The encoded message body.
+      """
+
+   @abc.abstractmethod
+   def decode(self, body):
+      """
+Decode a message body.
+
+**Arguments:**
+
+* ``body``
+
+  / *Condition*: required / *Type*: bytes /
+
+  The message body to be decoded.
+
+**Returns:**
+
+  / *Type*: object /
+
+  The decoded data.
+      """
+
+   def request_encoder(self, method):
+      """
+Get the function encoding the requests of a service API method from their arguments.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the service API method.
+
+**Returns:**
+
+  / *Type*: callable /
+
+  The function encoding the arguments (a list or a dictionary) to the request body.
+      """
+      return lambda args: self.encode({'method': method, 'args': args})
+
+
+class JsonCodec(Codec):
+   """
+JSON codec, the default codec used when no (or an unknown) content type is given.
+
+Bytes are converted to base64 encoded strings.
+   """
+   content_type = 'application/json'
+
+   @staticmethod
+   def default(value):
+      if isinstance(value, BINARY_TYPES):
+         # Convert bytes data to base64 encoded string
+         return base64.b64encode(value).decode('utf-8')
+      raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+   def encode(self, data):
+      return json.dumps(data, default=self.default).encode('utf-8')
+
+   def request_encoder(self, method):
+      # The method part of the body is encoded once, only the arguments are encoded per request
+      prefix = f'{{"method": {json.dumps(method)}, "args": '.encode('utf-8')
+      return lambda args: prefix + json.dumps(args, default=self.default).encode('utf-8') + b'}'
+
+   def decode(self, body):
+      if isinstance(body, (bytes, bytearray)):
+         # json.loads detects the UTF encoding of bytes itself
+         return json.loads(body)
+      # Buffers (e.g. memoryview) are decoded to text in place, not copied to bytes first
+      return json.loads(str(body, 'utf-8'))
+
+
+class MsgpackCodec(Codec):
+   """
+MessagePack codec, available if the msgpack package is installed.
+   """
+   content_type = 'application/msgpack'
+   binary = True
+
+   def encode(self, data):
+      return msgpack.packb(data, use_bin_type=True)
+
+   def decode(self, body):
+      return msgpack.unpackb(body, raw=False)
+
+
+class CborCodec(Codec):
+   """
+CBOR codec, available if the cbor2 package is installed.
+   """
+   content_type = 'application/cbor'
+   binary = True
+
+   def encode(self, data):
+      return cbor2.dumps(data)
+
+   def decode(self, body):
+      return cbor2.loads(body)
+
+
+JSON_CODEC = JsonCodec()
+
+# Content type of responses carrying the raw bytes returned by a service API
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+BINARY_TYPES = (bytes, bytearray, memoryview)
+
+CODECS = {JSON_CODEC.content_type: JSON_CODEC}
+if msgpack is not None:
+   CODECS[MsgpackCodec.content_type] = CODECS['application/x-msgpack'] = MsgpackCodec()
+if cbor2 is not None:
+   CODECS[CborCodec.content_type] = CborCodec()
+
+
+def get_codec(content_type):
+   """
+Get the codec for an AMQP content type.
+
+**Arguments:**
+
+* ``content_type``
+
+  / *Condition*: required / *Type*: str /
+
+  The content type of the message, may be None.
+
+**Returns:**
+
+  / *Type*: Codec /
+
+  The codec registered for the content type, the JSON codec if there is none.
+   """
+   return CODECS.get(content_type, JSON_CODEC) if content_type else JSON_CODEC
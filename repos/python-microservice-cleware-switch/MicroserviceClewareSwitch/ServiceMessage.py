@@ -0,0 +1,136 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: ServiceMessage.py
+#
+# Description:
+#   Provide the result types and the response message of service requests.
+#
+# *******************************************************************************
+from ServiceCodec import JsonCodec, JSON_CODEC
+import json
+
+
+# Header carrying the absolute deadline (seconds since the epoch) of a request
+DEADLINE_HEADER = 'deadline'
+# Header carrying the time (seconds since the epoch) a request was sent
+SENT_HEADER = 'sent'
+
+
+class ResultType:
+   """
+Result Types.
+   """
+   PASS = "pass"
+   FAIL = "fail"
+   EXCEPT = "exception"
+   EXPIRED = "expired"
+
+   def __init__(self):
+      pass
+
+
+class ResponseMessage(object):
+   """
+Response message class
+   """
+   def __init__(self, request="", result=ResultType.PASS, result_data=""):
+      """
+Constructor for the ResponseMessage class.
+
+**Arguments:**
+
+* ``request``
+
+  / *Condition*: optional / *Type*: str / *Default*: "" /
+
+  The request string.
+
+* ``result``
+
+  / *Condition*: optional / *Type*: ResultType / *Default*: ResultType.PASS /
+
+  The result of processing the request.
+
+* ``result_data``
+
+  / *Condition*: optional / *Type*: str / *Default*: "" /
+
+  The result data returned.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.request = request
+      self.result = result
+      self.result_data = result_data
+
+   def get_json(self):
+      """
+Convert the response message to JSON format.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The response message in JSON format.
+      """
+      # Attributes are already defined in sorted order, no need to sort per message
+      return json.dumps(self.__dict__, default=JsonCodec.default)
+
+   def get_dict(self):
+      """
+Convert the response message to a dictionary.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The response message as a dictionary.
+      """
+      return dict(self.__dict__)
+
+   def encode(self, codec=JSON_CODEC):
+      """
+Encode the response message with a wire codec.
+
+**Arguments:**
+
+* ``codec``
+
+  / *Condition*: optional / *Type*: Codec / *Default*: JSON_CODEC /
+
+  The codec to be used.
+
+**Returns:**
+
+  / *Type*: bytes /
+
+  The encoded response message.
+      """
+      return codec.encode(self.__dict__)
+
+   def get_data(self):
+      """
+Retrieve the result data as a string.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The result data as a string.
+      """
+      return self.result_data
@@ -0,0 +1,215 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: ServiceMetrics.py
+#
+# Description:
+#   Provide the latency histograms and request counters of a service.
+#
+# *******************************************************************************
+import threading
+import bisect
+import time
+
+
+class LatencyHistogram(object):
+   """
+Histogram of latencies with fixed buckets, recording a sample is a bisection and an increment.
+
+``counts[i]`` is the number of samples less than or equal to ``BUCKETS[i]`` seconds (and greater
+than the previous bucket), the last count holds the samples above the last bucket.
+   """
+   BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+   __slots__ = ('counts', 'sum')
+
+   def __init__(self):
+      self.counts = [0] * (len(self.BUCKETS) + 1)
+      self.sum = 0.0
+
+   def observe(self, seconds):
+      """
+Record a latency.
+
+**Arguments:**
+
+* ``seconds``
+
+  / *Condition*: required / *Type*: float /
+
+  The latency in seconds.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+      self.sum += seconds
+
+   def get_dict(self):
+      """
+Get the bucket counts and the sum of the recorded latencies.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  ``counts`` per bucket of ``BUCKETS`` (plus the overflow bucket) and ``sum`` in seconds.
+      """
+      return {'counts': list(self.counts), 'sum': self.sum}
+
+   def quantile(self, q):
+      """
+Estimate a quantile of the recorded latencies, as the upper bound of the bucket it falls in.
+
+**Arguments:**
+
+* ``q``
+
+  / *Condition*: required / *Type*: float /
+
+  The quantile, e.g. 0.95.
+
+**Returns:**
+
+  / *Type*: float /
+
+  The latency in seconds, None if nothing is recorded or it exceeds the last bucket.
+      """
+      rank = q * sum(self.counts)
+      if rank <= 0:
+         return None
+      cumulative = 0
+      for bound, count in zip(self.BUCKETS, self.counts):
+         cumulative += count
+         if cumulative >= rank:
+            return bound
+      return None
+
+
+class RequestTimer(object):
+   """
+Measure the phases of a request: queue wait, decode, handler and publish.
+   """
+   __slots__ = ('phases', 'name', 'error', '_last')
+
+   def __init__(self, queued_at=None):
+      """
+Start timing a request.
+
+**Arguments:**
+
+* ``queued_at``
+
+  / *Condition*: optional / *Type*: float / *Default*: None /
+
+  The time (seconds since the epoch) the request was sent or received, the queue wait is
+  not measured if not given.
+      """
+      self.phases = {}
+      self.name = ""
+      self.error = True
+      if queued_at is not None:
+         self.phases['queue'] = max(time.time() - queued_at, 0.0)
+      self._last = time.perf_counter()
+
+   def lap(self, phase):
+      """
+Record the time elapsed since the previous phase as the given phase.
+
+**Arguments:**
+
+* ``phase``
+
+  / *Condition*: required / *Type*: str /
+
+  The name of the phase which just ended.
+
+**Returns:**
+
+(*no returns*)
+      """
+      now = time.perf_counter()
+      self.phases[phase] = now - self._last
+      self._last = now
+
+
+class ServiceMetrics(object):
+   """
+Per-method request counters and latency histograms of a service.
+   """
+   PHASES = ('queue', 'decode', 'handler', 'publish')
+
+   def __init__(self):
+      self._lock = threading.Lock()
+      self._methods = {}
+
+   def record(self, method, error, phases):
+      """
+Record a served request.
+
+**Arguments:**
+
+* ``method``
+
+  / *Condition*: required / *Type*: str /
+
+  The requested method.
+
+* ``error``
+
+  / *Condition*: required / *Type*: bool /
+
+  Whether the request did not pass.
+
+* ``phases``
+
+  / *Condition*: required / *Type*: dict /
+
+  The latency in seconds per measured phase.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._lock:
+         entry = self._methods.get(method)
+         if entry is None:
+            entry = self._methods[method] = {'count': 0, 'errors': 0,
+                                             'latency': {phase: LatencyHistogram() for phase in self.PHASES}}
+         entry['count'] += 1
+         if error:
+            entry['errors'] += 1
+         latency = entry['latency']
+         for phase, seconds in phases.items():
+            latency[phase].observe(seconds)
+
+   def get_stats(self):
+      """
+Get the counters and latency histograms per method.
+
+**Returns:**
+
+  / *Type*: dict /
+
+  The bucket bounds in seconds, and per method the number of requests, the number of
+  errors and the latency histogram of each phase.
+      """
+      with self._lock:
+         methods = {method: {'count': entry['count'],
+                             'errors': entry['errors'],
+                             'latency': {phase: hist.get_dict() for phase, hist in entry['latency'].items()}}
+                    for method, entry in self._methods.items()}
+      return {'buckets': list(LatencyHistogram.BUCKETS), 'methods': methods}
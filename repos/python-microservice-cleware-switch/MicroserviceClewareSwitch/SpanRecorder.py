@@ -0,0 +1,172 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# *******************************************************************************
+#
+# File: SpanRecorder.py
+#
+# Description:
+#   Provide the recorder of the trace spans of a service.
+#
+# *******************************************************************************
+import json
+import collections
+import threading
+
+
+class SpanRecorder(object):
+   """
+Bounded ring buffer of the latest trace spans, optionally appended to a file.
+
+Spans use the Zipkin v2 JSON format (``traceId``, ``id``, ``parentId``, ``name``, ``kind``,
+``timestamp`` and ``duration`` in microseconds, ``localEndpoint`` and ``tags``), the file
+holds one span per line.
+   """
+   TRACEPARENT_HEADER = 'traceparent'
+
+   def __init__(self, size, path=None):
+      """
+Constructor for the SpanRecorder class.
+
+**Arguments:**
+
+* ``size``
+
+  / *Condition*: required / *Type*: int /
+
+  The maximum number of spans kept in memory.
+
+* ``path``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  The file the spans are appended to.
+
+**Returns:**
+
+(*no returns*)
+      """
+      self._lock = threading.Lock()
+      self._spans = collections.deque(maxlen=size)
+      self._file = None
+      if path:
+         try:
+            self._file = open(path, 'a')
+         except Exception as ex:
+            print(f" [!] Unable to open trace file '{path}'. Reason: {ex}")
+
+   @classmethod
+   def parse_traceparent(cls, props):
+      """
+Get the trace context of a request from its W3C ``traceparent`` header.
+
+**Arguments:**
+
+* ``props``
+
+  / *Condition*: required / *Type*: pika.spec.BasicProperties /
+
+  The properties of the request message.
+
+**Returns:**
+
+  / *Type*: tuple /
+
+  The trace id and the span id of the caller, None if the request is not traced.
+      """
+      value = (props.headers or {}).get(cls.TRACEPARENT_HEADER)
+      if isinstance(value, bytes):
+         value = value.decode()
+      if not isinstance(value, str):
+         return None
+      parts = value.split('-')
+      if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+         return None
+      return parts[1], parts[2]
+
+   @staticmethod
+   def format_traceparent(span):
+      """
+Get the W3C ``traceparent`` header propagating the given span.
+
+**Arguments:**
+
+* ``span``
+
+  / *Condition*: required / *Type*: dict /
+
+  The span of the outgoing request.
+
+**Returns:**
+
+  / *Type*: str /
+
+  The header value.
+      """
+      return f"00-{span['traceId']}-{span['id']}-01"
+
+   def record(self, span):
+      """
+Keep a finished span.
+
+**Arguments:**
+
+* ``span``
+
+  / *Condition*: required / *Type*: dict /
+
+  The span.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._lock:
+         self._spans.append(span)
+         if self._file is not None:
+            self._file.write(json.dumps(span) + '\n')
+            self._file.flush()
+
+   def get_spans(self, trace_id=None):
+      """
+Get the kept spans, oldest first.
+
+**Arguments:**
+
+* ``trace_id``
+
+  / *Condition*: optional / *Type*: str / *Default*: None /
+
+  Only get the spans of this trace.
+
+**Returns:**
+
+  / *Type*: list /
+
+  The spans.
+      """
+      with self._lock:
+         return [span for span in self._spans if trace_id is None or span['traceId'] == trace_id]
+
+   def close(self):
+      """
+Close the trace file.
+
+**Returns:**
+
+(*no returns*)
+      """
+      with self._lock:
+         if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,52 @@
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# --------------------------------------------------------------------------------------------------------------
+#
+# test_ServiceBaseCopy.py
+#
+# The package carries its own copy of the service base modules of python-microservice-base.
+#
+# --------------------------------------------------------------------------------------------------------------
+
+# -- import standard Python modules
+import os, sys, subprocess, pytest
+
+# -- import own Python modules (containing the code to be tested)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))) # to make sure to hit the package relative to this file at first
+
+import sync_service_base
+
+# --------------------------------------------------------------------------------------------------------------
+
+class Test_ServiceBaseCopy:
+    """Copied service base modules"""
+
+    def test_self_contained(self):
+        """The copied service base imports without python-microservice-base"""
+        code = "import sys; sys.path = [p for p in sys.path if 'python-microservice-base' not in p]; " \
+               "import ServiceBase, AsyncServiceBase; print(ServiceBase.__file__)"
+        result = subprocess.run([sys.executable, '-c', code], cwd=sync_service_base.PACKAGE_FOLDER,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert os.path.dirname(os.path.realpath(result.stdout.strip())) == os.path.realpath(sync_service_base.PACKAGE_FOLDER)
+
+    @pytest.mark.skipif(not os.path.isdir(sync_service_base.DEFAULT_BASE_FOLDER),
+                        reason="python-microservice-base is not checked out next to this repository")
+    def test_in_sync(self):
+        """The copies are identical to the modules of python-microservice-base (run sync_service_base.py)"""
+        assert sync_service_base.get_outdated_modules() == []
+
+# eof class Test_ServiceBaseCopy:
+
+# --------------------------------------------------------------------------------------------------------------
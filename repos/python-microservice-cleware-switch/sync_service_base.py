@@ -0,0 +1,98 @@
+# **************************************************************************************************************
+#
+#  Copyright 2020-2024 Robert Bosch GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+# **************************************************************************************************************
+#
+# sync_service_base.py
+#
+# The MicroserviceClewareSwitch package is built and released on its own, it carries a copy of the
+# service base modules of python-microservice-base (MicroserviceBase/ServiceRegistry).
+#
+# The script copies these modules from a python-microservice-base checkout (next to this repository
+# if not given) into the package. Run it whenever the service base modules change; with --check it
+# only reports the copies which differ, e.g. in the pipeline.
+#
+#   Usage: python sync_service_base.py [--base FOLDER] [--check]
+#
+# --------------------------------------------------------------------------------------------------------------
+#
+import os, sys, argparse, filecmp, shutil
+
+PACKAGE_FOLDER = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'MicroserviceClewareSwitch')
+
+DEFAULT_BASE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                                   'python-microservice-base', 'MicroserviceBase', 'ServiceRegistry')
+
+# The service base modules copied into the package
+SERVICE_BASE_MODULES = (
+   'ServiceBase.py',
+   'AsyncServiceBase.py',
+   'ServiceApi.py',
+   'ServiceCodec.py',
+   'ServiceMessage.py',
+   'ServiceChannel.py',
+   'RpcClient.py',
+   'ServiceClient.py',
+   'ResponseCache.py',
+   'RequestDedupWindow.py',
+   'SpanRecorder.py',
+   'SamplingProfiler.py',
+   'ServiceMetrics.py',
+   'ServiceHttpServer.py',
+)
+
+def get_outdated_modules(base_folder=DEFAULT_BASE_FOLDER):
+   """
+Get the copied service base modules which differ from the ones of python-microservice-base.
+
+**Arguments:**
+
+* ``base_folder``
+
+  / *Condition*: optional / *Type*: str / *Default*: DEFAULT_BASE_FOLDER /
+
+  The ServiceRegistry folder of the python-microservice-base checkout.
+
+**Returns:**
+
+  / *Type*: list /
+
+  The names of the modules which are missing or differ in the package.
+   """
+   outdated = []
+   for module in SERVICE_BASE_MODULES:
+      copy = os.path.join(PACKAGE_FOLDER, module)
+      if not os.path.isfile(copy) or not filecmp.cmp(os.path.join(base_folder, module), copy, shallow=False):
+         outdated.append(module)
+   return outdated
+
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description='Copy the service base modules of python-microservice-base into the package.')
+   parser.add_argument('--base', type=str, default=DEFAULT_BASE_FOLDER, help='The ServiceRegistry folder of python-microservice-base')
+   parser.add_argument('--check', action='store_true', help='Only report the modules which differ')
+   args = parser.parse_args(sys.argv[1:])
+
+   if not os.path.isdir(args.base):
+      print(f" [!] Service base folder {args.base} not found")
+      sys.exit(1)
+   outdated = get_outdated_modules(args.base)
+   if args.check:
+      for module in outdated:
+         print(f" [!] {module} differs from {os.path.join(args.base, module)}")
+      sys.exit(1 if outdated else 0)
+   for module in outdated:
+      shutil.copyfile(os.path.join(args.base, module), os.path.join(PACKAGE_FOLDER, module))
+      print(f" [x] {module} copied from {args.base}")